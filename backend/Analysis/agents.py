@@ -5,8 +5,9 @@ from langchain.prompts import PromptTemplate
 from langchain_groq import ChatGroq
 from langchain_core.runnables import RunnableLambda
 from db.mongo import get_agent_configs_collection
+from utils.llm_cache import refresh_llm_cache
 from .models import State
-from .knowledge_base import get_relevant_info, retriever, knowledge_list
+from .knowledge_base import get_relevant_info
 import operator
 
 # Define a type for agent functions for clear type hinting
@@ -14,6 +15,8 @@ Agent = Callable[[State], Dict]
 
 # Define a dictionary to hold all available agents, mapping names to their functions
 available_agents: Dict[str, Agent] = {}
+# Prompt inputs of each loaded agent (criteria, guidelines, confidence_score, knowledge_base), used by the fused mode
+agent_settings: Dict[str, Dict] = {}
 
 # ─── PROMPT TEMPLATE ────────────────────────────────────────────────────────
 
@@ -101,20 +104,12 @@ def register_agent(name: str, agent_function: Agent):
     """
     available_agents[name] = agent_function
 
-def create_review_agent(
-    review_name: str,
-    criteria: str,
-    guidelines: str,
-    confidence_score: int,
-    llm_model: ChatGroq,
-    knowledge_base: Optional[List[Dict]] = None
-) -> Agent:
+def format_knowledge_base(review_name: str, knowledge_base: Optional[List[Dict]] = None) -> Dict[str, str]:
     """
-    Creates a specialized review agent function that includes an internal evaluation loop.
-    The confidence_score is now passed as an argument.
+    Formats an agent's knowledge base entries into the TEMPLATE's Knowledge Base
+    Reference fields: official_narrative, key_points, sensitive_aspects,
+    recommended_terminology and authoritative_sources.
     """
-    prompt_template = PromptTemplate.from_template(TEMPLATE)
-
     if knowledge_base:
         # ✅ FIX: First, parse the json_data string within the knowledge_base
         parsed_kb_data = []
@@ -161,6 +156,29 @@ def create_review_agent(
         kb_recommended_terminology = "No specific knowledge base provided."
         kb_authoritative_sources = "No specific knowledge base provided."
 
+    return {
+        "official_narrative": kb_official_narrative,
+        "key_points": kb_key_points,
+        "sensitive_aspects": kb_sensitive_aspects,
+        "recommended_terminology": kb_recommended_terminology,
+        "authoritative_sources": kb_authoritative_sources
+    }
+
+def create_review_agent(
+    review_name: str,
+    criteria: str,
+    guidelines: str,
+    confidence_score: int,
+    llm_model: ChatGroq,
+    knowledge_base: Optional[List[Dict]] = None
+) -> Agent:
+    """
+    Creates a specialized review agent function that includes an internal evaluation loop.
+    The confidence_score is now passed as an argument.
+    """
+    prompt_template = PromptTemplate.from_template(TEMPLATE)
+    kb_sections = format_knowledge_base(review_name, knowledge_base)
+
     # ─── AGENT SUB-WORKFLOW ──────────────────────────────────────────────────
 
     def agent_sub_step(state: State) -> State:
@@ -178,18 +196,16 @@ def create_review_agent(
             title=metadata.get("title", "N/A"),
             specific_criteria=criteria,
             policy_guidelines=guidelines,
-            official_narrative=kb_official_narrative,
-            key_points=kb_key_points,
-            sensitive_aspects=kb_sensitive_aspects,
-            recommended_terminology=kb_recommended_terminology,
-            authoritative_sources=kb_authoritative_sources
+            **kb_sections
         )
 
         print(f"--- {review_name} Input Prompt ---")
         print(prompt)
         print("-" * 30)
 
-        response = llm_model.invoke(prompt)
+        # A retry resends the same prompt; the cached answer is the one being retried
+        with refresh_llm_cache(state.get("current_agent_retries", 0) > 0):
+            response = llm_model.invoke(prompt)
         raw_output = response.content
         parsed_output = {}
         human_review_flag = False
@@ -247,7 +263,8 @@ DO NOT include any explanation or text outside of the JSON object.
         print(eval_prompt)
         print("-" * 30)
 
-        eval_response = llm_model.invoke(eval_prompt).content
+        with refresh_llm_cache(state.get("current_agent_retries", 0) > 1):
+            eval_response = llm_model.invoke(eval_prompt).content
         confidence = 0
         try:
             eval_data = json.loads(eval_response)
@@ -396,6 +413,12 @@ def load_agents_from_mongo(llm_model: ChatGroq):
                     knowledge_base_data # Pass the knowledge base data to the agent function
                 )
                 register_agent(agent_name, agent)
+                agent_settings[agent_name] = {
+                    "criteria": criteria,
+                    "guidelines": guidelines,
+                    "confidence_score": confidence_score,
+                    "knowledge_base": knowledge_base_data
+                }
                 print(
                     f"✅ Agent '{agent_name}' loaded from MongoDB with confidence score: {confidence_score}."
                 )
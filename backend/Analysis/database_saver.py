@@ -1,7 +1,13 @@
 from typing import Dict, Any, List # List import remains for general type hinting
-from db.mongo import get_chunks_collection, get_review_outcomes_collection
+from db.mongo import get_chunks_collection, get_review_outcomes_collection, increment_progress, get_progress, progress_percent
+from models.chunk_status import AnalysisStatus, normalize_analysis_status
 from datetime import datetime
 from bson.objectid import ObjectId
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+import os
+import threading
+import time
 
 def clear_results_collection():
     """
@@ -18,7 +24,7 @@ def clear_results_collection():
     except Exception as e:
         print(f"❌ An unexpected error occurred while clearing results collection: {e}")
 
-def save_results_to_mongo(
+def build_result_document(
     chunk_uuid: str,
     doc_id: str,
     chunk_index: int,
@@ -31,54 +37,129 @@ def save_results_to_mongo(
     result_with_review: Dict,
     overall_chunk_status: str,
     agent_analysis_statuses: Dict # This dictionary will now contain statuses for all agents
-):
-    """Saves the comprehensive analysis results of a chunk to a MongoDB collection."""
-    try:
-        results_collection = get_review_outcomes_collection()
+) -> Dict:
+    """Builds the review_outcomes document for one analysed chunk."""
+    # Construct the core document with common fields
+    result_document = {
+        "timestamp": datetime.now(),
+        "doc_id": doc_id,
+        "Book Name": book_name,
+        "Page Number": page_number,
+        "Chunk_ID": chunk_uuid,
+        "Chunk no.": chunk_index,
+        "Text Analyzed": report_text,
+        "coordinates": coordinates, # <-- MODIFICATION HERE
+        "Predicted Label": predicted_label,
+        "Predicted Label Confidence": classification_scores.get(predicted_label, 0.0),
+        "overall_status": overall_chunk_status,
+    }
+
+    # Add agent-specific results.
+    # Iterate over agent_analysis_statuses to ensure all agents are represented.
+    # Then merge with detailed output from main_node_output if available.
+    main_node_output = result_with_review.get("main_node_output", {})
 
-        # Construct the core document with common fields
-        result_document = {
-            "timestamp": datetime.now(),
-            "doc_id": doc_id,
-            "Book Name": book_name,
-            "Page Number": page_number,
-            "Chunk_ID": chunk_uuid,
-            "Chunk no.": chunk_index,
-            "Text Analyzed": report_text,
-            "coordinates": coordinates, # <-- MODIFICATION HERE
-            "Predicted Label": predicted_label,
-            "Predicted Label Confidence": classification_scores.get(predicted_label, 0.0),
-            "overall_status": overall_chunk_status,
+    for agent_name, agent_status in agent_analysis_statuses.items():
+        agent_data = main_node_output.get(agent_name, {}) # Get agent's detailed data if available
+        agent_output = agent_data.get("output", {}) # Get the parsed output dictionary
+
+        agent_result = {
+            "issue_found": agent_output.get("issues_found", False),
+            "problematic_text": agent_output.get("problematic_text", ""),
+            "observation": agent_output.get("observation", ""),
+            "recommendation": agent_output.get("recommendation", ""),
+            "confidence": agent_data.get("confidence", 0),
+            "human_review": agent_data.get("human_review", False),
+            "retries": agent_data.get("retries", 0),
+            "status": agent_status # Use the status determined in mains1.py
         }
+        result_document[agent_name] = agent_result # Assign directly to the root document
 
-        # Add agent-specific results.
-        # Iterate over agent_analysis_statuses to ensure all agents are represented.
-        # Then merge with detailed output from main_node_output if available.
-        main_node_output = result_with_review.get("main_node_output", {})
-
-        for agent_name, agent_status in agent_analysis_statuses.items():
-            agent_data = main_node_output.get(agent_name, {}) # Get agent's detailed data if available
-            agent_output = agent_data.get("output", {}) # Get the parsed output dictionary
-
-            agent_result = {
-                "issue_found": agent_output.get("issues_found", False),
-                "problematic_text": agent_output.get("problematic_text", ""),
-                "observation": agent_output.get("observation", ""),
-                "recommendation": agent_output.get("recommendation", ""),
-                "confidence": agent_data.get("confidence", 0),
-                "human_review": agent_data.get("human_review", False),
-                "retries": agent_data.get("retries", 0),
-                "status": agent_status # Use the status determined in mains1.py
-            }
-            result_document[agent_name] = agent_result # Assign directly to the root document
-
-        # Insert the document into MongoDB
-        results_collection.insert_one(result_document)
-        print(f"✅ Analysis results for chunk ID '{chunk_uuid}' saved to MongoDB in results collection.")
+    return result_document
+
+def analysis_result_delta(result_document: Dict) -> Dict:
+    """
+    Compact live update for one analysed chunk: per-agent flags for every agent, and the
+    finding texts only for agents that found an issue. The full outcome stays in review_outcomes.
+    """
+    findings = {}
+    for key, value in result_document.items():
+        if not isinstance(value, dict) or "issue_found" not in value:
+            continue
+        finding = {
+            "issue_found": value.get("issue_found", False),
+            "confidence": value.get("confidence", 0),
+            "human_review": value.get("human_review", False),
+            "status": value.get("status"),
+        }
+        if finding["issue_found"]:
+            finding.update({
+                "problematic_text": value.get("problematic_text", ""),
+                "observation": value.get("observation", ""),
+                "recommendation": value.get("recommendation", ""),
+            })
+        findings[key] = finding
+
+    return {
+        "kind": "analysis",
+        "chunk_id": result_document["Chunk_ID"],
+        "chunk_index": result_document.get("Chunk no."),
+        "page_number": result_document.get("Page Number"),
+        "coordinates": result_document.get("coordinates"),
+        "predicted_label": result_document.get("Predicted Label"),
+        "overall_status": result_document.get("overall_status"),
+        "findings": findings,
+    }
+
+def publish_analysis_results(result_documents: List[Dict]):
+    try:
+        from api.chunks.websocket_manager import publish_chunk_result, CHANNEL_ANALYSIS
+        for result_document in result_documents:
+            publish_chunk_result(CHANNEL_ANALYSIS, result_document["doc_id"], analysis_result_delta(result_document))
+    except Exception as e:
+        print(f"[Analysis WS] Failed to send chunk results: {e}")
+
+def save_results_to_mongo(**kwargs):
+    """
+    Saves the comprehensive analysis results of a chunk to a MongoDB collection.
+    Takes the same keyword arguments as build_result_document. The outcome is upserted
+    by Chunk_ID, so re-running a chunk replaces its previous outcome instead of duplicating it.
+    """
+    save_result_document(build_result_document(**kwargs))
+
+def save_result_document(result_document: Dict):
+    """Upserts an already built review_outcomes document by Chunk_ID."""
+    try:
+        results_collection = get_review_outcomes_collection()
+        results_collection.replace_one({"Chunk_ID": result_document["Chunk_ID"]}, result_document, upsert=True)
+        print(f"✅ Analysis results for chunk ID '{result_document['Chunk_ID']}' saved to MongoDB in results collection.")
+        publish_analysis_results([result_document])
 
     except Exception as e:
         print(f"❌ An unexpected error occurred while saving results to MongoDB: {e}")
 
+def notify_analysis_progress_for(doc_id: str, counters: Dict = None):
+    """Notify analysis progress from the book's progress counters"""
+    try:
+        from api.chunks.websocket import notify_analysis_progress
+        counters = counters if counters is not None else get_progress(doc_id)
+        total = counters.get("total", 0)
+        done = counters.get("analyzed", 0)
+        notify_analysis_progress(doc_id, progress_percent(done, total), total, done)
+    except Exception as notify_err:
+        print(f"[Analysis WS] Failed to send analysis progress: {notify_err}")
+
+def analysis_status_update(doc_id: str, chunk_id: str, analysis_status: str):
+    """
+    Status update that only reports a modification when a chunk newly becomes Complete,
+    so the number of modified documents is exactly the increment for progress.analyzed.
+    """
+    analysis_status = normalize_analysis_status(analysis_status)
+    query = {"doc_id": doc_id, "chunk_id": chunk_id}
+    if analysis_status == AnalysisStatus.COMPLETE.value:
+        query["analysis_status"] = {"$ne": AnalysisStatus.COMPLETE.value}
+    return query, {"$set": {"analysis_status": analysis_status}}
+
 def update_chunk_analysis_status(doc_id: str, chunk_id: str, analysis_status: str):
     """
     Updates the 'analysis_status' field of a chunk in the Pipeline 1 'chunks' collection
@@ -88,25 +169,158 @@ def update_chunk_analysis_status(doc_id: str, chunk_id: str, analysis_status: st
     try:
         chunks_collection = get_chunks_collection()
 
-        update_result = chunks_collection.update_one(
-            {"doc_id": doc_id, "chunk_id": chunk_id},
-            {"$set": {"analysis_status": analysis_status}}
-        )
+        analysis_status = normalize_analysis_status(analysis_status)
+        update_result = chunks_collection.update_one(*analysis_status_update(doc_id, chunk_id, analysis_status))
 
         if update_result.matched_count > 0:
             print(f"✅ Chunk '{chunk_id}' in document '{doc_id}' analysis_status updated to '{analysis_status}' in chunks collection.")
-            # Compute and notify analysis progress
-            try:
-                from api.chunks.websocket import notify_analysis_progress
-                import asyncio
-                total = chunks_collection.count_documents({"doc_id": doc_id})
-                done = chunks_collection.count_documents({"doc_id": doc_id, "analysis_status": "Complete"})
-                progress = int((done / total) * 100) if total else 0
-                asyncio.run(notify_analysis_progress(doc_id, progress, total, done))
-            except Exception as notify_err:
-                print(f"[Analysis WS] Failed to send analysis progress: {notify_err}")
+            counters = increment_progress(doc_id, "analyzed", update_result.modified_count) if update_result.modified_count else None
+            notify_analysis_progress_for(doc_id, counters)
+        elif chunks_collection.count_documents({"doc_id": doc_id, "chunk_id": chunk_id}, limit=1):
+            # Only a Complete update skips chunks that are already Complete
+            print(f"ℹ️ Chunk '{chunk_id}' in document '{doc_id}' was already '{analysis_status}'.")
         else:
             print(f"⚠️ Chunk '{chunk_id}' in document '{doc_id}' not found for analysis_status update in chunks collection.")
 
     except Exception as e:
-        print(f"❌ An unexpected error occurred while updating chunk status: {e}")
\ No newline at end of file
+        print(f"❌ An unexpected error occurred while updating chunk status: {e}")
+
+
+class ResultWriter:
+    """
+    Buffers analysis results and writes them with bulk_write instead of one
+    insert/update (plus progress counts) per chunk.
+
+    Each add() queues the chunk's outcome upsert (keyed by Chunk_ID) and its
+    analysis_status update; both are written in the same flush. A flush happens when
+    RESULT_WRITER_BATCH_SIZE results are buffered, when RESULT_WRITER_FLUSH_SECONDS
+    have passed, and on close(). Safe to share between threads.
+
+    A failed write is retried RESULT_WRITER_RETRIES times with exponential backoff.
+    After that the results go back into the buffer for the next flush and flush()
+    raises, so close() fails the job instead of losing results. on_written(document)
+    is called for every result once it is stored.
+    """
+
+    def __init__(self, batch_size: int = None, flush_seconds: float = None, on_written=None,
+                 retries: int = None, retry_backoff: float = None):
+        self.batch_size = batch_size or int(os.getenv("RESULT_WRITER_BATCH_SIZE", "20"))
+        self.flush_seconds = flush_seconds or float(os.getenv("RESULT_WRITER_FLUSH_SECONDS", "5"))
+        self.retries = retries if retries is not None else int(os.getenv("RESULT_WRITER_RETRIES", "3"))
+        self.retry_backoff = retry_backoff if retry_backoff is not None else float(os.getenv("RESULT_WRITER_RETRY_BACKOFF_SECONDS", "1"))
+        self.on_written = on_written
+        self._outcome_ops = []
+        self._results = []  # Documents behind _outcome_ops, pushed to reviewers once written
+        self._status_ops = {}  # doc_id -> chunk status updates, so progress can be counted per book
+        self._increments = {}  # doc_id -> progress.analyzed increments of a failed flush, not applied yet
+        self._lock = threading.Lock()  # Guards the buffers only
+        self._flush_lock = threading.Lock()  # One flush at a time, so batches are written in order
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True, name="result-writer")
+        self._timer.start()
+
+    def add(self, result_document: Dict, analysis_status: str):
+        with self._lock:
+            self._outcome_ops.append(ReplaceOne(
+                {"Chunk_ID": result_document["Chunk_ID"]},
+                result_document,
+                upsert=True
+            ))
+            self._results.append(result_document)
+            self._status_ops.setdefault(result_document["doc_id"], []).append(UpdateOne(
+                *analysis_status_update(result_document["doc_id"], result_document["Chunk_ID"], analysis_status)
+            ))
+            should_flush = len(self._outcome_ops) >= self.batch_size
+
+        if should_flush:
+            try:
+                self.flush()
+            except Exception:
+                # Still buffered; the next flush (at the latest close()) tries again
+                pass
+
+    def _write(self, outcome_ops: List, status_ops: Dict[str, List], batch: Dict) -> Dict:
+        """
+        Writes a batch; batch records the steps already done so a retry resumes after
+        them. The progress increment is the modified_count of the guarded status write,
+        which a retried status write no longer reports (the chunks are Complete by then),
+        so it is kept in batch until it is applied.
+        """
+        # Outcomes first: if the status write is lost the chunk stays Pending and
+        # is simply re-analysed, and the upsert keeps the outcome single.
+        if not batch["outcomes_written"]:
+            get_review_outcomes_collection().bulk_write(outcome_ops, ordered=False)
+            batch["outcomes_written"] = True
+        for doc_id, ops in status_ops.items():
+            if doc_id not in batch["status_written"]:
+                try:
+                    modified = get_chunks_collection().bulk_write(ops, ordered=False).modified_count
+                except BulkWriteError as e:
+                    # Some updates went through; count them, the rest are retried
+                    modified = e.details.get("nModified", 0)
+                    batch["increments"][doc_id] = batch["increments"].get(doc_id, 0) + modified
+                    raise
+                batch["increments"][doc_id] = batch["increments"].get(doc_id, 0) + modified
+                batch["status_written"].add(doc_id)
+        for doc_id, amount in list(batch["increments"].items()):
+            batch["counters"][doc_id] = increment_progress(doc_id, "analyzed", amount) if amount else None
+            del batch["increments"][doc_id]
+        return batch["counters"]
+
+    def _restore(self, outcome_ops: List, results: List, status_ops: Dict[str, List], increments: Dict[str, int]):
+        """Puts a failed batch back in front of anything added since, keeping the write order."""
+        with self._lock:
+            self._outcome_ops[:0] = outcome_ops
+            self._results[:0] = results
+            for doc_id, ops in status_ops.items():
+                self._status_ops[doc_id] = ops + self._status_ops.get(doc_id, [])
+            # Chunks already marked Complete by the failed batch: their re-run updates
+            # modify nothing, so carry the increment over to the next flush
+            for doc_id, amount in increments.items():
+                self._increments[doc_id] = self._increments.get(doc_id, 0) + amount
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                outcome_ops, self._outcome_ops = self._outcome_ops, []
+                results, self._results = self._results, []
+                status_ops, self._status_ops = self._status_ops, {}
+                increments, self._increments = self._increments, {}
+
+            if not outcome_ops:
+                return
+            batch = {"outcomes_written": False, "status_written": set(), "increments": increments, "counters": {}}
+            for attempt in range(1, self.retries + 2):
+                try:
+                    counters = self._write(outcome_ops, status_ops, batch)
+                    break
+                except Exception as e:
+                    print(f"❌ Flushing analysis results for {len(outcome_ops)} chunks failed (attempt {attempt}/{self.retries + 1}): {e}")
+                    if attempt > self.retries:
+                        self._restore(outcome_ops, results, status_ops, batch["increments"])
+                        raise
+                    time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            print(f"✅ Flushed analysis results for {len(outcome_ops)} chunks.")
+
+        publish_analysis_results(results)
+        for doc_id, doc_counters in counters.items():
+            notify_analysis_progress_for(doc_id, doc_counters)
+        if self.on_written:
+            for result_document in results:
+                try:
+                    self.on_written(result_document)
+                except Exception as e:
+                    print(f"[Result Writer] on_written failed for chunk {result_document.get('Chunk_ID')}: {e}")
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception:
+                pass  # Kept in the buffer for the next round
+
+    def close(self):
+        """Stops the periodic flush and writes what is left; raises if that cannot be stored."""
+        self._closed.set()
+        self._timer.join()
+        self.flush()
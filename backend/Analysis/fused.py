@@ -0,0 +1,156 @@
+"""Fused analysis mode: one LLM call per chunk for all review agents
+
+In the default mode every agent sends its own full TEMPLATE prompt (and then an
+evaluation prompt) for every chunk, so the long shared policy text is sent agents x
+chunks times. With ANALYSIS_MODE=fused a single prompt carries the shared instructions
+once plus each agent's criteria, guidelines and knowledge base, and asks for one JSON
+object keyed by agent name. Each agent also reports its confidence there, which
+replaces the separate evaluation call.
+
+The answer is split back into the usual main_node_output shape. An agent whose
+section is missing, malformed, a "null" answer (issues_found false without
+problematic_text) or below its confidence threshold falls back to its normal
+per-agent sub-workflow, which retries and routes to human review exactly as in the
+default mode. Results never get worse than the default mode.
+"""
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+from .agents import TEMPLATE, available_agents, agent_settings, format_knowledge_base
+from .workflow_nodes import main_node, final_report_generator
+
+# Sections of TEMPLATE that do not depend on the agent, sent once
+_PREAMBLE = TEMPLATE[:TEMPLATE.index("## Context")].strip()
+_SHARED_POLICY = TEMPLATE[TEMPLATE.index("{policy_guidelines}") + len("{policy_guidelines}"):TEMPLATE.index("## Specific criteria:")].strip()
+_SHARED_RULES = TEMPLATE[TEMPLATE.index("## Flag Content That:"):TEMPLATE.index("## Output Format:")].strip()
+# Per agent: the knowledge base block, filled from format_knowledge_base as in the per-agent prompt
+_KB_REFERENCE = TEMPLATE[TEMPLATE.index("## Knowledge Base Reference:"):TEMPLATE.index("## Policy Guidelines:")].strip()
+
+_JSON_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def is_fused_analysis_enabled() -> bool:
+    return os.getenv("ANALYSIS_MODE", "per_agent") == "fused"
+
+
+def _agent_section(name: str, settings: Dict[str, Any]) -> str:
+    kb_reference = _KB_REFERENCE.format(**format_knowledge_base(name, settings["knowledge_base"]))
+    return f"""### Agent: {name}
+Specific criteria:
+{settings["criteria"]}
+
+Policy guidelines:
+{settings["guidelines"]}
+
+{kb_reference}"""
+
+
+def build_fused_prompt(report_text: str, metadata: Dict[str, Any], agent_names: List[str]) -> str:
+    sections = "\n\n".join(_agent_section(name, agent_settings[name]) for name in agent_names)
+    example = ",\n".join(
+        f'    "{name}": {{"issues_found": true/false, "problematic_text": "...", "observation": "...", '
+        f'"recommendation": "delete/rephrase/fact-check/provide references", "confidence": 0-100}}'
+        for name in agent_names
+    )
+    return f"""{_PREAMBLE}
+
+You review the passage once for each of the reviewer agents listed below. Apply each
+agent's own criteria, guidelines and knowledge base independently.
+
+## Context
+Book Title: {metadata.get("title", "N/A")}
+Page: {metadata.get("page", "N/A")}, Paragraph: {metadata.get("paragraph", "N/A")}
+Text to analyze: {report_text}
+
+## Policy Guidelines (all agents):
+{_SHARED_POLICY}
+
+{_SHARED_RULES}
+
+## Agents
+{sections}
+
+## Output Format:
+Return one JSON object with exactly one key per agent ({", ".join(agent_names)}).
+"confidence" is how confident you are (0-100) that the agent's finding is correct and relevant.
+```json
+{{
+{example}
+}}
+```
+Respond only with valid JSON. Do not include any explanation outside the JSON block.
+"""
+
+
+def _parse_agent_output(value: Any) -> Optional[Dict[str, Any]]:
+    """
+    The agent's output in the per-agent format, or None when it is unusable. A "null"
+    answer (issues_found false, problematic_text missing or null) is unusable too: the
+    per-agent workflow retries those and sends them to human review rather than
+    reading them as "no issue".
+    """
+    if not isinstance(value, dict) or not isinstance(value.get("issues_found"), bool):
+        return None
+    if value["issues_found"] is False and value.get("problematic_text") is None:
+        return None
+    for field in ("observation", "recommendation"):
+        if field in value and not isinstance(value[field], str):
+            return None
+    try:
+        int(value.get("confidence", 0))
+    except (TypeError, ValueError):
+        return None
+    return value
+
+
+def parse_fused_response(raw_output: str, agent_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Splits the fused answer per agent; agents without a usable section are left out."""
+    try:
+        data = json.loads(_JSON_FENCE.sub("", raw_output.strip()))
+    except json.JSONDecodeError as e:
+        print(f"[Fused Analysis] Could not decode the fused response: {e}")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    parsed = {}
+    for name in agent_names:
+        output = _parse_agent_output(data.get(name))
+        if output is not None:
+            parsed[name] = output
+    return parsed
+
+
+def run_fused_analysis(llm_model, report_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Analyses one chunk with every loaded agent. Returns the same keys the analysis
+    graph produces: main_node_output, aggregate and final_decision_report.
+    """
+    report_data = {**report_data, **main_node(report_data)}
+    # Agents registered without prompt settings can only run their own sub-workflow
+    agent_names = [name for name in available_agents if name in agent_settings]
+    parsed = {}
+    if agent_names:
+        prompt = build_fused_prompt(report_data["report_text"], report_data["metadata"], agent_names)
+        raw_output = llm_model.invoke(prompt).content
+        parsed = parse_fused_response(raw_output, agent_names)
+
+    main_node_output: Dict[str, Any] = {}
+    aggregate: List[str] = []
+    for name in list(available_agents):
+        output = parsed.get(name)
+        confidence = int(output.pop("confidence", 0)) if output is not None else 0
+        if output is not None and confidence >= agent_settings[name]["confidence_score"]:
+            main_node_output[name] = {"output": output, "confidence": confidence, "retries": 1, "human_review": False}
+            aggregate.append(f"{name} Output: {output} (Confidence: {confidence}%, Fused)")
+        else:
+            reason = "no usable output" if output is None else f"confidence {confidence}% below threshold"
+            print(f"[Fused Analysis] {name}: {reason}, falling back to the per-agent review")
+            result = available_agents[name](report_data)
+            main_node_output.update(result["main_node_output"])
+            aggregate.extend(result["aggregate"])
+
+    state = {**report_data, "main_node_output": main_node_output, "aggregate": aggregate}
+    state.update(final_report_generator(state))
+    return state
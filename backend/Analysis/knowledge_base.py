@@ -2,18 +2,15 @@ import json
 import os
 import pymongo
 from typing import List, Dict
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
-from langchain_community.embeddings import FastEmbedEmbeddings
-from langchain.chains.query_constructor.schema import AttributeInfo
-from langchain.retrievers.self_query.base import SelfQueryRetriever
 from langchain_core.exceptions import OutputParserException
 from .config import MONGO_URI, CHROMA_DB_DIRECTORY
-from .llm_init import embeddings, llm
+from .llm_init import llm
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from db.mongo import get_kb_data_collection
+from utils.model_registry import register_model, get_model
 
 # --- KNOWLEDGE BASE EXTRACTION AND VECTOR STORE INITIALIZATION ────────────────
 
@@ -64,61 +61,84 @@ def extract_knowledge_from_mongo() -> List[Dict]:
     
     return extracted_knowledge
 
-knowledge_list = extract_knowledge_from_mongo()
-
-if not os.path.exists(CHROMA_DB_DIRECTORY):
-    print(f"Creating and persisting ChromaDB in '{CHROMA_DB_DIRECTORY}'...")
-    if knowledge_list:
-        docs = [
-            Document(
-                page_content=item["official_narrative"],
-                metadata={
-                    "topic": item["topic"],
-                    "key_points": ", ".join(item["key_points"])
-                }
-            )
-            for item in knowledge_list
-        ]
-        vectorstore = Chroma.from_documents(docs, embeddings, persist_directory=CHROMA_DB_DIRECTORY)
-        print("ChromaDB created and persisted successfully.")
+def load_knowledge_base() -> Dict:
+    """
+    Builds (or loads) the ChromaDB vector store over the knowledge base and the
+    SelfQueryRetriever on top of it. Registered with the model registry as
+    "knowledge_base", so the embeddings and Chroma are only initialised on first use.
+    """
+    from langchain_chroma import Chroma
+    from langchain.chains.query_constructor.schema import AttributeInfo
+    from langchain.retrievers.self_query.base import SelfQueryRetriever
+
+    embeddings = get_model("embeddings")
+    knowledge_list = extract_knowledge_from_mongo()
+
+    if not os.path.exists(CHROMA_DB_DIRECTORY):
+        print(f"Creating and persisting ChromaDB in '{CHROMA_DB_DIRECTORY}'...")
+        if knowledge_list:
+            docs = [
+                Document(
+                    page_content=item["official_narrative"],
+                    metadata={
+                        "topic": item["topic"],
+                        "key_points": ", ".join(item["key_points"])
+                    }
+                )
+                for item in knowledge_list
+            ]
+            vectorstore = Chroma.from_documents(docs, embeddings, persist_directory=CHROMA_DB_DIRECTORY)
+            print("ChromaDB created and persisted successfully.")
+        else:
+            print("No knowledge base data extracted from MongoDB. ChromaDB will not be created.")
+            vectorstore = None # Ensure vectorstore is None if no data
     else:
-        print("No knowledge base data extracted from MongoDB. ChromaDB will not be created.")
-        vectorstore = None # Ensure vectorstore is None if no data
-else:
-    print(f"Loading ChromaDB from '{CHROMA_DB_DIRECTORY}'...")
-    vectorstore = Chroma(persist_directory=CHROMA_DB_DIRECTORY, embedding_function=embeddings)
-    print("ChromaDB loaded successfully.")
-
-# Define metadata field information for self-querying.
-metadata_field_info = [
-    AttributeInfo(
-        name="topic",
-        description="The topic of the knowledge document (string)",
-        type="string",
-    ),
-    AttributeInfo(
-        name="key_points",
-        description="Key points related to the topic (comma-separated string)",
-        type="string",
-    ),
-]
-
-document_content_description = "Knowledge Base official narratives and facts"
-
-# Initialize the SelfQueryRetriever, enabling it to construct queries over the vector store's metadata
-retriever = SelfQueryRetriever.from_llm(
-    llm,
-    vectorstore,
-    document_content_description,
-    metadata_field_info,
-    verbose=True
-) if vectorstore else None # Only initialize if vectorstore exists
+        print(f"Loading ChromaDB from '{CHROMA_DB_DIRECTORY}'...")
+        vectorstore = Chroma(persist_directory=CHROMA_DB_DIRECTORY, embedding_function=embeddings)
+        print("ChromaDB loaded successfully.")
+
+    # Define metadata field information for self-querying.
+    metadata_field_info = [
+        AttributeInfo(
+            name="topic",
+            description="The topic of the knowledge document (string)",
+            type="string",
+        ),
+        AttributeInfo(
+            name="key_points",
+            description="Key points related to the topic (comma-separated string)",
+            type="string",
+        ),
+    ]
+
+    document_content_description = "Knowledge Base official narratives and facts"
+
+    # Initialize the SelfQueryRetriever, enabling it to construct queries over the vector store's metadata
+    retriever = SelfQueryRetriever.from_llm(
+        llm,
+        vectorstore,
+        document_content_description,
+        metadata_field_info,
+        verbose=True
+    ) if vectorstore else None # Only initialize if vectorstore exists
+
+    return {
+        "knowledge_list": knowledge_list,
+        "vectorstore": vectorstore,
+        "retriever": retriever
+    }
+
+register_model("knowledge_base", load_knowledge_base)
 
 def get_relevant_info(query: str, k: int = 50) -> List[Dict]:
     """
     Retrieves relevant documents from the vector store based on a query
     and merges them with the full knowledge base data.
     """
+    kb = get_model("knowledge_base")
+    retriever = kb["retriever"]
+    vectorstore = kb["vectorstore"]
+
     if not retriever:
         print("Retriever not initialized because ChromaDB was not created or loaded.")
         return []
@@ -132,9 +152,9 @@ def get_relevant_info(query: str, k: int = 50) -> List[Dict]:
     unique_relevant_info = []
     seen_content = set()
 
-    global knowledge_list
-    if not knowledge_list:
-        knowledge_list = extract_knowledge_from_mongo()
+    if not kb["knowledge_list"]:
+        kb["knowledge_list"] = extract_knowledge_from_mongo()
+    knowledge_list = kb["knowledge_list"]
 
     if results:
         for doc in results:
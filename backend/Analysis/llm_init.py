@@ -1,14 +1,17 @@
-from langchain.chat_models import ChatOpenAI
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_community.embeddings import FastEmbedEmbeddings
 import os
 from dotenv import load_dotenv
  
 from Classification.models import LLAMA
+from utils.model_registry import register_model
 load_dotenv(override=True)
 
 # --- 1. Define your Embedding Model (BGE-Large with FastEmbed) ---
-embeddings = FastEmbedEmbeddings(model_name=os.getenv("embedding_model"))
+# Loaded lazily through the model registry: get_model("embeddings")
+def load_embeddings():
+    from langchain_community.embeddings import FastEmbedEmbeddings
+    return FastEmbedEmbeddings(model_name=os.getenv("embedding_model"))
+
+register_model("embeddings", load_embeddings)
 
 
 
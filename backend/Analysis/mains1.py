@@ -1,29 +1,34 @@
 from langgraph.graph import START, END, StateGraph
 from .models import State
 from .llm_init import llm
-from .knowledge_base import knowledge_list, retriever
 from .agents import load_agents_from_mongo, available_agents
 from .workflow_nodes import main_node, final_report_generator
+from .fused import is_fused_analysis_enabled, run_fused_analysis
 # Modified imports to use Pipeline 1 specific chunk retrieval functions
 # Now importing the new functions from pdf_processor
 from .pdf_processor import get_first_pipeline1_chunk, get_all_pipeline1_chunks_details, get_next_pending_pipeline1_chunk, get_all_pending_pipeline1_chunks_details
-from .database_saver import save_results_to_mongo, clear_results_collection, update_chunk_analysis_status
+from .database_saver import save_result_document, clear_results_collection, update_chunk_analysis_status, build_result_document, ResultWriter
 from .text_classifier import classify_text
-from db.mongo import get_books_collection, get_chunks_collection, set_all_agents_status_true, finalize_status
+from db.mongo import get_books_collection, get_chunks_collection, set_all_agents_status_true, finalize_status, get_progress, increment_progress
+from db.result_reuse import (
+    is_result_reuse_enabled, analysis_fingerprint, text_hash, find_reusable_result, store_reusable_result,
+    reusable_analysis_result, STAGE_ANALYSIS
+)
+from models.chunk_status import AnalysisStatus
+from jobs.job_queue import check_lease
 from datetime import datetime
 from bson import ObjectId
-import asyncio
-import time 
+import os
+import queue
+import threading
+import time
 
 
-def run_workflow(book_id: str, run_analysis: bool, run_classification: bool, pdf_path: str):
+def build_analysis_graph():
     """
-    Run workflow for a specific book by its book_id.
-    Loads agents, builds the graph, and processes all pending chunks
-    that belong to the specified book.
+    Loads agents from MongoDB and compiles the analysis graph.
+    Returns None when no agents are available.
     """
-    
-        
     # Load agents dynamically from MongoDB
     print("Loading agents from MongoDB...")
     load_agents_from_mongo(llm)
@@ -31,7 +36,7 @@ def run_workflow(book_id: str, run_analysis: bool, run_classification: bool, pdf
     total_agents = len(available_agents)
     if total_agents == 0:
         print("WARNING: No agents loaded. Analysis workflow might not function as expected.")
-        return  # Exit if no agents are loaded
+        return None
 
     # Initialize the StateGraph with the defined State
     graph_builder = StateGraph(State)
@@ -53,168 +58,366 @@ def run_workflow(book_id: str, run_analysis: bool, run_classification: bool, pdf
     graph_builder.add_edge("fnl_rprt", END)
 
     # Compile the graph
-    graph = graph_builder.compile()
+    return graph_builder.compile()
 
-    print(f"Loading chunks for book_id={book_id} from Pipeline 1's database...")
 
-    chunks_collection = get_chunks_collection()
-    
-    # ✅ Only fetch pending chunks for the specific book
-    documents_to_process = chunks_collection.find({
+def persist_result(result_document: dict, overall_chunk_status: str, writer: ResultWriter = None):
+    if writer is not None:
+        writer.add(result_document, overall_chunk_status)
+    else:
+        save_result_document(result_document)
+
+        update_chunk_analysis_status(
+            doc_id=result_document["doc_id"],
+            chunk_id=result_document["Chunk_ID"],
+            analysis_status=overall_chunk_status
+        )
+
+
+def reuse_analysis(doc_to_process: dict, content_hash: str, fingerprint: str, writer: ResultWriter = None) -> bool:
+    """
+    Copies the stored outcome of an identical, already analysed chunk (db/result_reuse.py).
+    Returns False when there is none.
+    """
+    reused = find_reusable_result(STAGE_ANALYSIS, content_hash, fingerprint)
+    if reused is None:
+        return False
+
+    result_document = {
+        "timestamp": datetime.now(),
+        "doc_id": doc_to_process.get("doc_id"),
+        "Book Name": doc_to_process.get("doc_name", "Unknown Document"),
+        "Page Number": doc_to_process.get("page_number"),
+        "Chunk_ID": doc_to_process.get("chunk_id"),
+        "Chunk no.": doc_to_process.get("chunk_index"),
+        "Text Analyzed": doc_to_process.get("text"),
+        "coordinates": doc_to_process.get("coordinates"),
+        **reused["result"],
+        "reused_from": reused.get("source_chunk_id"),
+    }
+    persist_result(result_document, AnalysisStatus.COMPLETE.value, writer)
+    get_chunks_collection().update_one(
+        {"chunk_id": doc_to_process.get("chunk_id")},
+        {"$set": {"analysis_reused": True, "analysis_reused_from": reused.get("source_chunk_id")}}
+    )
+    increment_progress(doc_to_process.get("doc_id"), "reused_analysis")
+    print(f"♻️ Reused analysis of identical chunk {reused.get('source_chunk_id')} for chunk {doc_to_process.get('chunk_id')}")
+    return True
+
+
+def analyze_chunk(graph, doc_to_process: dict, writer: ResultWriter = None, fingerprint: str = None):
+    """
+    Runs the analysis graph on one chunk document and persists its results,
+    through the buffered writer when one is given.
+    fingerprint (db/result_reuse.analysis_fingerprint) enables reusing and storing
+    results of chunks with identical text.
+    """
+    # Extract fields
+    p1_chunk_uuid = doc_to_process.get("chunk_id")
+    doc_id_p1 = doc_to_process.get("doc_id")
+    chunk_index_p1 = doc_to_process.get("chunk_index")
+    original_chunk_text = doc_to_process.get("text")
+    book_name_p1 = doc_to_process.get("doc_name", "Unknown Document")
+    p1_coordinates = doc_to_process.get("coordinates")
+    p1_page_number = doc_to_process.get("page_number")
+
+    content_hash = text_hash(original_chunk_text) if fingerprint else None
+    if fingerprint and reuse_analysis(doc_to_process, content_hash, fingerprint, writer):
+        return AnalysisStatus.COMPLETE.value
+
+    merged_text_for_id = original_chunk_text
+
+    print(f"\n--- Processing Chunk ID: {p1_chunk_uuid} (Document: '{book_name_p1}', P1 Doc ID: {doc_id_p1}, P1 Chunk Index: {chunk_index_p1}) ---")
+    print(f"Original Chunk Text: {original_chunk_text}\n")
+
+    classification_result = classify_text(merged_text_for_id)
+    predicted_label = classification_result['predicted_label']
+    print(f"--- Predicted Label for Chunk: \"{predicted_label}\" (Confidence: {classification_result['confidence']}%) ---")
+
+    report_data = {
+        "report_text": merged_text_for_id,
+        "metadata": {
+            "doc_id": doc_id_p1,
+            "chunk_index": chunk_index_p1,
+            "title": book_name_p1,
+            "chunk_id": p1_chunk_uuid,
+            "predicted_label": predicted_label,
+            "classification_scores": classification_result['all_scores'],
+            "coordinates": p1_coordinates,
+            "page_number": p1_page_number,
+
+        },
+        "main_node_output": {},
+        "aggregate": [],
+        "final_decision_report": "",
+        "current_agent_name": "",
+        "current_agent_input_prompt": "",
+        "current_agent_raw_output": "",
+        "current_agent_parsed_output": {},
+        "current_agent_confidence": 0,
+        "current_agent_retries": 0,
+        "current_agent_human_review": False
+    }
+
+    print(f"\n--- Langgraph Workflow Input for Chunk ID: {p1_chunk_uuid} ---")
+    print("Initial state before agent execution. Individual agents will now perform their internal evaluation loops.")
+    print("-" * 40)
+
+    if is_fused_analysis_enabled():
+        # One LLM call for all agents, see fused.py
+        result_with_review = run_fused_analysis(llm, report_data)
+    else:
+        result_with_review = graph.invoke(report_data)
+
+    overall_chunk_status = AnalysisStatus.COMPLETE.value
+    agent_analysis_statuses = {agent_name: "Pending" for agent_name in available_agents.keys()}
+
+    for agent_name, agent_data in result_with_review.get("main_node_output", {}).items():
+        agent_output = agent_data.get("output", {})
+
+        if (
+            agent_output.get("problematic_text") is None
+            and agent_output.get("observation") is None
+            and agent_output.get("recommendation") is None
+        ):
+            agent_analysis_statuses[agent_name] = "Complete"
+        else:
+            is_output_complete = True
+            if not isinstance(agent_output, dict):
+                is_output_complete = False
+            else:
+                if "issues_found" in agent_output and not isinstance(agent_output.get("issues_found"), bool):
+                    is_output_complete = False
+                if "observation" in agent_output and not isinstance(agent_output.get("observation"), str):
+                    is_output_complete = False
+                if "recommendation" in agent_output and not isinstance(agent_output.get("recommendation"), str):
+                    is_output_complete = False
+
+            if is_output_complete:
+                agent_analysis_statuses[agent_name] = "Complete"
+            else:
+                agent_analysis_statuses[agent_name] = "Pending"
+                overall_chunk_status = AnalysisStatus.PENDING.value
+
+    result_fields = dict(
+        chunk_uuid=p1_chunk_uuid,
+        doc_id=doc_id_p1,
+        chunk_index=chunk_index_p1,
+        report_text=original_chunk_text,
+        book_name=book_name_p1,
+        predicted_label=predicted_label,
+        classification_scores=classification_result['all_scores'],
+        coordinates=p1_coordinates,
+        page_number=p1_page_number,
+        result_with_review=result_with_review,
+        overall_chunk_status=overall_chunk_status,
+        agent_analysis_statuses=agent_analysis_statuses
+    )
+
+    result_document = build_result_document(**result_fields)
+    persist_result(result_document, overall_chunk_status, writer)
+    if fingerprint and overall_chunk_status == AnalysisStatus.COMPLETE.value:
+        # Only complete outcomes are worth copying; pending ones get analysed again
+        store_reusable_result(STAGE_ANALYSIS, content_hash, fingerprint,
+                              reusable_analysis_result(result_document), p1_chunk_uuid)
+
+    print("\n--- Langgraph Workflow Final Output (from State) ---")
+    for agent_name, agent_output_data in result_with_review.get("main_node_output", {}).items():
+        print(f"\n--- Summary for {agent_name} ---\n")
+        output_content = agent_output_data.get('output', {})
+        print(f"  Parsed Output: {output_content.get('problematic_text', 'No problematic text found.')}")
+        print(f"  Observation: {output_content.get('observation', 'N/A')}")
+        print(f"  Recommendation: {output_content.get('recommendation', 'N/A')}")
+        print(f"  Confidence: {agent_output_data.get('confidence', 0)}%")
+        print(f"  Retries: {agent_output_data.get('retries', 0)}")
+        print(f"  Human Review Needed: {agent_output_data.get('human_review', False)}")
+
+    print(f"\n--- Overall Chunk Status: {overall_chunk_status} ---\n")
+    print(f"--- Agent Analysis Statuses (per chunk, all agents included): {agent_analysis_statuses} ---\n")
+    print("Full Result Dictionary (for debugging):\n")
+    print(result_with_review)
+    print("-" * 40)
+    return overall_chunk_status
+
+
+def finalize_analysis(book_id: str, run_analysis: bool, run_classification: bool):
+    """
+    Sets the book's final status once all of its chunks went through analysis.
+    Chunks whose analysis failed or came back incomplete are still Pending; then the
+    book stays Classified (with analysis_pending_chunks) so analysis can be run again.
+    progress.analyzed is recounted from the chunks, in case an increment was lost.
+    """
+    books_collection = get_books_collection()
+    total = get_chunks_collection().count_documents({"doc_id": book_id})
+    pending = get_chunks_collection().count_documents({
         "doc_id": book_id,
-        "analysis_status": "Pending"
+        "analysis_status": {"$ne": AnalysisStatus.COMPLETE.value}
     })
+    books_collection.update_one({"doc_id": book_id}, {"$set": {"progress.analyzed": total - pending}})
+    if pending:
+        print(f"⚠️ {pending} chunks of book {book_id} are still pending analysis; not marking it analysed.")
+        books_collection.update_one(
+            {"doc_id": book_id},
+            {"$set": {
+                "status": "Classified",
+                "lastFinalStatus": "Classified",
+                "analysis_pending_chunks": pending,
+                "endDate": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }}
+        )
+        set_all_agents_status_true()
+        return
 
-    documents_to_process = list(documents_to_process)
+    books_collection.update_one({"doc_id": book_id}, {"$set": {"analysis_pending_chunks": 0}})
+    if run_classification and run_analysis:
+        books_collection.update_one(
+        {"doc_id": book_id},
+        {
+            "$set": {
+                "status": "Processed",
+                "endDate": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+        }
+    )
+    elif(run_analysis):
+        finalize_status(book_id, "Analyzed")
+        set_all_agents_status_true() # Call this at end of run workflow
 
+
+def notify_analysis_started(book_id: str):
     # ✅ Notify frontend that analysis has begun with 0% progress
     try:
         from api.chunks.websocket import notify_analysis_progress
-        total_chunks = chunks_collection.count_documents({"doc_id": book_id})
-        asyncio.run(notify_analysis_progress(book_id, 0, total_chunks, 0))
+        total_chunks = get_progress(book_id).get("total", 0)
+        notify_analysis_progress(book_id, 0, total_chunks, 0)
     except Exception as notify_err:
         print(f"[Analysis WS] Failed to send initial analysis progress: {notify_err}")
 
+
+def run_workflow(book_id: str, run_analysis: bool, run_classification: bool, pdf_path: str):
+    """
+    Run workflow for a specific book by its book_id.
+    Loads agents, builds the graph, and processes all pending chunks
+    that belong to the specified book.
+    """
+    graph = build_analysis_graph()
+    if graph is None:
+        return  # Exit if no agents are loaded
+
+    print(f"Loading chunks for book_id={book_id} from Pipeline 1's database...")
+
+    chunks_collection = get_chunks_collection()
+
+    # ✅ Only fetch pending chunks for the specific book
+    documents_to_process = chunks_collection.find({
+        "doc_id": book_id,
+        "analysis_status": AnalysisStatus.PENDING.value
+    })
+
+    documents_to_process = list(documents_to_process)
+
+    notify_analysis_started(book_id)
+
     if documents_to_process:
         print(f"Found {len(documents_to_process)} PENDING chunks for book {book_id} to process.")
-        for doc_to_process in documents_to_process:
-            if not doc_to_process:
-                continue
-
-            # Extract fields
-            p1_chunk_uuid = doc_to_process.get("chunk_id")
-            doc_id_p1 = doc_to_process.get("doc_id")
-            chunk_index_p1 = doc_to_process.get("chunk_index")
-            original_chunk_text = doc_to_process.get("text")
-            book_name_p1 = doc_to_process.get("doc_name", "Unknown Document")
-            p1_coordinates = doc_to_process.get("coordinates")
-            p1_page_number = doc_to_process.get("page_number")
-
-            merged_text_for_id = original_chunk_text
-
-            print(f"\n--- Processing Chunk ID: {p1_chunk_uuid} (Document: '{book_name_p1}', P1 Doc ID: {doc_id_p1}, P1 Chunk Index: {chunk_index_p1}) ---")
-            print(f"Original Chunk Text: {original_chunk_text}\n")
-
-            classification_result = classify_text(merged_text_for_id)
-            predicted_label = classification_result['predicted_label']
-            print(f"--- Predicted Label for Chunk: \"{predicted_label}\" (Confidence: {classification_result['confidence']}%) ---")
-
-            report_data = {
-                "report_text": merged_text_for_id,
-                "metadata": {
-                    "doc_id": doc_id_p1,
-                    "chunk_index": chunk_index_p1,
-                    "title": book_name_p1,
-                    "chunk_id": p1_chunk_uuid,
-                    "predicted_label": predicted_label,
-                    "classification_scores": classification_result['all_scores'],
-                    "coordinates": p1_coordinates,
-                    "page_number": p1_page_number,
-
-                },
-                "main_node_output": {},
-                "aggregate": [],
-                "final_decision_report": "",
-                "current_agent_name": "",
-                "current_agent_input_prompt": "",
-                "current_agent_raw_output": "",
-                "current_agent_parsed_output": {},
-                "current_agent_confidence": 0,
-                "current_agent_retries": 0,
-                "current_agent_human_review": False
-            }
+        writer = ResultWriter()
+        fingerprint = analysis_fingerprint() if is_result_reuse_enabled() else None
+        try:
+            for doc_to_process in documents_to_process:
+                if not doc_to_process:
+                    continue
+                check_lease()
+                analyze_chunk(graph, doc_to_process, writer, fingerprint)
+        finally:
+            writer.close()
 
-            print(f"\n--- Langgraph Workflow Input for Chunk ID: {p1_chunk_uuid} ---")
-            print("Initial state before agent execution. Individual agents will now perform their internal evaluation loops.")
-            print("-" * 40)
-
-            result_with_review = graph.invoke(report_data)
-
-            overall_chunk_status = "Complete"
-            agent_analysis_statuses = {agent_name: "Pending" for agent_name in available_agents.keys()}
-
-            for agent_name, agent_data in result_with_review.get("main_node_output", {}).items():
-                agent_output = agent_data.get("output", {})
-
-                if (
-                    agent_output.get("problematic_text") is None
-                    and agent_output.get("observation") is None
-                    and agent_output.get("recommendation") is None
-                ):
-                    agent_analysis_statuses[agent_name] = "Complete"
-                else:
-                    is_output_complete = True
-                    if not isinstance(agent_output, dict):
-                        is_output_complete = False
-                    else:
-                        if "issues_found" in agent_output and not isinstance(agent_output.get("issues_found"), bool):
-                            is_output_complete = False
-                        if "observation" in agent_output and not isinstance(agent_output.get("observation"), str):
-                            is_output_complete = False
-                        if "recommendation" in agent_output and not isinstance(agent_output.get("recommendation"), str):
-                            is_output_complete = False
-
-                    if is_output_complete:
-                        agent_analysis_statuses[agent_name] = "Complete"
-                    else:
-                        agent_analysis_statuses[agent_name] = "Pending"
-                        overall_chunk_status = "Pending"
-
-            save_results_to_mongo(
-                chunk_uuid=p1_chunk_uuid,
-                doc_id=doc_id_p1,
-                chunk_index=chunk_index_p1,
-                report_text=original_chunk_text,
-                book_name=book_name_p1,
-                predicted_label=predicted_label,
-                classification_scores=classification_result['all_scores'],
-                coordinates=p1_coordinates,
-                page_number=p1_page_number,
-                result_with_review=result_with_review,
-                overall_chunk_status=overall_chunk_status,
-                agent_analysis_statuses=agent_analysis_statuses
-            )
-
-            update_chunk_analysis_status(
-                doc_id=doc_id_p1,
-                chunk_id=p1_chunk_uuid,
-                analysis_status=overall_chunk_status
-            )
-
-            print("\n--- Langgraph Workflow Final Output (from State) ---")
-            for agent_name, agent_output_data in result_with_review.get("main_node_output", {}).items():
-                print(f"\n--- Summary for {agent_name} ---\n")
-                output_content = agent_output_data.get('output', {})
-                print(f"  Parsed Output: {output_content.get('problematic_text', 'No problematic text found.')}")
-                print(f"  Observation: {output_content.get('observation', 'N/A')}")
-                print(f"  Recommendation: {output_content.get('recommendation', 'N/A')}")
-                print(f"  Confidence: {agent_output_data.get('confidence', 0)}%")
-                print(f"  Retries: {agent_output_data.get('retries', 0)}")
-                print(f"  Human Review Needed: {agent_output_data.get('human_review', False)}")
-
-            print(f"\n--- Overall Chunk Status: {overall_chunk_status} ---\n")
-            print(f"--- Agent Analysis Statuses (per chunk, all agents included): {agent_analysis_statuses} ---\n")
-            print("Full Result Dictionary (for debugging):\n")
-            print(result_with_review)
-            print("-" * 40)
-        
-        
-        if run_classification and run_analysis:
-            books_collection = get_books_collection()
-            books_collection.update_one(
-            {"doc_id": book_id},
-            {
-                "$set": {
-                    "status": "Processed",
-                    "endDate": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-            }
-        )
-        elif(run_analysis):
-            finalize_status(book_id, "Analyzed")
-            set_all_agents_status_true() # Call this at end of run workflow
-    
-        
+        finalize_analysis(book_id, run_analysis, run_classification)
 
     else:
-        print(f"No PENDING chunks found for book_id={book_id}. All chunks might be processed, or none were pending.")
\ No newline at end of file
+        print(f"No PENDING chunks found for book_id={book_id}. All chunks might be processed, or none were pending.")
+
+
+def is_pipelined_analysis_enabled() -> bool:
+    return os.getenv("PIPELINED_ANALYSIS", "False") == "True"
+
+
+class AnalysisStage:
+    """
+    Analysis stage of the pipelined mode: classification hands over each chunk as
+    soon as it is classified, and worker threads analyse it while classification
+    moves on. The hand-over queue is bounded (ANALYSIS_BUFFER_SIZE), so a slow
+    analysis stage throttles classification instead of piling up chunks in memory.
+
+    on_analyzed(chunk) is called once the chunk's result is stored (after the writer's
+    flush), or right away when there is nothing to store because its analysis failed
+    or the chunk was not pending.
+    """
+
+    def __init__(self, book_id: str, on_analyzed=None, buffer_size: int = None, workers: int = None):
+        self.book_id = book_id
+        self.on_analyzed = on_analyzed
+        self.graph = build_analysis_graph()
+        self.fingerprint = analysis_fingerprint() if is_result_reuse_enabled() else None
+        self._in_flight = {}  # chunk_id -> submitted chunk, until its result is written
+        self._in_flight_lock = threading.Lock()
+        self.writer = ResultWriter(on_written=self._written)
+        self.buffer = queue.Queue(maxsize=buffer_size or int(os.getenv("ANALYSIS_BUFFER_SIZE", "8")))
+        self.threads = [
+            threading.Thread(target=self._consume, daemon=True, name=f"analysis-stage-{book_id}-{i}")
+            for i in range(workers or int(os.getenv("ANALYSIS_STAGE_WORKERS", "1")))
+        ]
+        notify_analysis_started(book_id)
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, chunk: dict):
+        """Queues a classified chunk for analysis; blocks while the buffer is full."""
+        self.buffer.put(chunk)
+
+    def _finish(self, chunk: dict):
+        if self.on_analyzed:
+            try:
+                self.on_analyzed(chunk)
+            except Exception as e:
+                print(f"[Analysis Stage] on_analyzed failed for chunk {chunk.get('chunk_id')}: {e}")
+
+    def _written(self, result_document: dict):
+        with self._in_flight_lock:
+            chunk = self._in_flight.pop(result_document["Chunk_ID"], None)
+        if chunk is not None:
+            self._finish(chunk)
+
+    def _consume(self):
+        chunks_collection = get_chunks_collection()
+        while True:
+            chunk = self.buffer.get()
+            if chunk is None:
+                return
+            buffered = False
+            try:
+                if self.graph is not None:
+                    doc_to_process = chunks_collection.find_one({
+                        "chunk_id": chunk["chunk_id"],
+                        "analysis_status": AnalysisStatus.PENDING.value
+                    })
+                    if doc_to_process:
+                        with self._in_flight_lock:
+                            self._in_flight[chunk["chunk_id"]] = chunk
+                        analyze_chunk(self.graph, doc_to_process, self.writer, self.fingerprint)
+                        buffered = True
+            except Exception as e:
+                # Left as Pending so a later analysis run picks it up
+                print(f"[Analysis Stage] Failed to analyse chunk {chunk.get('chunk_id')}: {e}")
+            finally:
+                if not buffered:
+                    with self._in_flight_lock:
+                        self._in_flight.pop(chunk["chunk_id"], None)
+                    self._finish(chunk)
+
+    def close(self):
+        """Waits until every submitted chunk has been analysed and stored, and stops the worker threads."""
+        for _ in self.threads:
+            self.buffer.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.writer.close()
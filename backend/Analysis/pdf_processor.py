@@ -1,5 +1,6 @@
 from typing import Dict, List
 from db.mongo import get_chunks_collection, get_books_collection
+from models.chunk_status import AnalysisStatus
 
 # Assuming Pipeline 1's documents collection is named 'documents'
 DOCUMENTS_COLLECTION_NAME = "documents"
@@ -117,7 +118,7 @@ def get_next_pending_pipeline1_chunk() -> Dict:
         pdf_collection = get_chunks_collection()
         # Find one chunk with analysis_status 'Pending', ordered by doc_id and chunk_index
         pending_chunk = pdf_collection.find_one(
-            {"analysis_status": "pending"},
+            {"analysis_status": AnalysisStatus.PENDING.value},
             sort=[('doc_id', 1), ('chunk_index', 1)]
         )
     except Exception as e:
@@ -130,7 +131,7 @@ def get_next_pending_pipeline1_chunk() -> Dict:
 
 def get_all_pending_pipeline1_chunks_details() -> List[Dict]:
     """
-    Retrieves all chunks with 'analysis_status' as "Pending" or "pending" (case-insensitive)
+    Retrieves all chunks with 'analysis_status' as "Pending"
     from the collection where Pipeline 1 stores its data. Adds the associated document name
     to each chunk dictionary. Returns a list of dictionaries, where each dictionary is a
     pending chunk (P1 schema + doc_name).
@@ -139,9 +140,9 @@ def get_all_pending_pipeline1_chunks_details() -> List[Dict]:
     try:
         pdf_collection = get_chunks_collection()
 
-        # Case-insensitive match for "Pending"
+        # Statuses are normalized on write, so an exact (indexed) match is enough
         all_pending_chunks = list(pdf_collection.find(
-            {"analysis_status": {"$regex": "^pending$", "$options": "i"}},
+            {"analysis_status": AnalysisStatus.PENDING.value},
             {"_id": 1, "text": 1, "doc_id": 1, "chunk_index": 1, "coordinates": 1, "page_number": 1}, 
             sort=[('doc_id', 1), ('chunk_index', 1)]
         ))
@@ -1,19 +1,20 @@
 # text_classifier.py
-from transformers import pipeline
+from utils.model_registry import register_model, get_model
 
 def initialize_classifier():
     """
     Initializes and returns the zero-shot classification pipeline.
-    This function helps avoid reloading the model multiple times if
-    you're classifying many texts.
+    Registered with the model registry, so it is loaded once per process
+    on first use (or warmup) rather than at import time.
     """
+    from transformers import pipeline
+
     print("Loading zero-shot classifier (facebook/bart-large-mnli)... This may take a moment.")
     classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
     print("Classifier loaded successfully!")
     return classifier
 
-# Initialize the classifier once when the module is imported
-classifier = initialize_classifier()
+register_model("zero_shot_classifier", initialize_classifier)
 
 # Define your labels
 labels = [
@@ -57,6 +58,7 @@ def classify_text(text: str) -> dict:
         }
 
     # Perform the zero-shot classification
+    classifier = get_model("zero_shot_classifier")
     result = classifier(text, candidate_labels=labels, hypothesis_template=template, multi_label=False)
 
     # The result contains sorted labels and scores, with the highest confidence first
@@ -3,8 +3,19 @@ import os
 import json
 import time
 from .graph import invoke_graph
+from utils.llm_cassette import CassetteMiss
+from utils.llm_cache import refresh_llm_cache
+from jobs.job_queue import check_lease
+from db.result_reuse import (
+    is_result_reuse_enabled, text_hash, classification_fingerprint, find_reusable_result, store_reusable_result,
+    STAGE_CLASSIFICATION
+)
 from .utility import create_pdf_to_html, extract_classification_info
-from .database_operations import fetch_next_pending_chunk, fetch_chunk_context, mark_chunk_as_done, get_chunk_id, save_classification_result, mark_document_done, get_pending_documents
+from .database_operations import (
+    fetch_chunk_context, mark_chunk_as_done, save_classification_result, mark_document_done,
+    claim_chunk_range, extend_chunk_range_lease, has_unfinished_chunks, claim_document_completion,
+    iter_chunks_with_context
+)
 
 
 done = []
@@ -34,59 +45,121 @@ def supervisor_loop(doc_id, agent_list, run_classification=True, run_analysis=Tr
         run_workflow(doc_id, run_analysis=run_analysis, run_classification=run_classification, pdf_path= pdf_path)
         return doc_id
 
-    # If only classification is requested, run classification loop
+    # Classification: lease ranges of pending chunks until none are left. Several workers
+    # can run this loop for the same book; each chunk is processed by exactly one of them.
     if run_classification:
-        while True:
-            time.sleep(int(os.getenv("DELAY")))
-            chunk_index = fetch_next_pending_chunk(doc_id)
-            if chunk_index is None:
-                # print(f"Indexing of document: {doc_id} complete!\nAll chunks processed.")
-                # create_pdf_to_html(doc_id)
-                mark_document_done(doc_id, run_classification, run_analysis, pdf_path= pdf_path)
-                break
-
-            print(f"Processing chunk {chunk_index}...")
-            context = fetch_chunk_context(doc_id, chunk_index)
-            current_text = get_text_from_context(context["current"])
-
-            # Retry until valid JSON is obtained
+        from Analysis.mains1 import AnalysisStage, is_pipelined_analysis_enabled
+        pipelined = run_analysis and is_pipelined_analysis_enabled()
+        analysis_stage = None
+
+        def finish_chunk(chunk):
+            mark_chunk_as_done(doc_id, chunk["chunk_index"])
+            print(f"------> chunk: {chunk['chunk_index']} marked as done")
+            extend_chunk_range_lease(chunk["lease_token"])
+
+        try:
             while True:
-                try:
-                    results = invoke_graph(current_text, agent_list)
-                    if isinstance(results, str):
-                        results = json.loads(results)
+                claimed = claim_chunk_range(doc_id)
+                if claimed is None:
+                    if analysis_stage is not None:
+                        # Our in-flight chunks stay 'processing' until analysed; drain them first
+                        stage, analysis_stage = analysis_stage, None
+                        stage.close()
+                    if has_unfinished_chunks(doc_id):
+                        # Other workers still hold ranges; wait in case one of their leases expires
+                        time.sleep(int(os.getenv("CHUNK_POLL_INTERVAL", "10")))
+                        continue
+                    if claim_document_completion(doc_id):
+                        # print(f"Indexing of document: {doc_id} complete!\nAll chunks processed.")
+                        # create_pdf_to_html(doc_id)
+                        mark_document_done(doc_id, run_classification, run_analysis, pdf_path= pdf_path, analysis_already_run=pipelined)
                     break
-                except Exception as e:
-                    print(f"JSON decode error: {e}, retrying chunk {chunk_index}...")
 
-            classifications = extract_classification_info(results)
-            valid_results = []
+                print(f"Claimed chunks {claimed['chunks'][0]['chunk_index']}-{claimed['chunks'][-1]['chunk_index']} of {doc_id}")
+                if pipelined and analysis_stage is None:
+                    analysis_stage = AnalysisStage(doc_id, on_analyzed=finish_chunk)
 
-            # Process classification parsing and validation
-            try:
-                valid_results.clear()
-                for classes in classifications:
-                    label = classes["classification"].lower()
-                    confidence = float(classes["confidence_score"])
-                    agent_name = classes["name"]
+                for chunk, context in iter_chunks_with_context(doc_id, claimed["chunks"]):
+                    check_lease()
+                    chunk["lease_token"] = claimed["lease_token"]
+                    time.sleep(int(os.getenv("DELAY")))
+                    classify_chunk(doc_id, chunk["chunk_index"], chunk["chunk_id"], agent_list, context=context)
+                    if analysis_stage is not None:
+                        # Marked done by the analysis stage once the chunk has been analysed
+                        analysis_stage.submit(chunk)
+                    else:
+                        finish_chunk(chunk)
+        finally:
+            if analysis_stage is not None:
+                analysis_stage.close()
 
-                    if "non" in label:
-                        continue
-                    if label in agent_name and confidence >= 70:
-                        print("------> update valid results")
-                        valid_results.append(classes)
-            except Exception as e:
-                print(f"Classification validation error: {e}, retrying parsing for chunk {chunk_index}...")
-                    
-            chunk_id = get_chunk_id(doc_id, chunk_index)
-            print("------> got chunk id")
+    print("Loop Ended")
+    return doc_id
+
+
+def classify_chunk(doc_id, chunk_index, chunk_id, agent_list, context=None):
+    """
+    Runs the classification graph on one chunk and stores the validated results.
+    context comes from iter_chunks_with_context; it is fetched for the chunk when not given.
+    """
+    print(f"Processing chunk {chunk_index}...")
+    if context is None:
+        context = fetch_chunk_context(doc_id, chunk_index)
+    current_text = get_text_from_context(context["current"])
+
+    # A chunk with the same text was already classified by the same agents (possibly in another book)
+    reuse = is_result_reuse_enabled()
+    if reuse:
+        content_hash = text_hash(current_text)
+        fingerprint = classification_fingerprint(agent_list)
+        reused = find_reusable_result(STAGE_CLASSIFICATION, content_hash, fingerprint)
+        if reused is not None:
             if chunk_id:
-                save_classification_result(chunk_id, valid_results)
-                print("------> saved classification result")
+                save_classification_result(chunk_id, reused["result"], reused_from=reused.get("source_chunk_id"))
+            print(f"------> reused classification of identical chunk {reused.get('source_chunk_id')}")
+            return reused["result"]
 
-            mark_chunk_as_done(doc_id, chunk_index)
-            print(f"------> chunk: {chunk_index} marked as done")
+    # Retry until valid JSON is obtained; retries must not get the cached bad answer again
+    attempt = 0
+    while True:
+        try:
+            with refresh_llm_cache(attempt > 0):
+                results = invoke_graph(current_text, agent_list)
+            if isinstance(results, str):
+                results = json.loads(results)
+            break
+        except CassetteMiss:
+            # Replaying: asking again would miss again
+            raise
+        except Exception as e:
+            attempt += 1
+            print(f"JSON decode error: {e}, retrying chunk {chunk_index}...")
 
-    print("Loop Ended")
-    return doc_id
+    classifications = extract_classification_info(results)
+    valid_results = []
+    validated = False
+
+    # Process classification parsing and validation
+    try:
+        valid_results.clear()
+        for classes in classifications:
+            label = classes["classification"].lower()
+            confidence = float(classes["confidence_score"])
+            agent_name = classes["name"]
+
+            if "non" in label:
+                continue
+            if label in agent_name and confidence >= 70:
+                print("------> update valid results")
+                valid_results.append(classes)
+        validated = True
+    except Exception as e:
+        print(f"Classification validation error: {e}, retrying parsing for chunk {chunk_index}...")
 
+    if chunk_id:
+        save_classification_result(chunk_id, valid_results)
+        print("------> saved classification result")
+        if reuse and validated:
+            # A partially validated result must not be copied to other chunks
+            store_reusable_result(STAGE_CLASSIFICATION, content_hash, fingerprint, valid_results, chunk_id)
+    return valid_results
@@ -2,61 +2,85 @@
 import os
 import uuid
 import json
-from pymongo import ASCENDING # Import ASCENDING for sorting
+import socket
+from collections import deque
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, UpdateOne # Import ASCENDING for sorting
 from dotenv import load_dotenv
 from typing import List, Dict, Any 
 from bson import ObjectId
+from models.chunk_status import ChunkStatus, AnalysisStatus
 from db.mongo import (
     get_books_collection,
     get_chunks_collection,
     set_all_agents_status_true,
-    finalize_status
+    finalize_status,
+    increment_progress,
+    progress_percent
 )
 
-from Analysis.mains1 import run_workflow
+from Analysis.mains1 import run_workflow, finalize_analysis
 
-import asyncio
-from api.chunks.websocket_manager import get_client
+from api.chunks.websocket_manager import publish_classification_progress, publish_chunk_result, CHANNEL_CLASSIFICATION
 
 load_dotenv(override=True)
 
+# Chunk-range sharding: workers lease contiguous windows of pending chunks
+CHUNK_RANGE_SIZE = int(os.getenv("CHUNK_RANGE_SIZE", "25"))
+CHUNK_LEASE_SECONDS = int(os.getenv("CHUNK_LEASE_SECONDS", "600"))
+# Neighbouring chunks on each side that make up a chunk's context
+CONTEXT_WINDOW = 2
+
 def insert_document(doc_id: str, chunks: list, summary: str):
+    """
+    Stores the book's chunks and summary. Chunks are upserted on (doc_id, chunk_index),
+    so a retried indexing job overwrites the chunks of the failed attempt (keeping their
+    chunk_ids) instead of adding a second copy.
+    """
     books_collection = get_books_collection()
     chunks_collection = get_chunks_collection()
 
-    # Prepare chunk documents
-    chunk_docs = []
+    # Prepare chunk upserts
+    chunk_ops = []
     for i, chunk in enumerate(chunks):
         # Extracting coordinates and page from the chunk's metadata
         page_number = chunk.metadata.get("page", None)
         coordinates = chunk.metadata.get("coordinates", None)
 
-        chunk_docs.append({
-            "chunk_id": str(uuid.uuid4()),
-            "doc_id": doc_id,
-            "chunk_index": i,
-            "text": chunk.page_content,
-            "page_number": page_number,
-            "coordinates": coordinates,  # <-- NEW: Coordinates are now saved
-            "status": "pending",
-            "analysis_status": "Pending"
-        })
-
-    # Insert all chunks
-    chunks_collection.insert_many(chunk_docs)
+        chunk_ops.append(UpdateOne(
+            {"doc_id": doc_id, "chunk_index": i},
+            {
+                "$set": {
+                    "text": chunk.page_content,
+                    "page_number": page_number,
+                    "coordinates": coordinates,  # <-- NEW: Coordinates are now saved
+                    "status": ChunkStatus.PENDING.value,
+                    "analysis_status": AnalysisStatus.PENDING.value
+                },
+                "$setOnInsert": {"chunk_id": str(uuid.uuid4())}
+            },
+            upsert=True
+        ))
+
+    # Upsert all chunks, and drop any left over from an earlier attempt that produced more
+    if chunk_ops:
+        chunks_collection.bulk_write(chunk_ops, ordered=False)
+    chunks_collection.delete_many({"doc_id": doc_id, "chunk_index": {"$gte": len(chunk_ops)}})
 
     books_collection.update_one(
         {"_id": ObjectId(doc_id)},
         {"$set": {
             "summary": summary,
-            "status": "Pending"
+            "status": "Pending",
+            "classification_completed": False,
+            "progress": {"total": len(chunk_ops), "classified": 0, "analyzed": 0}
         }}
     )
 
     # Notify frontend via websocket that indexing is done
     try:
         from api.chunks.websocket import notify_indexing_done
-        asyncio.run(notify_indexing_done(doc_id))
+        notify_indexing_done(doc_id)
     except Exception as e:
         print(f"[WebSocket Notify] Failed to notify for doc_id {doc_id}: {e}")
 
@@ -66,7 +90,7 @@ def fetch_next_pending_chunk(doc_id):
     """Fetch the next pending chunk index for the given document."""
     chunks_collection = get_chunks_collection()
     chunk = chunks_collection.find_one(
-        {"doc_id": doc_id, "status": "pending"},
+        {"doc_id": doc_id, "status": ChunkStatus.PENDING.value},
         sort=[("chunk_index", 1)]
     )
     return chunk["chunk_index"] if chunk else None
@@ -101,33 +125,157 @@ def fetch_chunk_context(doc_id: str, chunk_index: int):
         "next": next_text
     }
 
-def mark_chunk_as_done(doc_id, chunk_index):
-    """Mark a chunk as done in the database."""
+def _build_context(window: List[Dict[str, Any]], center: int) -> Dict[str, str]:
+    """Same text assembly as fetch_chunk_context, from an in-memory window of sorted chunks."""
+    previous_chunks = window[max(center - CONTEXT_WINDOW, 0):center]
+    next_chunks = window[center + 1:center + 1 + CONTEXT_WINDOW]
+    return {
+        "previous": " ".join([c["text"] for c in previous_chunks]),
+        "current": window[center].get("text", ""),
+        "next": " ".join([c["text"] for c in next_chunks])
+    }
+
+def iter_chunks_with_context(doc_id: str, chunks: List[Dict[str, Any]]):
+    """
+    Yields (chunk, context) for the given chunks in chunk_index order, where context is
+    what fetch_chunk_context would return. The texts of the chunks and their neighbours
+    are read with one sorted cursor over [first - 2, last + 2] and a sliding deque of
+    2 * CONTEXT_WINDOW + 1 chunks, so every text is read once instead of five times.
+    """
+    if not chunks:
+        return
+    wanted = {c["chunk_index"]: c for c in chunks}
     chunks_collection = get_chunks_collection()
-    chunks_collection.update_one(
-        {"doc_id": doc_id, "chunk_index": chunk_index},
-        {"$set": {"status": "done"}}
+    cursor = chunks_collection.find(
+        {
+            "doc_id": doc_id,
+            "chunk_index": {"$gte": min(wanted) - CONTEXT_WINDOW, "$lte": max(wanted) + CONTEXT_WINDOW}
+        },
+        {"chunk_index": 1, "text": 1, "_id": 0}
+    ).sort("chunk_index", ASCENDING)
+
+    window = deque(maxlen=2 * CONTEXT_WINDOW + 1)
+    for row in cursor:
+        window.append(row)
+        # The chunk CONTEXT_WINDOW rows back now has all of its next neighbours
+        if len(window) > CONTEXT_WINDOW:
+            rows = list(window)
+            center = len(rows) - CONTEXT_WINDOW - 1
+            if rows[center]["chunk_index"] in wanted:
+                yield wanted[rows[center]["chunk_index"]], _build_context(rows, center)
+
+    # The last rows have fewer than CONTEXT_WINDOW chunks after them
+    rows = list(window)
+    for center in range(max(len(rows) - CONTEXT_WINDOW, 0), len(rows)):
+        if rows[center]["chunk_index"] in wanted:
+            yield wanted[rows[center]["chunk_index"]], _build_context(rows, center)
+
+def _claimable_chunks_query(doc_id: str, now: datetime):
+    return {
+        "doc_id": doc_id,
+        "$or": [
+            {"status": ChunkStatus.PENDING.value},
+            # Range leased by a worker that died or hung
+            {"status": ChunkStatus.PROCESSING.value, "lease_expires_at": {"$lt": now}}
+        ]
+    }
+
+def claim_chunk_range(doc_id: str, range_size: int = None, max_tries: int = 3):
+    """
+    Leases the next window of up to range_size pending chunks of a document
+    (by chunk_index) to the caller. Every chunk moves pending -> processing in its
+    own atomic update, so concurrent workers racing for the same window split it
+    without ever processing a chunk twice.
+    Returns {"lease_token", "chunks"} or None when nothing is claimable.
+    """
+    chunks_collection = get_chunks_collection()
+    range_size = range_size or CHUNK_RANGE_SIZE
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    for _ in range(max_tries):
+        now = datetime.utcnow()
+        first = chunks_collection.find_one(
+            _claimable_chunks_query(doc_id, now),
+            {"chunk_index": 1, "_id": 0},
+            sort=[("chunk_index", 1)]
+        )
+        if not first:
+            return None
+
+        start = first["chunk_index"]
+        lease_token = uuid.uuid4().hex
+        window_query = _claimable_chunks_query(doc_id, now)
+        window_query["chunk_index"] = {"$gte": start, "$lt": start + range_size}
+        chunks_collection.update_many(
+            window_query,
+            {"$set": {
+                "status": ChunkStatus.PROCESSING.value,
+                "lease_token": lease_token,
+                "lease_owner": owner,
+                "lease_expires_at": now + timedelta(seconds=CHUNK_LEASE_SECONDS)
+            }}
+        )
+
+        claimed = list(chunks_collection.find(
+            {"doc_id": doc_id, "lease_token": lease_token, "status": ChunkStatus.PROCESSING.value},
+            {"_id": 0, "chunk_id": 1, "chunk_index": 1, "page_number": 1, "coordinates": 1}
+        ).sort("chunk_index", 1))
+        if claimed:
+            return {"lease_token": lease_token, "chunks": claimed}
+        # Another worker won the whole window; look for the next one
+
+    return None
+
+def extend_chunk_range_lease(lease_token: str):
+    """Pushes back the lease expiry of the chunks still being processed under lease_token."""
+    chunks_collection = get_chunks_collection()
+    chunks_collection.update_many(
+        {"lease_token": lease_token, "status": ChunkStatus.PROCESSING.value},
+        {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=CHUNK_LEASE_SECONDS)}}
     )
-    total = get_total_chunks(doc_id)
-    done = get_done_chunks_count(doc_id) 
-    progress = int((done / total) * 100)
-    notify_client(doc_id, progress, total, done)
 
-def notify_client(book_id: str, progress: int, total: int, done: int):
-    ws = get_client(book_id)
-    if ws:
-        try:
-            asyncio.run(ws.send_json({"progress": progress, "total": total, "done": done}))
-        except Exception as e:
-            print(f"Failed to send to client: {e}")
-
-def get_total_chunks(doc_id):
+def has_unfinished_chunks(doc_id: str) -> bool:
     chunks_collection = get_chunks_collection()
-    return chunks_collection.count_documents({"doc_id": doc_id})
+    return chunks_collection.find_one({"doc_id": doc_id, "status": {"$ne": ChunkStatus.DONE.value}}, {"_id": 1}) is not None
+
+def claim_document_completion(doc_id: str) -> bool:
+    """
+    Returns True for exactly one caller once every chunk of the document is done.
+    The classification_completed flag flips atomically, so only the worker that
+    flips it runs mark_document_done / finalize_status.
+    """
+    if has_unfinished_chunks(doc_id):
+        return False
+    books_collection = get_books_collection()
+    result = books_collection.update_one(
+        {"_id": ObjectId(doc_id), "classification_completed": {"$ne": True}},
+        {"$set": {"classification_completed": True}}
+    )
+    return result.modified_count == 1
 
-def get_done_chunks_count(doc_id):
+def mark_chunk_as_done(doc_id, chunk_index):
+    """Mark a chunk as done in the database."""
     chunks_collection = get_chunks_collection()
-    return chunks_collection.count_documents({"doc_id": doc_id, "status": "done"})
+    result = chunks_collection.update_one(
+        {"doc_id": doc_id, "chunk_index": chunk_index, "status": {"$ne": ChunkStatus.DONE.value}},
+        {
+            "$set": {"status": ChunkStatus.DONE.value},
+            "$unset": {"lease_token": "", "lease_owner": "", "lease_expires_at": ""}
+        }
+    )
+    if result.modified_count == 0:
+        return  # Already counted
+
+    counters = increment_progress(doc_id, "classified")
+    total = counters.get("total", 0)
+    done = counters.get("classified", 0)
+    notify_client(doc_id, progress_percent(done, total), total, done)
+
+def notify_client(book_id: str, progress: int, total: int, done: int):
+    try:
+        publish_classification_progress(book_id, progress, total, done)
+    except Exception as e:
+        print(f"Failed to send to client: {e}")
 
 def get_chunk_id(doc_id: str, chunk_index: int):
     """Retrieve chunk_id based on doc_id and chunk_index."""
@@ -138,17 +286,37 @@ def get_chunk_id(doc_id: str, chunk_index: int):
     )
     return chunk["chunk_id"] if chunk else None
 
-def save_classification_result(chunk_id: str, classification_results: list):
-    """Save classification results for a chunk and mark status as complete."""
+def save_classification_result(chunk_id: str, classification_results: list, reused_from: str = None):
+    """
+    Save classification results for a chunk and mark status as complete.
+    reused_from is the chunk the results were copied from (db/result_reuse.py).
+    """
     chunks_collection = get_chunks_collection()
-    chunks_collection.update_one(
+    chunk = chunks_collection.find_one_and_update(
         {"chunk_id": chunk_id},
         {
             "$set": {
-                "classification": classification_results
+                "classification": classification_results,
+                "classification_reused": reused_from is not None,
+                "classification_reused_from": reused_from
             }
-        }
+        },
+        projection={"_id": 0, "doc_id": 1, "chunk_index": 1, "page_number": 1, "coordinates": 1}
     )
+    if chunk and reused_from is not None:
+        increment_progress(chunk["doc_id"], "reused_classification")
+    if chunk:
+        publish_chunk_result(CHANNEL_CLASSIFICATION, chunk["doc_id"], {
+            "kind": "classification",
+            "chunk_id": chunk_id,
+            "chunk_index": chunk.get("chunk_index"),
+            "page_number": chunk.get("page_number"),
+            "coordinates": chunk.get("coordinates"),
+            "labels": [
+                {"classification": c.get("classification"), "confidence_score": c.get("confidence_score")}
+                for c in classification_results if isinstance(c, dict)
+            ]
+        })
  
 def extract_results_for_pdf(doc_id: str) -> List[Dict[str, Any]]:
     """
@@ -216,19 +384,15 @@ def extract_summary_for_pdf(doc_id):
         "class_counts": class_counts
     }
 
-def mark_document_done(doc_id, run_classification:bool ,run_analysis=True, pdf_path=""):
-    """Update the status of a document to 'Processed' regardless of current status."""
+def mark_document_done(doc_id, run_classification:bool ,run_analysis=True, pdf_path="", analysis_already_run=False):
+    """
+    Update the status of a document to 'Processed' regardless of current status.
+    analysis_already_run is set by the pipelined mode, where chunks were analysed
+    while classification was still running, so only the final status is left to set.
+    """
     books_collection = get_books_collection()
     chunks_collection = get_chunks_collection()
 
-    try:
-        chunks_collection.update_many(
-            {"doc_id": doc_id, "analysis_status": {"$in": ["pending", "Pending", "PENDING"]}},
-            {"$set": {"analysis_status": "Pending"}}
-        )
-    except Exception as e:
-        print(f"⚠️ Failed to normalize analysis_status for doc_id {doc_id}: {e}")
-
     if run_classification and not run_analysis:
         finalize_status(book_id=doc_id,new_status= "Classified")
         
@@ -251,7 +415,9 @@ def mark_document_done(doc_id, run_classification:bool ,run_analysis=True, pdf_p
     )
 
     # Only run workflow if analysis is requested
-    if run_analysis:
+    if run_analysis and analysis_already_run:
+        finalize_analysis(doc_id, run_analysis=run_analysis, run_classification=run_classification)
+    elif run_analysis:
         run_workflow(book_id=doc_id, run_analysis=run_analysis, run_classification=run_classification, pdf_path= pdf_path)
 
     set_all_agents_status_true() # Call this at end of run workflow
@@ -4,6 +4,7 @@ from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from .summarization import summarize_pdf
 from .database_operations import insert_document
+from jobs.job_queue import check_lease
 import os
 
 
@@ -108,7 +109,10 @@ def index(file_path: str, book_id: str, chunk_size: int = 1000):
 
         # Convert list of strings into a single summary string
         summary = summarize_pdf(summary_chunks_text)
-        
+
+        # Summarising takes a while; don't write chunks if another worker took the job over
+        check_lease()
+
         # Pass the chunks and combined summary to the DB
         indexed_doc_id = insert_document(book_id, chunks=chunks, summary=summary)
 
@@ -117,6 +121,7 @@ def index(file_path: str, book_id: str, chunk_size: int = 1000):
         
     except Exception as e:
         print(f"Error during indexing: {e}")
+        raise  # Let the job queue retry or fail the job
     finally:
         # Clean up temporary file
         if os.path.exists(file_path):
@@ -1,15 +1,23 @@
 import os
 from dotenv import load_dotenv
 from langchain.chat_models import ChatOpenAI
+from utils.llm_cassette import get_llm_cassette
+from utils.llm_cache import get_llm_response_cache
 
 load_dotenv(override=True)
 
+LLM_MODEL = os.getenv("LLM_MODEL")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+
 LLAMA = ChatOpenAI(
-    model=os.getenv("LLM_MODEL"),  # e.g., llama-3.1-8b-instant
+    model=LLM_MODEL,  # e.g., llama-3.1-8b-instant
     openai_api_key=os.getenv("LLM_API_KEY", "EMPTY"),  # Use EMPTY or dummy key if local
     openai_api_base=os.getenv("LLM_API_BASE"),
-    temperature=float(os.getenv("LLM_TEMPERATURE", "0.7")),
+    temperature=LLM_TEMPERATURE,
     max_tokens=None,
     request_timeout=30,
     max_retries=2,
+    # Record/replay cassette (utils/llm_cassette.py) or the persistent response cache
+    # (utils/llm_cache.py); None when both are off. A cassette takes precedence.
+    cache=get_llm_cassette() or get_llm_response_cache(LLM_MODEL, LLM_TEMPERATURE),
 )
\ No newline at end of file
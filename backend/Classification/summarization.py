@@ -1,9 +1,8 @@
 import fitz  # PyMuPDF
 import re
-import torch
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
 # from database_operations import extract_results_for_pdf # <-- Yeh line hata di gayi thi
 from .models import LLAMA
+from utils.model_registry import register_model, get_model
 
 # 1. PDF Text Extraction
 def extract_text_from_pdf(pdf_path):
@@ -23,23 +22,33 @@ def split_into_chunks(text, max_words=450):
     words = text.split()
     return [' '.join(words[i:i+max_words]) for i in range(0, len(words), max_words)]
 
-# 4. Load summarization model and tokenizer
-print("Checking for CUDA...")
-device = 0 if torch.cuda.is_available() else -1
-print("CUDA Available:", torch.cuda.is_available())
-if device == 0:
-    print("Using GPU:", torch.cuda.get_device_name(0))
-else:
-    print("Using CPU")
-
-print("Loading T5-Base summarizer...")
-model_name = "t5-base"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-summarizer = pipeline("summarization", model=model, tokenizer=tokenizer, device=device)
+# 4. Load summarization model and tokenizer (lazily, through the model registry)
+def load_summarizer():
+    import torch
+    from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+
+    print("Checking for CUDA...")
+    device = 0 if torch.cuda.is_available() else -1
+    print("CUDA Available:", torch.cuda.is_available())
+    if device == 0:
+        print("Using GPU:", torch.cuda.get_device_name(0))
+    else:
+        print("Using CPU")
+
+    print("Loading T5-Base summarizer...")
+    model_name = "t5-base"
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    summarizer = pipeline("summarization", model=model, tokenizer=tokenizer, device=device)
+    return {"tokenizer": tokenizer, "summarizer": summarizer}
+
+register_model("summarizer", load_summarizer)
 
 # 5. Summarize chunks
 def summarize_chunks(chunks):
+    loaded = get_model("summarizer")
+    tokenizer = loaded["tokenizer"]
+    summarizer = loaded["summarizer"]
     summaries = []
     for i, chunk in enumerate(chunks): # Added enumerate back
         if len(chunk.split()) < 30:
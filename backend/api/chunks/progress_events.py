@@ -0,0 +1,186 @@
+"""Cross-process delivery of progress messages
+
+The process doing the work (a job worker, or another uvicorn worker) usually isn't
+the one holding the browser's websocket. Progress is therefore written as a small
+event to document_classification.progress_events, and every API process runs
+consume_progress_events(), which tails that collection with a change stream and
+hands each event to its local progress hub.
+
+Change streams need a replica set. Against a standalone mongod the consumer falls
+back to polling the collection every PROGRESS_POLL_INTERVAL seconds. A local
+single-node replica set is enough for change streams:
+
+    mongod --replSet rs0 --bind_ip_all
+    mongosh --eval "rs.initiate()"
+
+PROGRESS_DELIVERY=local skips MongoDB and publishes to the in-process hub directly
+(single process setups only). Events expire through a TTL index (see db/indexes.py).
+
+Emitting does not write right away: events are buffered per process and written with
+one insert_many every PROGRESS_EVENT_FLUSH_SECONDS (0 writes each event immediately).
+Progress snapshots of a book superseded within the same batch are not written at all;
+chunk results and other non-coalescable events always are, in order.
+"""
+import asyncio
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from pymongo.errors import OperationFailure
+from db.mongo import get_progress_events_collection
+from db.mongo_async import get_async_progress_events_collection
+
+PROGRESS_DELIVERY = os.getenv("PROGRESS_DELIVERY", "mongo")
+PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", "1"))
+PROGRESS_EVENT_FLUSH_SECONDS = float(os.getenv("PROGRESS_EVENT_FLUSH_SECONDS", "0.25"))
+# Re-read window while polling: events inserted slightly out of order by other processes are still seen
+POLL_OVERLAP_SECONDS = 5
+RETRY_SECONDS = 5
+
+# "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+def coalesce_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drops coalescable events followed by a newer one of the same channel and book, keeping order."""
+    latest = {}
+    for i, event in enumerate(events):
+        if event["coalescable"]:
+            latest[(event["channel"], event["book_id"])] = i
+    return [
+        event for i, event in enumerate(events)
+        if not event["coalescable"] or latest[(event["channel"], event["book_id"])] == i
+    ]
+
+
+class ProgressEventBuffer:
+    """Per-process buffer of progress events, written by a background thread in batches."""
+
+    def __init__(self, flush_seconds: float):
+        self.flush_seconds = flush_seconds
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._pid = None  # The flusher thread does not survive a fork; restart it in the child
+
+    def add(self, event: Dict[str, Any]):
+        if self.flush_seconds <= 0:
+            self._write([event])
+            return
+        with self._lock:
+            self._events.append(event)
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, daemon=True, name="progress-events").start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+        if events:
+            self._write(coalesce_events(events))
+
+    def _write(self, events: List[Dict[str, Any]]):
+        try:
+            get_progress_events_collection().insert_many(events, ordered=True)
+        except Exception as e:
+            print(f"[Progress] Failed to publish {len(events)} progress events: {e}")
+
+
+_buffer = ProgressEventBuffer(PROGRESS_EVENT_FLUSH_SECONDS)
+
+
+def emit_progress_event(channel: str, book_id: str, payload: Any, text: bool = False, coalescable: bool = True):
+    """Publishes a progress message to every API process. Never raises into the caller."""
+    if PROGRESS_DELIVERY == "local":
+        from .websocket_manager import hub
+        hub.publish(channel, book_id, payload, text=text, coalescable=coalescable)
+        return
+    _buffer.add({
+        "channel": channel,
+        "book_id": book_id,
+        "payload": payload,
+        "text": text,
+        "coalescable": coalescable,
+        "created_at": datetime.utcnow()
+    })
+
+
+def _dispatch(event: Dict[str, Any]):
+    from .websocket_manager import hub
+    hub.publish(
+        event["channel"],
+        event["book_id"],
+        event["payload"],
+        text=event.get("text", False),
+        coalescable=event.get("coalescable", True)
+    )
+
+
+async def _watch(collection):
+    """
+    Tails new events with a change stream, resuming after the last one seen on reconnects.
+    The driver already resumes after resumable errors, so a server error reaching this
+    point (e.g. the token fell off the oplog, ChangeStreamHistoryLost) means the token
+    cannot be resumed from; the stream is then reopened at the current time.
+    """
+    resume_token = None
+    while True:
+        try:
+            async with collection.watch([{"$match": {"operationType": "insert"}}], resume_after=resume_token) as stream:
+                print("[Progress] Listening for progress events (change stream)")
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    _dispatch(change["fullDocument"])
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                raise
+            resume_token = None
+            print(f"[Progress] Change stream failed: {e}; reconnecting without resuming")
+            await asyncio.sleep(RETRY_SECONDS)
+        except Exception as e:
+            print(f"[Progress] Change stream failed: {e}; reconnecting")
+            await asyncio.sleep(RETRY_SECONDS)
+
+
+async def _poll(collection):
+    """Fallback for standalone servers: re-reads recent events and skips the ones already dispatched."""
+    print(f"[Progress] Change streams unavailable, polling progress events every {PROGRESS_POLL_INTERVAL}s")
+    since = datetime.utcnow()
+    seen_order = deque(maxlen=10000)
+    seen = set()
+    while True:
+        try:
+            cursor = collection.find(
+                {"created_at": {"$gte": since - timedelta(seconds=POLL_OVERLAP_SECONDS)}}
+            ).sort("created_at", 1)
+            async for event in cursor:
+                since = max(since, event["created_at"])
+                if event["_id"] in seen:
+                    continue
+                if len(seen_order) == seen_order.maxlen:
+                    seen.discard(seen_order[0])
+                seen_order.append(event["_id"])
+                seen.add(event["_id"])
+                _dispatch(event)
+        except Exception as e:
+            print(f"[Progress] Polling progress events failed: {e}")
+        await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+
+
+async def consume_progress_events():
+    """Runs for the lifetime of an API process; cancel the task to stop it."""
+    if PROGRESS_DELIVERY == "local":
+        return
+    collection = get_async_progress_events_collection()
+    try:
+        await _watch(collection)
+    except OperationFailure:
+        await _poll(collection)
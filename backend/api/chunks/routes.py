@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
 from utils.jwt_utils import get_user_from_cookie
-from db.mongo import get_chunks_collection, books_collection, fs
-from .schemas import ChunkResponse, ChunkListResponse, IndexBookRequest
-import tempfile
+from db.mongo import get_chunks_collection, books_collection
+from .schemas import ChunkResponse, ChunkListResponse, ChunkPageResponse, IndexBookRequest
 from bson import ObjectId
-from Classification.index_document import index
+import json
+from jobs.job_queue import enqueue_job, JOB_TYPE_INDEX
+from db.async_repository import find_chunks, count_chunks, find_chunks_page, iter_chunks
+from utils.pagination import encode_cursor, keyset_query, keyset_sort, page_size
+from utils.llm_cache import bypass_llm_cache, get_llm_cache_stats
 
 
 router = APIRouter(prefix="/chunks", tags=["Chunks"])
@@ -18,8 +24,9 @@ def test_model_load():
     """Try to query the LLM; return 200 if ok, 500 if it fails."""
     from Classification.models import LLAMA
     try:
-        # Run a lightweight inference
-        resp = LLAMA.invoke("ping")
+        # Run a lightweight inference; a cached answer would hide an unreachable model
+        with bypass_llm_cache():
+            resp = LLAMA.invoke("ping")
         if resp and hasattr(resp, "content"):
             return {"status": "ok", "response": resp.content}
         else:
@@ -28,8 +35,14 @@ def test_model_load():
         raise HTTPException(status_code=500, detail=f"Model load failed: {e}")
 
 
+@router.get("/llm-cache/stats", dependencies=[Depends(get_user_from_cookie)])
+def llm_cache_stats():
+    """Hit rate and counters of the LLM response cache, across the API and all workers"""
+    return get_llm_cache_stats()
+
+
 @router.post("/index-book/{book_id}")
-def index_book(book_id: str, request: IndexBookRequest, background_tasks: BackgroundTasks):
+def index_book(book_id: str, request: IndexBookRequest):
     # 1. Get the book document
     book = books_collection.find_one({"_id": ObjectId(book_id)})
     if not book or "file_id" not in book:
@@ -37,42 +50,90 @@ def index_book(book_id: str, request: IndexBookRequest, background_tasks: Backgr
     if book.get("status", "").lower() != "unprocessed":
         raise HTTPException(status_code=400, detail="Book status must be 'unprocessed' to index.")
     
-    file_id = book["file_id"]
-
     # 2. Update book status to 'Indexing'
     books_collection.update_one(
         {"_id": ObjectId(book_id)},
         {"$set": {"status": "Indexing"}}
     )
 
-    # 3. Retrieve the file from GridFS and write to a temp file
-    file_obj = fs.get(file_id)
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(file_obj.read())
-        tmp_path = tmp.name
-
-    # 4. Add background task with chunk_size
-    background_tasks.add_task(index, tmp_path, book_id, request.chunk_size)
+    # 3. Queue the indexing job; a worker fetches the file from GridFS itself
+    job_id = enqueue_job(JOB_TYPE_INDEX, book_id, {"chunk_size": request.chunk_size})
 
     return {
-        "message": f"Indexing and classification started for book {book_id}"
+        "message": f"Indexing and classification started for book {book_id}",
+        "job_id": job_id
     }
 
 @router.get("/", response_model=ChunkListResponse, dependencies=[Depends(get_user_from_cookie)])
-def get_all_chunks():
-    chunks_collection = get_chunks_collection()
-    chunks = list(chunks_collection.find())
+async def get_all_chunks():
+    chunks = await find_chunks()
+
+    def build_response():
+        # Convert ObjectId to string
+        for chunk in chunks:
+            chunk["_id"] = str(chunk["_id"])
+        return ChunkListResponse(items=[ChunkResponse(**chunk) for chunk in chunks])
+
+    # Validating the whole collection is CPU bound; keep it off the event loop
+    return await run_in_threadpool(build_response)
+
+CHUNK_FIELDS = set(ChunkResponse.model_fields.keys()) - {"id"}
+
+
+def chunk_projection(fields: Optional[str]):
+    """Projection for a comma separated ?fields= list (all chunk fields when empty)."""
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - CHUNK_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown chunk fields: {sorted(unknown)}")
+    # chunk_index is the pagination key, so it is always returned
+    return {field: 1 for field in requested | {"chunk_index"}}
+
+
+# Chunks of one book, in chunk_index order, one page at a time
+@router.get(
+    "/book/{book_id}",
+    response_model=ChunkPageResponse,
+    response_model_exclude_unset=True,
+    dependencies=[Depends(get_user_from_cookie)]
+)
+async def get_book_chunks_page(
+    book_id: str,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    limit = page_size(limit)
+    query = keyset_query({"doc_id": book_id}, "chunk_index", cursor, descending=False)
+    chunks = await find_chunks_page(query, keyset_sort("chunk_index", descending=False), limit + 1, chunk_projection(fields))
+    has_more = len(chunks) > limit
+    chunks = chunks[:limit]
+
+    return ChunkPageResponse(
+        items=[ChunkResponse(**{**chunk, "_id": str(chunk["_id"])}) for chunk in chunks],
+        limit=limit,
+        next_cursor=encode_cursor(chunks[-1], "chunk_index") if has_more else None
+    )
+
+
+# All chunks of one book as newline-delimited JSON, written as the cursor yields them
+@router.get("/book/{book_id}/stream", dependencies=[Depends(get_user_from_cookie)])
+async def stream_book_chunks(book_id: str, fields: Optional[str] = None):
+    projection = chunk_projection(fields)
 
-    # Convert ObjectId to string
-    for chunk in chunks:
-        chunk["_id"] = str(chunk["_id"])
+    async def ndjson():
+        async for chunk in iter_chunks({"doc_id": book_id}, projection, [("chunk_index", 1), ("_id", 1)]):
+            chunk["_id"] = str(chunk["_id"])
+            yield json.dumps(chunk, default=str) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
-    return ChunkListResponse(items=[ChunkResponse(**chunk) for chunk in chunks])
 
 @router.get("/count", dependencies=[Depends(get_user_from_cookie)])
-def get_chunks_count():
-    chunks_collection = get_chunks_collection()
-    count = chunks_collection.count_documents({})
+async def get_chunks_count():
+    count = await count_chunks()
     return {"count": count}
 
 @router.delete("/", dependencies=[Depends(get_user_from_cookie)])
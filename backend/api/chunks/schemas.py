@@ -25,5 +25,10 @@ class ChunkResponse(BaseModel):
 class ChunkListResponse(BaseModel):
     items: List[ChunkResponse]
 
+class ChunkPageResponse(BaseModel):
+    items: List[ChunkResponse]
+    limit: int
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; None on the last page
+
 class IndexBookRequest(BaseModel):
     chunk_size: int = 3000
@@ -1,18 +1,218 @@
-client_socket = None
-active_book_id = None
-
-def register_client(book_id: str, websocket):
-    global client_socket, active_book_id
-    client_socket = websocket
-    active_book_id = book_id
-
-def unregister_client(websocket):
-    global client_socket, active_book_id
-    if websocket == client_socket:
-        client_socket = None
-        active_book_id = None
-
-def get_client(book_id: str):
-    if book_id == active_book_id:
-        return client_socket
-    return None
+"""Progress hub: fans progress messages out to every websocket watching a book
+
+Channels:
+    classification  -> /ws/progress/{book_id}            {"progress", "total", "done"}
+    index           -> /ws/index-progress/{book_id}      text "done"
+    analysis        -> /ws/analysis-progress/{book_id}   {"analysis_progress", "analysis_total", "analysis_done"}
+
+The classification and analysis channels also carry {"type": "chunk_result", ...}
+deltas as soon as a chunk's results are stored, so reviewers can start on early pages
+while the rest of the book is processed.
+
+Each subscriber gets its own bounded queue drained by a sender task, so one slow
+browser never holds up the others. publish() may be called from any thread: it hands
+the message to the event loop with call_soon_threadsafe and returns immediately.
+When a subscriber's queue is full, the queued progress snapshots are coalesced into
+the newest one (a later snapshot supersedes them). Chunk results and the indexing
+"done" text are never discarded: a subscriber whose queue is full of those is
+disconnected, as is one that keeps falling behind on snapshots.
+
+Sender tasks sleep on their queue, so idle viewers cost nothing. After each send a
+subscriber waits 1 / WS_MAX_UPDATES_PER_SECOND; progress snapshots that arrive
+meanwhile are coalesced into the latest one. A {"type": "heartbeat"} message is sent
+after WS_HEARTBEAT_SECONDS without updates to keep proxies from closing the socket.
+"""
+import asyncio
+import os
+import threading
+from typing import Any, Dict, Optional, Set, Tuple
+from .progress_events import emit_progress_event
+
+CHANNEL_CLASSIFICATION = "classification"
+CHANNEL_INDEX = "index"
+CHANNEL_ANALYSIS = "analysis"
+
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("WS_SUBSCRIBER_QUEUE_SIZE", "64"))
+# Disconnect a subscriber after this many snapshots had to be discarded for it in a row
+SUBSCRIBER_MAX_DROPPED = int(os.getenv("WS_SUBSCRIBER_MAX_DROPPED", "100"))
+MAX_UPDATES_PER_SECOND = float(os.getenv("WS_MAX_UPDATES_PER_SECOND", "4"))
+HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "25"))
+
+HEARTBEAT_MESSAGE = {"type": "heartbeat"}
+
+
+def coalesce(messages):
+    """
+    Keeps every non-coalescable message and only the last coalescable one
+    (the latest progress snapshot), preserving order.
+    """
+    last_snapshot = None
+    for i, (_, _, coalescable) in enumerate(messages):
+        if coalescable:
+            last_snapshot = i
+    return [m for i, m in enumerate(messages) if not m[2] or i == last_snapshot]
+
+
+class Subscriber:
+    def __init__(self, hub: "ProgressHub", channel: str, book_id: str, websocket):
+        self.hub = hub
+        self.channel = channel
+        self.book_id = book_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def offer(self, message: Tuple[str, Any, bool]) -> bool:
+        """Queues a message without waiting. Returns False once the subscriber should be dropped."""
+        if not self.queue.full():
+            self.dropped = 0
+            self.queue.put_nowait(message)
+            return True
+
+        # Make room by coalescing queued snapshots into the newest one
+        pending = [self.queue.get_nowait() for _ in range(self.queue.qsize())] + [message]
+        kept = coalesce(pending)
+        fits = len(kept) <= self.queue.maxsize
+        # When nothing can be discarded (only chunk results and similar are queued),
+        # leave the queue as it was and disconnect the subscriber instead
+        for queued in kept if fits else pending[:-1]:
+            self.queue.put_nowait(queued)
+        if not fits:
+            return False
+        self.dropped += len(pending) - len(kept)
+        return self.dropped < SUBSCRIBER_MAX_DROPPED
+
+    async def _send(self, kind: str, payload: Any):
+        if kind == "text":
+            await self.websocket.send_text(payload)
+        else:
+            await self.websocket.send_json(payload)
+
+    async def run(self):
+        min_interval = 1 / MAX_UPDATES_PER_SECOND if MAX_UPDATES_PER_SECOND > 0 else 0
+        try:
+            while True:
+                try:
+                    first = await asyncio.wait_for(self.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    await self._send("json", HEARTBEAT_MESSAGE)
+                    continue
+
+                batch = [first]
+                while not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                for kind, payload, _ in coalesce(batch):
+                    await self._send(kind, payload)
+
+                if min_interval:
+                    # Updates arriving while we wait are coalesced in the next round
+                    await asyncio.sleep(min_interval)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"[WebSocket] Send to {self.channel}/{self.book_id} subscriber failed: {e}")
+        finally:
+            self.hub.unsubscribe(self)
+
+
+class ProgressHub:
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[Tuple[str, str], Set[Subscriber]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str, book_id: str, websocket) -> Subscriber:
+        """Must be called from the event loop that serves the websocket."""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(self, channel, book_id, websocket)
+        with self._lock:
+            self._subscribers.setdefault((channel, book_id), set()).add(subscriber)
+        subscriber.task = asyncio.create_task(subscriber.run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get((subscriber.channel, subscriber.book_id))
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[(subscriber.channel, subscriber.book_id)]
+        if subscriber.task is not None and subscriber.task is not asyncio.current_task():
+            subscriber.task.cancel()
+
+    def subscriber_count(self, channel: str, book_id: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get((channel, book_id), ()))
+
+    def publish(self, channel: str, book_id: str, payload: Any, text: bool = False, coalescable: bool = True):
+        """
+        Thread-safe and non-blocking. A no-op in processes without websocket subscribers.
+        coalescable messages are snapshots that a later message of the channel supersedes.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        message = ("text" if text else "json", payload, coalescable)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(channel, book_id, message)
+        else:
+            loop.call_soon_threadsafe(self._deliver, channel, book_id, message)
+
+    def _deliver(self, channel: str, book_id: str, message: Tuple[str, Any, bool]):
+        with self._lock:
+            subscribers = list(self._subscribers.get((channel, book_id), ()))
+        for subscriber in subscribers:
+            if not subscriber.offer(message):
+                print(f"[WebSocket] Dropping slow {channel}/{book_id} subscriber")
+                self.unsubscribe(subscriber)
+                asyncio.ensure_future(_close_quietly(subscriber.websocket))
+
+
+async def _close_quietly(websocket):
+    try:
+        await websocket.close(code=1013)  # Try again later
+    except Exception:
+        pass
+
+
+hub = ProgressHub()
+
+
+async def serve_subscriber(websocket, channel: str, book_id: str):
+    """Accepts the websocket and keeps it subscribed to the channel until the client goes away."""
+    from fastapi import WebSocketDisconnect
+
+    await websocket.accept()
+    subscriber = hub.subscribe(channel, book_id, websocket)
+    try:
+        while True:
+            await websocket.receive_text()  # Clients don't send anything; this detects the disconnect
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+# Called by the processing code, in whatever process it runs; see progress_events.py
+
+def publish_classification_progress(book_id: str, progress: int, total: int, done: int):
+    emit_progress_event(CHANNEL_CLASSIFICATION, book_id, {"progress": progress, "total": total, "done": done})
+
+def publish_indexing_done(book_id: str):
+    emit_progress_event(CHANNEL_INDEX, book_id, "done", text=True, coalescable=False)
+
+def publish_analysis_progress(book_id: str, progress: int, total: int, done: int):
+    emit_progress_event(CHANNEL_ANALYSIS, book_id, {
+        "analysis_progress": progress,
+        "analysis_total": total,
+        "analysis_done": done
+    })
+
+def publish_chunk_result(channel: str, book_id: str, delta: dict):
+    """Per-chunk result delta; never coalesced, every chunk's result is delivered."""
+    emit_progress_event(channel, book_id, {"type": "chunk_result", **delta}, coalescable=False)
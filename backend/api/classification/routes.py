@@ -1,20 +1,20 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Body
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from typing import Dict, Any, Optional, List
 from models.user import User
 from utils.jwt_utils import get_user_from_cookie
-from db.mongo import books_collection,get_agent_configs_collection, get_chunks_collection, fs
+from db.mongo import books_collection, get_chunks_collection, reset_progress_counters
 from bson import ObjectId
+import os
 import time
-from Classification.app import supervisor_loop
-import asyncio
-import tempfile
+from jobs.job_queue import enqueue_job, JOB_TYPE_PROCESS
+from db.async_repository import find_book, aggregate_chunks, chunk_exists
 
 router = APIRouter(prefix="/classification", tags=["Classification"])
 
+# Plain def: the pymongo calls and enqueues below block, so FastAPI runs this in its threadpool
 @router.post("/{book_id}/start", dependencies=[Depends(get_user_from_cookie)])
-async def start_classification(
+def start_classification(
     book_id: str, 
-    background_tasks: BackgroundTasks,
     run_classification: bool = Body(True, embed=True),
     run_analysis: bool = Body(True, embed=True)
 ) -> Dict[str, Any]:
@@ -27,65 +27,116 @@ async def start_classification(
         book = books_collection.find_one({"_id": ObjectId(book_id)})
         if not book:
             raise HTTPException(status_code=404, detail="Book not found")
-        
-        file_id = book["file_id"]
-
-        # 3. Retrieve the file from GridFS and write to a temp file
-        file_obj = fs.get(file_id)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(file_obj.read())
-            tmp_path = tmp.name
 
         # Update book status to "Processing"
         books_collection.update_one(
             {"_id": ObjectId(book_id)},
-            {"$set": {"status": "Processing", "startDate": time.strftime("%Y-%m-%d %H:%M:%S")}}
+            {"$set": {
+                "status": "Processing",
+                "startDate": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "classification_completed": False
+            }}
         )
+        # Counters are then only $inc'ed as chunks finish
+        reset_progress_counters(book_id)
 
-        agent_configs_collection = get_agent_configs_collection()
-        agents = list(agent_configs_collection.find(
-            {"type": "classification", "status": True},  # Filter only active agents
-            {"_id": 0, "agent_name": 1, "classifier_prompt": 1, "evaluators_prompt": 1}
-        ))
-
-        background_tasks.add_task(supervisor_loop, book_id, agents, run_classification, run_analysis, tmp_path)
+        # Classification is sharded by chunk range, so several jobs can work on the
+        # same book in parallel (bounded by MAX_JOBS_PER_BOOK). Workers load the
+        # active classification agents when they pick a job up.
+        shards = max(int(os.getenv("CLASSIFICATION_SHARDS", "2")), 1) if run_classification else 1
+        job_ids = [
+            enqueue_job(JOB_TYPE_PROCESS, book_id, {
+                "run_classification": run_classification,
+                "run_analysis": run_analysis
+            })
+            for _ in range(shards)
+        ]
         
         return {
             "message": "Processing started successfully",
             "book_id": book_id,
+            "job_id": job_ids[0],
+            "job_ids": job_ids,
             "status": "Processing",
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error starting processing: {str(e)}")
     
-@router.get("/classifications/{book_id}", dependencies=[Depends(get_user_from_cookie)])
-def get_book_classifications(book_id: str):
-    chunks_collection = get_chunks_collection()
+def classification_pipeline(book_id: str, labels: Optional[List[str]] = None, min_confidence: Optional[float] = None, label_thresholds: Optional[Dict[str, float]] = None):
+    """
+    Flattens the classification entries of a book's chunks into one row per entry,
+    with only the fields the UI needs. Labels match case-insensitively; confidence
+    is compared numerically even when it was stored as a string.
+    """
+    pipeline = [
+        {"$match": {"doc_id": book_id, "classification.0": {"$exists": True}}},
+        {"$project": {"_id": 0, "chunk_id": 1, "coordinates": 1, "page_number": 1, "classification": 1}},
+        {"$unwind": "$classification"},
+        {"$match": {"classification.classification": {"$exists": True}}},
+        {"$addFields": {
+            "_label": {"$toLower": {"$toString": "$classification.classification"}},
+            "_confidence": {"$convert": {"input": "$classification.confidence_score", "to": "double", "onError": None, "onNull": None}}
+        }},
+    ]
 
-    # Get all chunks for this book_id
-    chunks = list(chunks_collection.find({"doc_id": book_id}))
+    conditions = []
+    if labels:
+        conditions.append({"_label": {"$in": [label.lower() for label in labels]}})
+    if min_confidence is not None:
+        conditions.append({"_confidence": {"$gte": min_confidence}})
+    if label_thresholds:
+        # Per-label minimum confidence; labels without a threshold are kept
+        names = [name.lower() for name in label_thresholds]
+        conditions.append({"$or": [{"_label": {"$nin": names}}] + [
+            {"_label": name.lower(), "_confidence": {"$gte": value}}
+            for name, value in label_thresholds.items()
+        ]})
+    if conditions:
+        pipeline.append({"$match": {"$and": conditions}})
 
-    if not chunks:
-        raise HTTPException(status_code=404, detail="No chunks found for this book.")
+    pipeline.append({"$project": {
+        "classification": "$classification.classification",
+        "confidence_score": "$classification.confidence_score",
+        "chunk_id": 1,  # For deletion
+        "coordinates": 1,  # For PDF navigation
+        "page_number": 1
+    }})
+    return pipeline
 
-    # Return entries with both classification and confidence_score, plus chunk_id
-    classifications = []
 
-    for chunk in chunks:
-        if "classification" in chunk and chunk["classification"]:
-            for c in chunk["classification"]:
-                # Include classification, confidence_score, and chunk_id if present
-                if isinstance(c, dict) and "classification" in c:
-                    entry = {
-                        "classification": c.get("classification"),
-                        "confidence_score": c.get("confidence_score"),
-                        "chunk_id": chunk.get("chunk_id"),  # Add chunk_id for deletion
-                        "coordinates": chunk.get("coordinates"),  # Add coordinates for PDF navigation
-                        "page_number": chunk.get("page_number")  # Add page number for PDF navigation
-                    }
-                    classifications.append(entry)
+@router.get("/classifications/{book_id}", dependencies=[Depends(get_user_from_cookie)])
+async def get_book_classifications(
+    book_id: str,
+    label: Optional[List[str]] = Query(None),
+    min_confidence: Optional[float] = None,
+    apply_book_filters: bool = False
+):
+    """
+    Classification entries of a book. Optionally filtered by label (repeatable),
+    a minimum confidence, and/or the per-label thresholds saved in the book's
+    filters.classificationFilters (apply_book_filters=true).
+    """
+    label_thresholds = None
+    if apply_book_filters:
+        if not ObjectId.is_valid(book_id):
+            raise HTTPException(status_code=400, detail="Invalid book ID format")
+        book = await find_book(book_id, {"filters.classificationFilters": 1})
+        if not book:
+            raise HTTPException(status_code=404, detail="Book not found")
+        label_thresholds = {
+            f["name"]: f["value"]
+            for f in (book.get("filters") or {}).get("classificationFilters") or []
+            if isinstance(f, dict) and f.get("name") and f.get("value") is not None
+        }
+
+    classifications = await aggregate_chunks(classification_pipeline(book_id, label, min_confidence, label_thresholds))
+
+    if not classifications and not await chunk_exists({"doc_id": book_id}):
+        raise HTTPException(status_code=404, detail="No chunks found for this book.")
 
     return {"book_id": book_id, "classifications": classifications}
 
@@ -1,16 +1,8 @@
-from fastapi import WebSocket, WebSocketDisconnect, APIRouter
-from api.chunks.websocket_manager import register_client, unregister_client
-import asyncio
+from fastapi import WebSocket, APIRouter
+from api.chunks.websocket_manager import serve_subscriber, CHANNEL_CLASSIFICATION
 router = APIRouter()
 
 
 @router.websocket("/ws/progress/{book_id}")
 async def websocket_endpoint(websocket: WebSocket, book_id: str):
-    await websocket.accept()
-    register_client(book_id, websocket)
-
-    try:
-        while True:
-            await asyncio.sleep(1)
-    except WebSocketDisconnect:
-        unregister_client(websocket)
\ No newline at end of file
+    await serve_subscriber(websocket, CHANNEL_CLASSIFICATION, book_id)
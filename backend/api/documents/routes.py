@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, status, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, status, UploadFile, File, Form, HTTPException, Query
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 from models.documents import BookModel
 from models.user import User
 from utils.jwt_utils import get_user_from_cookie
 from db.mongo import books_collection, fs, get_chunks_collection, get_review_outcomes_collection
-from .schemas import BookResponse, BookDeleteResponse, FeedbackRequest, FeedbackModel, BookUpdateRequest, UpdateClassificationFilterRequest, UpdateAnalysisFiltersRequest
+from db.async_repository import find_books, find_book, insert_book, update_book, put_file, open_file, file_content_type, iter_file, count_books, find_books_page
+from utils.pagination import encode_cursor, keyset_query, keyset_sort, page_size
+from .schemas import BookResponse, BookDeleteResponse, FeedbackRequest, FeedbackModel, BookUpdateRequest, UpdateClassificationFilterRequest, UpdateAnalysisFiltersRequest, BookListItem, BookPageResponse
 import json
 import base64
 from bson import ObjectId
@@ -17,12 +20,13 @@ router = APIRouter(prefix="/books", tags=["Books"])
 
 #Get All books
 @router.get("/", response_model=List[BookResponse], dependencies=[Depends(get_user_from_cookie)])
-def get_all_books():
-    books = list(books_collection.find())
-    return [
+async def get_all_books():
+    books = await find_books()
+    # Validating every book is CPU bound; keep it off the event loop
+    return await run_in_threadpool(lambda: [
         BookResponse(**{**book, "_id": str(book["_id"])})
         for book in books
-    ]
+    ])
 
 
 # Create a new book
@@ -53,7 +57,7 @@ async def create_book(
         labels_list = []
 
     # Save file to GridFS
-    file_id = fs.put(await file.read(), filename=file.filename)
+    file_id = await put_file(await file.read(), filename=file.filename, content_type="application/pdf")
 
     # Prepare book data WITHOUT setting _id (Mongo will generate it)
     book = BookModel(
@@ -78,12 +82,8 @@ async def create_book(
     # Add file_id
     book_dict["file_id"] = file_id
 
-    # Insert into MongoDB
-    result = books_collection.insert_one(book_dict)
-    inserted_id = str(result.inserted_id)
-
-    # Update doc_id to match generated _id
-    books_collection.update_one({"_id": result.inserted_id}, {"$set": {"doc_id": inserted_id}})
+    # Insert into MongoDB; doc_id is set to the generated _id
+    inserted_id = await insert_book(book_dict)
 
     # Return response
     return BookResponse(
@@ -101,14 +101,53 @@ async def create_book(
         endDate=endDate
     )
 
+# Fields returned by the paginated list; summary, feedback and filters are only on the detail endpoint
+BOOK_LIST_PROJECTION = {
+    "doc_id": 1, "doc_name": 1, "author": 1, "date": 1, "status": 1, "lastFinalStatus": 1,
+    "category": 1, "reference": 1, "labels": 1, "startDate": 1, "endDate": 1,
+    "assigned_departments": 1, "progress": 1
+}
+
+# Paginated, filtered books list
+@router.get("/list", response_model=BookPageResponse, dependencies=[Depends(get_user_from_cookie)])
+async def list_books(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: str = Query("_id", pattern="^(_id|startDate)$"),
+    book_status: Optional[str] = Query(None, alias="status"),
+    category: Optional[str] = None,
+    label: Optional[str] = None
+):
+    """Newest first by _id (or by startDate). Pass next_cursor back as cursor for the next page."""
+    query = {}
+    if book_status:
+        query["status"] = book_status
+    if category:
+        query["category"] = category
+    if label:
+        query["labels"] = label
+
+    limit = page_size(limit)
+    # One extra document tells whether there is a next page
+    books = await find_books_page(keyset_query(query, sort, cursor), keyset_sort(sort), limit + 1, BOOK_LIST_PROJECTION)
+    has_more = len(books) > limit
+    books = books[:limit]
+
+    return BookPageResponse(
+        items=[BookListItem(**{**book, "_id": str(book["_id"])}) for book in books],
+        total=await count_books(query),
+        limit=limit,
+        next_cursor=encode_cursor(books[-1], sort) if has_more else None
+    )
+
 # Get a book by ID
 @router.get(
     "/{book_id}",
     response_model=BookResponse,
     dependencies=[Depends(get_user_from_cookie)]
 )
-def get_book_by_id(book_id: str):
-    book = books_collection.find_one({"_id": ObjectId(book_id)})
+async def get_book_by_id(book_id: str):
+    book = await find_book(book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     book["_id"] = str(book["_id"])
@@ -120,13 +159,12 @@ def get_book_by_id(book_id: str):
     response_class=StreamingResponse,
     dependencies=[Depends(get_user_from_cookie)]
 )
-def get_book_file(book_id: str):
-    book = books_collection.find_one({"_id": ObjectId(book_id)})
+async def get_book_file(book_id: str):
+    book = await find_book(book_id, {"file_id": 1})
     if not book or "file_id" not in book:
         raise HTTPException(status_code=404, detail="File not found")
-    file_id = book["file_id"]
-    file_obj = fs.get(file_id)
-    return StreamingResponse(file_obj, media_type="application/pdf", headers={
+    file_obj = await open_file(book["file_id"])
+    return StreamingResponse(iter_file(file_obj), media_type="application/pdf", headers={
         "Content-Disposition": f'attachment; filename="{file_obj.filename}"'
     })
 
@@ -138,7 +176,7 @@ async def add_feedback(
     comment: FeedbackRequest, 
     user: User = Depends(get_user_from_cookie)
 ):
-    book = books_collection.find_one({"_id": ObjectId(book_id)})
+    book = await find_book(book_id, {"_id": 1})
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -154,7 +192,7 @@ async def add_feedback(
             filename = f"feedback_{book_id}_{user.id}_{timestamp}.jpg"
             
             # Save to GridFS
-            file_id = fs.put(image_data, filename=filename, content_type="image/jpeg")
+            file_id = await put_file(image_data, filename=filename, content_type="image/jpeg")
             image_url = f"/books/{book_id}/feedback/image/{file_id}"
             print(f"Saved feedback image: file_id={file_id}, image_url={image_url}")
             
@@ -174,10 +212,7 @@ async def add_feedback(
         timestamp=datetime.utcnow().isoformat()
     )
 
-    books_collection.update_one(
-        {"_id": ObjectId(book_id)},
-        {"$push": {"feedback": feedback.dict()}}
-    )
+    await update_book(book_id, {"$push": {"feedback": feedback.dict()}})
 
     return {"message": "Feedback added successfully"}
 
@@ -186,11 +221,12 @@ async def get_feedback_image(book_id: str, file_id: str):
     """Get feedback image by file ID"""
     print(f"Requesting feedback image: book_id={book_id}, file_id={file_id}")
     try:
-        file_obj = fs.get(ObjectId(file_id))
-        print(f"Found file: {file_obj.filename}, content_type: {file_obj.content_type}")
+        file_obj = await open_file(ObjectId(file_id))
+        content_type = file_content_type(file_obj, "image/jpeg")
+        print(f"Found file: {file_obj.filename}, content_type: {content_type}")
         return StreamingResponse(
-            file_obj, 
-            media_type=file_obj.content_type,
+            iter_file(file_obj),
+            media_type=content_type,
             headers={
                 "Content-Disposition": f"inline; filename={file_obj.filename}",
                 "Access-Control-Allow-Origin": "*",
@@ -205,7 +241,7 @@ async def get_feedback_image(book_id: str, file_id: str):
 @router.post("/{book_id}/assign-department")
 async def assign_single_department(book_id: str, department: str = Form(...), user: User = Depends(get_user_from_cookie)):
     """Assign a single department to a book"""
-    book = books_collection.find_one({"_id": ObjectId(book_id)})
+    book = await find_book(book_id, {"assigned_departments": 1, "status": 1})
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -216,23 +252,18 @@ async def assign_single_department(book_id: str, department: str = Form(...), us
     if department not in current_departments:
         current_departments.append(department)
         
-        books_collection.update_one(
-            {"_id": ObjectId(book_id)},
-            {"$set": {"assigned_departments": current_departments}}
-        )
+        update_fields = {"assigned_departments": current_departments}
         # Only change status if current one is exactly "Processed"
         if book.get("status") == "Processed":
-            books_collection.update_one(
-                {"_id": ObjectId(book_id)},
-                {"$set": {"status": "Assigned"}}
-            )
+            update_fields["status"] = "Assigned"
+        await update_book(book_id, {"$set": update_fields})
 
     return {"message": f"Department {department} assigned successfully"}
 
 # Update a single classification filter (name -> value)
 @router.patch("/{book_id}/filters/classification", dependencies=[Depends(get_user_from_cookie)])
 async def update_classification_filter(book_id: str, payload: UpdateClassificationFilterRequest):
-    book = books_collection.find_one({"_id": ObjectId(book_id)})
+    book = await find_book(book_id, {"filters": 1})
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -251,15 +282,14 @@ async def update_classification_filter(book_id: str, payload: UpdateClassificati
 
     filters["classificationFilters"] = existing_list
 
-    books_collection.update_one({"_id": ObjectId(book_id)}, {"$set": {"filters": filters}})
-    updated_book = books_collection.find_one({"_id": ObjectId(book_id)})
+    updated_book = await update_book(book_id, {"$set": {"filters": filters}})
     updated_book["_id"] = str(updated_book["_id"])
     return BookResponse(**updated_book)
 
 # Replace analysisFilters array
 @router.patch("/{book_id}/filters/analysis", dependencies=[Depends(get_user_from_cookie)])
 async def update_analysis_filters(book_id: str, payload: UpdateAnalysisFiltersRequest):
-    book = books_collection.find_one({"_id": ObjectId(book_id)})
+    book = await find_book(book_id, {"filters": 1})
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -271,8 +301,7 @@ async def update_analysis_filters(book_id: str, payload: UpdateAnalysisFiltersRe
     if payload.confidence is not None:
         filters["analysisConfidence"] = payload.confidence
 
-    books_collection.update_one({"_id": ObjectId(book_id)}, {"$set": {"filters": filters}})
-    updated_book = books_collection.find_one({"_id": ObjectId(book_id)})
+    updated_book = await update_book(book_id, {"$set": {"filters": filters}})
     updated_book["_id"] = str(updated_book["_id"])
     return BookResponse(**updated_book)
 
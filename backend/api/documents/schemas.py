@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pydantic import BaseModel, Field
 
 class FeedbackModel(BaseModel):
@@ -54,6 +54,32 @@ class BookResponse(BaseModel):
         populate_by_name = True
         from_attributes = True
 
+class BookListItem(BaseModel):
+    """Light list entry: no summary, feedback or filters (fetch /books/{book_id} for those)"""
+    id: str = Field(alias="_id")
+    doc_id: Optional[str] = None
+    doc_name: Optional[str] = None
+    author: Optional[str] = None
+    date: Optional[str] = None
+    status: str = "Pending"
+    lastFinalStatus: Optional[str] = None
+    category: Optional[str] = None
+    reference: Optional[str] = None
+    labels: Optional[List[str]] = []
+    startDate: Optional[str] = None
+    endDate: Optional[str] = None
+    assigned_departments: List[str] = []
+    progress: Optional[Dict[str, int]] = None
+
+    class Config:
+        populate_by_name = True
+
+class BookPageResponse(BaseModel):
+    items: List[BookListItem]
+    total: int
+    limit: int
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; None on the last page
+
 class BookDeleteResponse(BaseModel):
     detail: str
 
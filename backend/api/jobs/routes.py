@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+from utils.jwt_utils import get_user_from_cookie
+from bson import ObjectId
+from jobs.job_queue import get_job, get_jobs_for_book
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+def serialize_job(job):
+    job["_id"] = str(job["_id"])
+    return job
+
+
+@router.get("/book/{book_id}", dependencies=[Depends(get_user_from_cookie)])
+def get_book_jobs(book_id: str):
+    return [serialize_job(job) for job in get_jobs_for_book(book_id)]
+
+
+@router.get("/{job_id}", dependencies=[Depends(get_user_from_cookie)])
+def get_job_by_id(job_id: str):
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return serialize_job(job)
@@ -1,24 +1,141 @@
-from fastapi import APIRouter, Depends, Body, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, Body, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional, Dict, Any
 from utils.jwt_utils import get_user_from_cookie
 from db.mongo import get_review_outcomes_collection
+from db.async_repository import (
+    find_review_outcomes, count_review_outcomes, find_review_outcomes_page, iter_review_outcomes,
+    find_agent_names, find_book
+)
+from utils.pagination import encode_cursor, keyset_query, keyset_sort, page_size
 from .schemas import ReviewUpdateRequest
 import json
-from bson.json_util import dumps
+from bson.json_util import dumps, RELAXED_JSON_OPTIONS
 from bson import ObjectId
 
 router = APIRouter(prefix="/review_outcomes", tags=["Review Outcomes"])
 
 @router.get("/", dependencies=[Depends(get_user_from_cookie)])
-def get_all_review_outcomes():
-    review_outcomes_collection = get_review_outcomes_collection()
-    review_outcomes = list(review_outcomes_collection.find())
-    return json.loads(dumps(review_outcomes))
+async def get_all_review_outcomes():
+    review_outcomes = await find_review_outcomes()
+    # Serialising the whole collection is CPU bound; keep it off the event loop
+    return await run_in_threadpool(lambda: json.loads(dumps(review_outcomes)))
+
+# Fields every outcome listing returns; agent results are added per agent
+OUTCOME_BASE_FIELDS = [
+    "doc_id", "Book Name", "Page Number", "Chunk_ID", "Chunk no.", "coordinates",
+    "Predicted Label", "Predicted Label Confidence", "overall_status", "timestamp"
+]
+
+
+async def review_outcome_filters(
+    book_id: str,
+    agent: Optional[str] = None,
+    issue_found: Optional[bool] = None,
+    human_review: Optional[bool] = None,
+    min_confidence: Optional[float] = None,
+    apply_book_filters: bool = False,
+    page_from: Optional[int] = None,
+    page_to: Optional[int] = None,
+    include_text: bool = False
+) -> Dict[str, Any]:
+    """
+    Builds the query and projection for one book's outcomes.
+    Agent conditions (issue_found, human_review, confidence) apply to the given agent,
+    or match when any analysis agent satisfies all of them. apply_book_filters uses the
+    book's filters.analysisConfidence as the minimum confidence unless min_confidence is given.
+    """
+    if apply_book_filters and min_confidence is None:
+        if not ObjectId.is_valid(book_id):
+            raise HTTPException(status_code=400, detail="Invalid book ID format")
+        book = await find_book(book_id, {"filters.analysisConfidence": 1})
+        if not book:
+            raise HTTPException(status_code=404, detail="Book not found")
+        min_confidence = (book.get("filters") or {}).get("analysisConfidence")
+
+    query = {"doc_id": book_id}
+    if page_from is not None or page_to is not None:
+        query["Page Number"] = {}
+        if page_from is not None:
+            query["Page Number"]["$gte"] = page_from
+        if page_to is not None:
+            query["Page Number"]["$lte"] = page_to
+
+    analysis_agents = await find_agent_names("analysis")
+    if agent is not None and agent not in analysis_agents:
+        # agent becomes a field path in the query and projection; only known agents may be used
+        raise HTTPException(status_code=400, detail=f"Unknown analysis agent '{agent}'")
+    agents = [agent] if agent else analysis_agents
+
+    agent_conditions = []
+    for name in agents:
+        condition = {}
+        if issue_found is not None:
+            condition[f"{name}.issue_found"] = issue_found
+        if human_review is not None:
+            condition[f"{name}.human_review"] = human_review
+        if min_confidence is not None:
+            condition[f"{name}.confidence"] = {"$gte": min_confidence}
+        if condition:
+            agent_conditions.append(condition)
+        elif agent:
+            # Only outcomes that have a result for this agent
+            agent_conditions.append({name: {"$exists": True}})
+    if agent_conditions:
+        query["$or"] = agent_conditions
+
+    projection = {field: 1 for field in OUTCOME_BASE_FIELDS + agents}
+    if include_text:
+        projection["Text Analyzed"] = 1
+
+    return {"query": query, "projection": projection}
+
+
+OUTCOME_SORT_FIELD = "Chunk no."
+
+
+# One book's outcomes in chunk order, filtered and paginated
+@router.get("/book/{book_id}", dependencies=[Depends(get_user_from_cookie)])
+async def get_book_review_outcomes(
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    filters: Dict[str, Any] = Depends(review_outcome_filters)
+):
+    limit = page_size(limit)
+    query = keyset_query(filters["query"], OUTCOME_SORT_FIELD, cursor, descending=False)
+    outcomes = await find_review_outcomes_page(
+        query, keyset_sort(OUTCOME_SORT_FIELD, descending=False), limit + 1, filters["projection"]
+    )
+    has_more = len(outcomes) > limit
+    outcomes = outcomes[:limit]
+    next_cursor = encode_cursor(outcomes[-1], OUTCOME_SORT_FIELD) if has_more else None
+
+    for outcome in outcomes:
+        outcome["_id"] = str(outcome["_id"])
+    return {"items": outcomes, "limit": limit, "next_cursor": next_cursor}
+
+
+# Streaming export of one book's outcomes (same filters), one JSON document per line
+@router.get("/book/{book_id}/export", dependencies=[Depends(get_user_from_cookie)])
+async def export_book_review_outcomes(book_id: str, filters: Dict[str, Any] = Depends(review_outcome_filters)):
+    async def ndjson():
+        sort = keyset_sort(OUTCOME_SORT_FIELD, descending=False)
+        async for outcome in iter_review_outcomes(filters["query"], filters["projection"], sort):
+            outcome["_id"] = str(outcome["_id"])
+            # Single BSON -> JSON encoding per document
+            yield dumps(outcome, json_options=RELAXED_JSON_OPTIONS) + "\n"
+
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="review_outcomes_{book_id}.ndjson"'}
+    )
+
 
 @router.get("/count", dependencies=[Depends(get_user_from_cookie)])
-def get_review_outcomes_count():
-    review_outcomes_collection = get_review_outcomes_collection()
-    count = review_outcomes_collection.count_documents({})
+async def get_review_outcomes_count():
+    count = await count_review_outcomes()
     return {"count": count}
 
 @router.delete("/delete_all", dependencies=[Depends(get_user_from_cookie)])
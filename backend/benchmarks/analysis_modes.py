@@ -0,0 +1,171 @@
+"""Benchmark of the per-agent and fused analysis modes
+
+Runs the same chunks through both modes (Analysis/fused.py) and reports LLM calls,
+prompt/completion tokens and per-chunk latency for each. Results are not stored.
+Token counts come from the endpoint's usage reports, so turn the LLM response cache and
+cassette off for the run.
+
+    python -m benchmarks.mock_llm_server --port 8001 --latency lognormal:-1,0.5 &
+    MONGO_URI=mongodb://localhost:27018/ LLM_API_BASE=http://localhost:8001/v1 LLM_MODEL=mock \\
+        python -m benchmarks.analysis_modes --chunks 20 --seed-agents --output analysis-modes.json
+
+Use --book-id to take the chunks from an indexed book instead of synthetic text.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List
+from langchain_core.callbacks import BaseCallbackHandler
+from benchmarks.run_pipeline import percentile, seed_agents, cleanup
+
+os.environ.setdefault("ENABLE_OPIK", "False")
+
+_SENTENCES = [
+    "The assembly debated the constitution for several months before the vote.",
+    "Foreign observers described the border agreement as a setback for the province.",
+    "The army's role in the crisis remains disputed among historians.",
+    "Trade across the river valley grew steadily after independence.",
+    "The minister's speech was widely reported in the regional press.",
+    "Several committees were formed to negotiate the water dispute.",
+]
+
+
+class LLMUsage(BaseCallbackHandler):
+    """Counts model calls and the token usage reported by the endpoint"""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        with self._lock:
+            self.calls += 1
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        with self._lock:
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens}
+
+
+def synthetic_chunks(count: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {"chunk_id": f"benchmark-{i}", "chunk_index": i, "page_number": i // 3 + 1,
+         "text": " ".join(rng.choice(_SENTENCES) for _ in range(6))}
+        for i in range(count)
+    ]
+
+
+def book_chunks(book_id: str, count: int) -> List[Dict[str, Any]]:
+    from db.mongo import get_chunks_collection
+
+    return list(get_chunks_collection().find({"doc_id": book_id}, {"_id": 0}).sort("chunk_index", 1).limit(count))
+
+
+def report_data_for(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """The analysis graph's input state, as built by Analysis.mains1.analyze_chunk"""
+    return {
+        "report_text": chunk["text"],
+        "metadata": {
+            "doc_id": chunk.get("doc_id"),
+            "chunk_index": chunk.get("chunk_index"),
+            "title": chunk.get("doc_name", "Benchmark"),
+            "chunk_id": chunk.get("chunk_id"),
+            "page_number": chunk.get("page_number"),
+        },
+        "main_node_output": {},
+        "aggregate": [],
+        "final_decision_report": "",
+        "current_agent_name": "",
+        "current_agent_input_prompt": "",
+        "current_agent_raw_output": "",
+        "current_agent_parsed_output": {},
+        "current_agent_confidence": 0,
+        "current_agent_retries": 0,
+        "current_agent_human_review": False
+    }
+
+
+def run_mode(name: str, analyse, chunks: List[Dict[str, Any]], usage: LLMUsage) -> Dict[str, Any]:
+    before = usage.snapshot()
+    latencies, issues = [], 0
+    start = time.perf_counter()
+    for chunk in chunks:
+        chunk_start = time.perf_counter()
+        result = analyse(report_data_for(chunk))
+        latencies.append(time.perf_counter() - chunk_start)
+        issues += sum(1 for agent in result.get("main_node_output", {}).values()
+                      if agent.get("output", {}).get("issues_found"))
+    elapsed = time.perf_counter() - start
+    after = usage.snapshot()
+
+    count = len(chunks)
+    calls = after["calls"] - before["calls"]
+    prompt_tokens = after["prompt_tokens"] - before["prompt_tokens"]
+    completion_tokens = after["completion_tokens"] - before["completion_tokens"]
+    result = {
+        "mode": name,
+        "chunks": count,
+        "seconds": round(elapsed, 3),
+        "llm_calls": calls,
+        "llm_calls_per_chunk": round(calls / count, 2) if count else None,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "tokens_per_chunk": round((prompt_tokens + completion_tokens) / count, 1) if count else None,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "issues_found": issues,
+    }
+    print(f"⏱️  {name}: {result['llm_calls_per_chunk']} calls/chunk, {result['tokens_per_chunk']} tokens/chunk, "
+          f"p50 {result['latency_p50']:.2f}s" if latencies else f"⏱️  {name}: no chunks")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-agent and fused analysis")
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--book-id", help="Analyse chunks of this book instead of synthetic text")
+    parser.add_argument("--seed-agents", action="store_true", help="Add benchmark agents for the run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    from Analysis.llm_init import llm
+    from Analysis.mains1 import build_analysis_graph
+    from Analysis.fused import run_fused_analysis
+
+    if args.seed_agents:
+        seed_agents()
+    try:
+        graph = build_analysis_graph()
+        if graph is None:
+            raise SystemExit("❌ No active analysis agents; add some or pass --seed-agents")
+        chunks = book_chunks(args.book_id, args.chunks) if args.book_id else synthetic_chunks(args.chunks, args.seed)
+
+        usage = LLMUsage()
+        llm.callbacks = [usage]
+        results = [
+            run_mode("per_agent", graph.invoke, chunks, usage),
+            run_mode("fused", lambda report_data: run_fused_analysis(llm, report_data), chunks, usage),
+        ]
+    finally:
+        if args.seed_agents:
+            cleanup([], agents_seeded=True)
+
+    output = json.dumps({"llm_api_base": llm.openai_api_base, "modes": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"✅ Results written to {args.output}")
+    else:
+        print(output)
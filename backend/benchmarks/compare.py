@@ -0,0 +1,76 @@
+"""Compares two benchmarks.run_pipeline result files
+
+    python -m benchmarks.compare base.json head.json --threshold 0.10
+
+Prints the change of every metric per stage and exits with 1 when any of them got
+worse by more than the threshold (a fraction of the base value).
+"""
+import argparse
+import json
+from typing import Any, Dict, List, Optional
+
+# metric -> True when higher is better
+METRICS = {
+    "chunks_per_sec": True,
+    "latency_p50": False,
+    "latency_p95": False,
+    "latency_p99": False,
+    "mongo_commands_per_chunk": False,
+    "llm_requests_per_chunk": False,
+    "peak_rss_mb": False,
+}
+
+
+def relative_change(base: Optional[float], head: Optional[float]) -> Optional[float]:
+    if base is None or head is None or base == 0:
+        return None
+    return (head - base) / base
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """One row per (stage, metric) present in both runs"""
+    head_stages = {stage["stage"]: stage for stage in head["stages"]}
+    rows = []
+    for base_stage in base["stages"]:
+        head_stage = head_stages.get(base_stage["stage"])
+        if head_stage is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            change = relative_change(base_stage.get(metric), head_stage.get(metric))
+            if change is None:
+                continue
+            worse = -change if higher_is_better else change
+            rows.append({
+                "stage": base_stage["stage"],
+                "metric": metric,
+                "base": base_stage[metric],
+                "head": head_stage[metric],
+                "change": change,
+                "regression": worse > threshold,
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two pipeline benchmark results")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression (default 0.10)")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base.get('commit') or args.base} -> head {head.get('commit') or args.head}")
+    rows = compare(base, head, args.threshold)
+    for row in rows:
+        flag = "❌" if row["regression"] else "  "
+        print(f"{flag} {row['stage']:<15} {row['metric']:<26} {row['base']:>10} -> {row['head']:<10} ({row['change']:+.1%})")
+
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+        raise SystemExit(1)
+    print("✅ No regressions")
@@ -0,0 +1,285 @@
+"""Mock OpenAI-compatible LLM server for benchmarking the pipeline
+
+Serves /v1/chat/completions (streaming and non-streaming) and /v1/models with
+answers shaped like the ones the pipeline parses, so classification and analysis can
+be run end to end without a GPU:
+
+    classifier prompts (Classification/graph.py)   {"classification", "confidence_score", "criteria_matched"}
+    evaluator prompts (Classification/graph.py)    "correct"
+    review agents (Analysis/agents.TEMPLATE)       {"issues_found", "problematic_text", "observation", "recommendation"}
+    agent evaluation (Analysis/agents.py)          {"confidence": n}
+    fused analysis (Analysis/fused.py)             {"<agent>": {...review answer, "confidence"}, ...}
+    rephrasing (Classification/summarization.py)   the text itself
+
+Answers are derived from a hash of the prompt, so the same chunk always gets the same
+answer (cache benchmarks stay meaningful) and different runs are comparable.
+
+Run it and point the backend at it:
+
+    python -m benchmarks.mock_llm_server --port 8001 --latency lognormal:0.8,0.4 --tokens-per-second 60
+    LLM_API_BASE=http://localhost:8001/v1 LLM_MODEL=mock ...
+
+Settings (CLI flags override the environment):
+
+    MOCK_LLM_LATENCY             time to first token in seconds: "0.5", "uniform:0.2,1.5",
+                                 "normal:0.8,0.2" or "lognormal:<mu>,<sigma>" (default "0")
+    MOCK_LLM_TOKENS_PER_SECOND   generation speed; 0 returns the whole answer at once (default 0)
+    MOCK_LLM_ERROR_RATE          share of requests answered with a 500 (default 0)
+    MOCK_LLM_RATE_LIMIT_RATE     share of requests answered with a 429 (default 0)
+    MOCK_LLM_ISSUE_RATE          share of review passages reported as having an issue (default 0.3)
+    MOCK_LLM_SEED                seed for latency and error sampling (default unset)
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = os.getenv("MOCK_LLM_LATENCY", "0")
+TOKENS_PER_SECOND = float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "0"))
+ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+RATE_LIMIT_RATE = float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", "0"))
+ISSUE_RATE = float(os.getenv("MOCK_LLM_ISSUE_RATE", "0.3"))
+SEED = os.getenv("MOCK_LLM_SEED")
+
+MODEL_NAME = "mock"
+# Rough characters per token, only used to pace generation and fill in usage
+CHARS_PER_TOKEN = 4
+
+_rng = random.Random(int(SEED) if SEED else None)
+
+_stats = {"requests": 0, "errors": 0, "rate_limited": 0, "completion_tokens": 0, "prompt_tokens": 0}
+
+
+# ─── LATENCY ────────────────────────────────────────────────────────────────
+
+def parse_latency(spec: str) -> Tuple[str, List[float]]:
+    """"0.5" -> ("fixed", [0.5]); "uniform:0.2,1.5" -> ("uniform", [0.2, 1.5])"""
+    if ":" not in spec:
+        return "fixed", [float(spec)]
+    kind, params = spec.split(":", 1)
+    values = [float(p) for p in params.split(",")]
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(f"Invalid latency spec: {spec}")
+    return kind, values
+
+
+def sample_latency(kind: str, values: List[float]) -> float:
+    if kind == "uniform":
+        delay = _rng.uniform(*values)
+    elif kind == "normal":
+        delay = _rng.gauss(*values)
+    elif kind == "lognormal":
+        delay = _rng.lognormvariate(*values)
+    else:
+        delay = values[0]
+    return max(0.0, delay)
+
+
+# ─── RESPONSE GENERATORS ────────────────────────────────────────────────────
+
+def _prompt_rng(text: str) -> random.Random:
+    """Deterministic per prompt, independent of the latency/error sampling"""
+    return random.Random(int(hashlib.sha256(text.encode()).hexdigest()[:16], 16))
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def classifier_response(agent_name: str, text: str) -> str:
+    rng = _prompt_rng(agent_name + text)
+    matched = rng.random() < 0.4
+    return json.dumps({
+        "classification": agent_name,
+        "confidence_score": rng.randint(60, 98) if matched else 0,
+        "criteria_matched": sorted(str(n) for n in rng.sample(range(1, 8), rng.randint(1, 3))) if matched else []
+    }, indent=2)
+
+
+def evaluator_response(text: str) -> str:
+    # The classification subgraph loops until the evaluator says "correct"
+    return "correct"
+
+
+def analysis_response(passage: str, seed: str = "") -> str:
+    rng = _prompt_rng(seed + passage)
+    if rng.random() >= ISSUE_RATE:
+        return json.dumps({
+            "issues_found": False,
+            "problematic_text": "",
+            "observation": "The passage is consistent with the knowledge base and policy guidelines.",
+            "recommendation": ""
+        })
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", passage) if s.strip()] or [passage.strip()]
+    return json.dumps({
+        "issues_found": True,
+        "problematic_text": rng.choice(sentences)[:300],
+        "observation": "The statement presents a contested interpretation as fact without authoritative sourcing.",
+        "recommendation": rng.choice(["rephrase", "fact-check", "provide references", "delete"])
+    })
+
+
+def fused_analysis_response(passage: str, agent_names: List[str]) -> str:
+    """Analysis/fused.py: one review-agent answer plus a confidence per agent"""
+    answers = {}
+    for name in agent_names:
+        answer = json.loads(analysis_response(passage, seed=name))
+        answer["confidence"] = _prompt_rng(name + passage).randint(70, 98)
+        answers[name] = answer
+    return json.dumps(answers)
+
+
+def confidence_response(text: str) -> str:
+    return json.dumps({"confidence": _prompt_rng(text).randint(70, 98)})
+
+
+def generate_response(messages: List[Dict[str, Any]]) -> str:
+    """Picks the generator from the prompt the pipeline sent"""
+    system = "\n".join(_message_text(m) for m in messages if m.get("role") == "system")
+    conversation = "\n".join(_message_text(m) for m in messages if m.get("role") != "system")
+    prompt = system + "\n" + conversation
+
+    classifier = re.search(r"You are a specialized (.+?) Content Classification Agent", system)
+    if classifier:
+        return classifier_response(classifier.group(1).strip(), conversation)
+    if "You are an Evaluation Agent" in system:
+        return evaluator_response(conversation)
+    fused_agents = re.findall(r"^### Agent: (.+)$", prompt, re.MULTILINE)
+    if fused_agents:
+        passage = re.search(r"Text to analyze:(.*?)\n\s*## Policy Guidelines", prompt, re.DOTALL)
+        return fused_analysis_response(passage.group(1).strip() if passage else prompt, fused_agents)
+    if '{"confidence": <score>}' in prompt:
+        return confidence_response(prompt)
+    if "Text to analyze:" in prompt:
+        passage = re.search(r"Text to analyze:(.*?)\n\s*## Knowledge Base Reference", prompt, re.DOTALL)
+        return analysis_response(passage.group(1).strip() if passage else prompt)
+    if "TEXT TO REPHRASE:" in prompt:
+        text = re.search(r"<<<(.*?)>>>", prompt, re.DOTALL)
+        return text.group(1).strip() if text else ""
+    if prompt.strip().lower() == "ping":
+        return "pong"
+    return "OK"
+
+
+# ─── SERVER ─────────────────────────────────────────────────────────────────
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _error(status: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": error_type, "code": status}},
+        headers=headers
+    )
+
+
+def create_app(latency: str = LATENCY, tokens_per_second: float = TOKENS_PER_SECOND,
+               error_rate: float = ERROR_RATE, rate_limit_rate: float = RATE_LIMIT_RATE) -> FastAPI:
+    latency_kind, latency_values = parse_latency(latency)
+    app = FastAPI(title="Mock LLM")
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": MODEL_NAME, "object": "model", "owned_by": "benchmarks"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return _stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        _stats["requests"] += 1
+
+        roll = _rng.random()
+        if roll < rate_limit_rate:
+            _stats["rate_limited"] += 1
+            return _error(429, "Rate limit reached (mock)", "rate_limit_exceeded", {"Retry-After": "1"})
+        if roll < rate_limit_rate + error_rate:
+            _stats["errors"] += 1
+            return _error(500, "Internal server error (mock)", "server_error")
+
+        messages = body.get("messages", [])
+        content = generate_response(messages)
+        prompt_tokens = sum(_tokens(_message_text(m)) for m in messages)
+        completion_tokens = _tokens(content)
+        _stats["prompt_tokens"] += prompt_tokens
+        _stats["completion_tokens"] += completion_tokens
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model") or MODEL_NAME
+        await asyncio.sleep(sample_latency(latency_kind, latency_values))
+
+        if body.get("stream"):
+            async def events():
+                step = CHARS_PER_TOKEN
+                for i in range(0, len(content), step):
+                    if tokens_per_second > 0:
+                        await asyncio.sleep(1 / tokens_per_second)
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"role": "assistant", "content": content[i:i + step]}, "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                final = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        if tokens_per_second > 0:
+            await asyncio.sleep(completion_tokens / tokens_per_second)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default=LATENCY, help='"0.5", "uniform:a,b", "normal:mean,sd" or "lognormal:mu,sigma"')
+    parser.add_argument("--tokens-per-second", type=float, default=TOKENS_PER_SECOND)
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE)
+    parser.add_argument("--rate-limit-rate", type=float, default=RATE_LIMIT_RATE)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        _rng.seed(args.seed)
+
+    print(f"🧪 Mock LLM on http://{args.host}:{args.port}/v1 (latency={args.latency}, "
+          f"tokens/s={args.tokens_per_second or 'unlimited'}, errors={args.error_rate}, 429s={args.rate_limit_rate})")
+    uvicorn.run(create_app(args.latency, args.tokens_per_second, args.error_rate, args.rate_limit_rate),
+                host=args.host, port=args.port)
@@ -0,0 +1,380 @@
+"""End-to-end pipeline benchmark
+
+Seeds synthetic books, runs the real pipeline stages against them and writes the
+measurements as JSON:
+
+    index            Classification.index_document.index
+    classification   Classification.app.supervisor_loop (classification only)
+    analysis         Analysis.mains1.run_workflow
+
+Per stage it reports chunks/sec, p50/p95/p99 per-chunk latency, MongoDB commands per
+chunk, LLM requests per chunk (when the mock server is used) and the process's peak
+RSS after the stage (ru_maxrss never goes down, so it is the peak up to that point).
+
+The pipeline writes to the same databases as the application, and the end of a run
+sets every agent config to active, so use a throwaway MongoDB:
+
+    docker run -d --rm -p 27018:27017 mongo:7
+    python -m benchmarks.mock_llm_server --port 8001 --latency lognormal:-1,0.5 &
+    MONGO_URI=mongodb://localhost:27018/ LLM_API_BASE=http://localhost:8001/v1 LLM_MODEL=mock \\
+        python -m benchmarks.run_pipeline --pages 20 --seed-agents --output bench-<commit>.json
+
+Compare two runs with `python -m benchmarks.compare base.json head.json`.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from pymongo import monitoring
+
+STAGES = ["index", "classification", "analysis"]
+
+# Pipeline settings that would otherwise slow down or skew a benchmark run
+os.environ.setdefault("DELAY", "0")
+os.environ.setdefault("ENABLE_OPIK", "False")
+
+_WORDS = (
+    "the state province army government treaty border policy history nation people "
+    "council assembly partition constitution election province federal frontier region "
+    "tribal economy reform leadership minister conflict agreement independence river "
+    "valley trade alliance committee negotiation report debate movement territory"
+).split()
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts MongoDB commands sent by every client created after registration"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        with self._lock:
+            self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self.counts)
+
+
+# Registered before db.mongo creates its client (imported lazily below)
+command_counter = CommandCounter()
+monitoring.register(command_counter)
+
+
+# ─── SYNTHETIC DATA ─────────────────────────────────────────────────────────
+
+def write_synthetic_pdf(pages: int, words_per_page: int, seed: int) -> str:
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        sentences = []
+        remaining = words_per_page
+        while remaining > 0:
+            length = min(remaining, rng.randint(8, 20))
+            sentence = " ".join(rng.choice(_WORDS) for _ in range(length))
+            sentences.append(sentence.capitalize() + ".")
+            remaining -= length
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), " ".join(sentences), fontsize=9)
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        path = tmp.name
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def seed_book(name: str) -> str:
+    from db.mongo import get_books_collection
+
+    books_collection = get_books_collection()
+    inserted = books_collection.insert_one({
+        "doc_id": "",
+        "doc_name": name,
+        "author": "Benchmark",
+        "category": "Benchmark",
+        "status": "Pending",
+        "labels": [],
+        "startDate": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "benchmark": True
+    })
+    book_id = str(inserted.inserted_id)
+    books_collection.update_one({"_id": inserted.inserted_id}, {"$set": {"doc_id": book_id}})
+    return book_id
+
+
+BENCHMARK_AGENTS = [
+    {
+        "agent_name": "BenchmarkReligious",
+        "type": "classification",
+        "status": True,
+        "classifier_prompt": {
+            "content_indicators": "1. Discusses religious practices or institutions",
+            "authorship_indicators": "2. Written from a religious authority's perspective"
+        },
+        "evaluators_prompt": "The classification must cite the matched criteria."
+    },
+    {
+        "agent_name": "BenchmarkPolitical",
+        "type": "classification",
+        "status": True,
+        "classifier_prompt": {
+            "content_indicators": "1. Discusses political parties or elections",
+            "authorship_indicators": "2. Written from a partisan perspective"
+        },
+        "evaluators_prompt": "The classification must cite the matched criteria."
+    },
+    {
+        "agent_name": "BenchmarkNarrative",
+        "type": "analysis",
+        "status": True,
+        "criteria": "Flag statements that contradict the official narrative.",
+        "guidelines": "Prefer recommending references over deletion.",
+        "confidence_score": 70
+    },
+]
+
+
+def seed_agents():
+    from db.mongo import get_agent_configs_collection
+
+    collection = get_agent_configs_collection()
+    for agent in BENCHMARK_AGENTS:
+        collection.update_one({"agent_name": agent["agent_name"]}, {"$set": {**agent, "benchmark": True}}, upsert=True)
+
+
+def cleanup(book_ids: List[str], agents_seeded: bool):
+    from bson import ObjectId
+    from db.mongo import (
+        get_books_collection, get_chunks_collection, get_review_outcomes_collection,
+        get_progress_events_collection, get_agent_configs_collection
+    )
+
+    get_chunks_collection().delete_many({"doc_id": {"$in": book_ids}})
+    get_review_outcomes_collection().delete_many({"doc_id": {"$in": book_ids}})
+    get_progress_events_collection().delete_many({"book_id": {"$in": book_ids}})
+    get_books_collection().delete_many({"_id": {"$in": [ObjectId(b) for b in book_ids]}})
+    if agents_seeded:
+        get_agent_configs_collection().delete_many({"benchmark": True})
+
+
+# ─── MEASUREMENT ────────────────────────────────────────────────────────────
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _seconds(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if value is not None else None
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def mock_llm_requests(llm_api_base: str) -> Optional[int]:
+    """Request count of benchmarks.mock_llm_server; None when the endpoint is something else"""
+    if not llm_api_base:
+        return None
+    url = llm_api_base.rstrip("/")
+    if url.endswith("/v1"):
+        url = url[:-3]
+    try:
+        with urllib.request.urlopen(f"{url}/stats", timeout=2) as response:
+            return json.loads(response.read())["requests"]
+    except Exception:
+        return None
+
+
+def timed(latencies: List[float], fn: Callable) -> Callable:
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+
+def measure_stage(name: str, run: Callable[[], int], latencies: List[float], llm_api_base: str) -> Dict[str, Any]:
+    """run() executes the stage and returns the number of chunks it processed"""
+    commands_before = command_counter.snapshot()
+    llm_before = mock_llm_requests(llm_api_base)
+    start = time.perf_counter()
+    chunks = run()
+    elapsed = time.perf_counter() - start
+    llm_after = mock_llm_requests(llm_api_base)
+    commands = command_counter.snapshot() - commands_before
+    total_commands = sum(commands.values())
+
+    result = {
+        "stage": name,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "chunks_per_sec": round(chunks / elapsed, 3) if elapsed and chunks else 0,
+        "latency_p50": _seconds(percentile(latencies, 50)),
+        "latency_p95": _seconds(percentile(latencies, 95)),
+        "latency_p99": _seconds(percentile(latencies, 99)),
+        "mongo_commands": total_commands,
+        "mongo_commands_per_chunk": round(total_commands / chunks, 2) if chunks else None,
+        "mongo_commands_by_name": dict(commands.most_common()),
+        "llm_requests_per_chunk": (
+            round((llm_after - llm_before) / chunks, 2)
+            if chunks and llm_before is not None and llm_after is not None else None
+        ),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(f"⏱️  {name}: {chunks} chunks in {elapsed:.1f}s ({result['chunks_per_sec']} chunks/s), "
+          f"p95 {result['latency_p95']}s, {result['mongo_commands_per_chunk']} Mongo commands/chunk")
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+# ─── RUN ────────────────────────────────────────────────────────────────────
+
+def run_benchmark(args) -> Dict[str, Any]:
+    import Classification.app as classification_app
+    import Classification.index_document as index_document
+    import Analysis.mains1 as analysis_main
+    from Classification.models import LLAMA
+    from db.mongo import get_chunks_collection
+    from jobs.handlers import get_active_classification_agents
+
+    llm_api_base = LLAMA.openai_api_base
+    if args.llm_api_base and llm_api_base != args.llm_api_base:
+        # Classification/models.py loads .env with override=True
+        raise SystemExit(f"❌ The LLM endpoint is {llm_api_base}, not {args.llm_api_base}; a .env file overrides LLM_API_BASE")
+    print(f"🧪 Benchmarking against LLM endpoint {llm_api_base}")
+
+    if not args.with_summary:
+        # The summary is a transformers model run once per book, not per chunk
+        index_document.summarize_pdf = lambda chunks: "Benchmark summary."
+
+    if args.seed_agents:
+        seed_agents()
+
+    book_ids = [seed_book(f"benchmark-{i}") for i in range(args.books)]
+    index_latencies, classify_latencies, analyze_latencies = [], [], []
+    results = []
+
+    try:
+        if "index" in args.stages:
+            def run_index():
+                for i, book_id in enumerate(book_ids):
+                    path = write_synthetic_pdf(args.pages, args.words_per_page, args.seed + i)
+                    timed(index_latencies, index_document.index)(path, book_id, args.chunk_size)
+                return get_chunks_collection().count_documents({"doc_id": {"$in": book_ids}})
+
+            results.append(measure_stage("index", run_index, [], llm_api_base))
+            results[-1]["book_latency_p50"] = _seconds(percentile(index_latencies, 50))
+
+        if "classification" in args.stages:
+            agents = get_active_classification_agents()
+            original = classification_app.classify_chunk
+            classification_app.classify_chunk = timed(classify_latencies, original)
+
+            def run_classification():
+                for book_id in book_ids:
+                    classification_app.supervisor_loop(book_id, agents, run_classification=True, run_analysis=False)
+                return len(classify_latencies)
+
+            try:
+                results.append(measure_stage("classification", run_classification, classify_latencies, llm_api_base))
+            finally:
+                classification_app.classify_chunk = original
+            results[-1]["agents"] = len(agents)
+
+        if "analysis" in args.stages:
+            original = analysis_main.analyze_chunk
+            analysis_main.analyze_chunk = timed(analyze_latencies, original)
+
+            def run_analysis():
+                for book_id in book_ids:
+                    analysis_main.run_workflow(book_id, run_analysis=True, run_classification=False, pdf_path="")
+                return len(analyze_latencies)
+
+            try:
+                results.append(measure_stage("analysis", run_analysis, analyze_latencies, llm_api_base))
+            finally:
+                analysis_main.analyze_chunk = original
+    finally:
+        if not args.keep:
+            cleanup(book_ids, args.seed_agents)
+
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "config": {
+            "books": args.books,
+            "pages": args.pages,
+            "words_per_page": args.words_per_page,
+            "chunk_size": args.chunk_size,
+            "stages": args.stages,
+            "with_summary": args.with_summary,
+            "llm_api_base": llm_api_base,
+            "pipelined_analysis": os.getenv("PIPELINED_ANALYSIS", "False"),
+        },
+        "stages": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark indexing, classification and analysis end to end")
+    parser.add_argument("--books", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma separated subset of " + ", ".join(STAGES))
+    parser.add_argument("--llm-api-base", default=os.getenv("LLM_API_BASE"), help="Expected LLM endpoint (checked, not set)")
+    parser.add_argument("--with-summary", action="store_true", help="Run the book summarizer during indexing")
+    parser.add_argument("--seed-agents", action="store_true", help="Add benchmark classification/analysis agents for the run")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic text")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark books and chunks afterwards")
+    parser.add_argument("--output", help="Write the JSON results here (default: stdout)")
+    args = parser.parse_args()
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    report = run_benchmark(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"✅ Results written to {args.output}")
+    else:
+        print(output)
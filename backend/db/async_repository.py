@@ -0,0 +1,125 @@
+"""Async data access used by the API routes (see db/mongo_async.py)"""
+from typing import Any, AsyncIterator, Dict, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from db.mongo_async import (
+    get_async_books_collection,
+    get_async_chunks_collection,
+    get_async_review_outcomes_collection,
+    get_async_agent_configs_collection,
+    get_async_gridfs,
+)
+
+
+# --- Books ---
+
+async def find_books(query: Optional[Dict] = None, projection: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    return await get_async_books_collection().find(query or {}, projection).to_list(length=None)
+
+async def find_book(book_id: str, projection: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+    return await get_async_books_collection().find_one({"_id": ObjectId(book_id)}, projection)
+
+async def count_books(query: Optional[Dict] = None) -> int:
+    books_collection = get_async_books_collection()
+    if not query:
+        # Collection metadata, no scan
+        return await books_collection.estimated_document_count()
+    return await books_collection.count_documents(query)
+
+async def find_books_page(
+    query: Dict,
+    sort: List,
+    limit: int,
+    projection: Optional[Dict] = None
+) -> List[Dict[str, Any]]:
+    return await get_async_books_collection().find(query, projection).sort(sort).limit(limit).to_list(length=limit)
+
+async def insert_book(book: Dict[str, Any]) -> str:
+    """Inserts the book and sets doc_id to the generated _id. Returns the id."""
+    books_collection = get_async_books_collection()
+    result = await books_collection.insert_one(book)
+    await books_collection.update_one({"_id": result.inserted_id}, {"$set": {"doc_id": str(result.inserted_id)}})
+    return str(result.inserted_id)
+
+async def update_book(book_id: str, update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Applies a raw update document and returns the updated book (None if it does not exist)."""
+    return await get_async_books_collection().find_one_and_update(
+        {"_id": ObjectId(book_id)},
+        update,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+# --- Chunks ---
+
+async def find_chunks(query: Optional[Dict] = None, projection: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    return await get_async_chunks_collection().find(query or {}, projection).to_list(length=None)
+
+async def find_chunks_page(query: Dict, sort: List, limit: int, projection: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    return await get_async_chunks_collection().find(query, projection).sort(sort).limit(limit).to_list(length=limit)
+
+async def iter_chunks(query: Dict, projection: Optional[Dict] = None, sort: Optional[List] = None, batch_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+    """Yields chunks as the cursor returns them; only one batch is held in memory."""
+    cursor = get_async_chunks_collection().find(query, projection, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+    async for chunk in cursor:
+        yield chunk
+
+async def aggregate_chunks(pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return await get_async_chunks_collection().aggregate(pipeline).to_list(length=None)
+
+async def chunk_exists(query: Dict) -> bool:
+    return await get_async_chunks_collection().find_one(query, {"_id": 1}) is not None
+
+async def count_chunks(query: Optional[Dict] = None) -> int:
+    return await get_async_chunks_collection().count_documents(query or {})
+
+
+# --- Review outcomes ---
+
+async def find_review_outcomes(query: Optional[Dict] = None, projection: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    return await get_async_review_outcomes_collection().find(query or {}, projection).to_list(length=None)
+
+async def find_review_outcomes_page(query: Dict, sort: List, limit: int, projection: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    return await get_async_review_outcomes_collection().find(query, projection).sort(sort).limit(limit).to_list(length=limit)
+
+async def iter_review_outcomes(query: Dict, projection: Optional[Dict] = None, sort: Optional[List] = None, batch_size: int = 200) -> AsyncIterator[Dict[str, Any]]:
+    cursor = get_async_review_outcomes_collection().find(query, projection, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+    async for outcome in cursor:
+        yield outcome
+
+async def count_review_outcomes(query: Optional[Dict] = None) -> int:
+    return await get_async_review_outcomes_collection().count_documents(query or {})
+
+
+# --- Agent configs ---
+
+async def find_agent_names(agent_type: str) -> List[str]:
+    """Names of all configured agents of a type, active or not (outcomes keep results of disabled agents)."""
+    return await get_async_agent_configs_collection().distinct("agent_name", {"type": agent_type})
+
+
+# --- GridFS ---
+
+async def put_file(data: bytes, filename: str, content_type: Optional[str] = None) -> ObjectId:
+    metadata = {"contentType": content_type} if content_type else None
+    return await get_async_gridfs().upload_from_stream(filename, data, metadata=metadata)
+
+async def open_file(file_id):
+    """Opens a GridFS file for streaming; raises gridfs.errors.NoFile if it does not exist."""
+    return await get_async_gridfs().open_download_stream(file_id)
+
+def file_content_type(grid_out, default: str = "application/octet-stream") -> str:
+    # Files stored by the sync GridFS.put carry contentType at the top level, bucket uploads in metadata
+    return (grid_out.metadata or {}).get("contentType") or getattr(grid_out, "content_type", None) or default
+
+async def iter_file(grid_out) -> AsyncIterator[bytes]:
+    """Yields the file chunk by chunk, for StreamingResponse."""
+    while True:
+        chunk = await grid_out.readchunk()
+        if not chunk:
+            break
+        yield chunk
@@ -0,0 +1,204 @@
+"""Index registry for the hot query paths
+
+Every index the application relies on is declared in INDEXES and created by
+ensure_indexes() when the API or a worker starts. create_index is a no-op when the
+index already exists, so this is safe to run on every startup. A changed TTL is
+applied to the existing index with collMod. ensure_indexes never modifies data: a
+unique index over existing duplicates is reported and skipped.
+
+Check that the hot queries actually use them with:
+
+    python -m db.indexes --explain
+"""
+import argparse
+import os
+from typing import Any, Dict, List
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from db.mongo import (
+    get_users_collection,
+    get_books_collection,
+    get_chunks_collection,
+    get_review_outcomes_collection,
+    get_jobs_collection,
+    get_agent_configs_collection,
+    get_progress_events_collection,
+    get_llm_cache_collection,
+)
+
+# (collection getter, keys, options)
+INDEXES = [
+    # Claiming ranges, context windows, per-book chunk listings
+    (get_chunks_collection, [("doc_id", ASCENDING), ("status", ASCENDING), ("chunk_index", ASCENDING)], {"name": "doc_status_index"}),
+    # _id suffix lets keyset-paginated chunk listings sort on the index
+    (get_chunks_collection, [("doc_id", ASCENDING), ("chunk_index", ASCENDING), ("_id", ASCENDING)], {"name": "doc_chunk_index_id"}),
+    (get_chunks_collection, [("doc_id", ASCENDING), ("analysis_status", ASCENDING)], {"name": "doc_analysis_status"}),
+    (get_chunks_collection, [("chunk_id", ASCENDING)], {"name": "chunk_id_unique", "unique": True}),
+    # Only chunks under a range lease carry a lease_token
+    (get_chunks_collection, [("lease_token", ASCENDING)], {"name": "lease_token", "sparse": True}),
+
+    # Results are upserted by Chunk_ID, so there is exactly one outcome per chunk
+    # Databases with duplicates from before need `python -m db.migrate_review_outcomes` first
+    (get_review_outcomes_collection, [("Chunk_ID", ASCENDING)], {"name": "chunk_id_unique", "unique": True}),
+    (get_review_outcomes_collection, [("doc_id", ASCENDING)], {"name": "doc_id"}),
+    # Paginated per-book outcomes in chunk order
+    (get_review_outcomes_collection, [("doc_id", ASCENDING), ("Chunk no.", ASCENDING), ("_id", ASCENDING)], {"name": "doc_chunk_no_id"}),
+
+    (get_books_collection, [("doc_id", ASCENDING)], {"name": "doc_id"}),
+    # Paginated books list: each filter followed by the keyset sort
+    (get_books_collection, [("status", ASCENDING), ("_id", DESCENDING)], {"name": "status_id"}),
+    (get_books_collection, [("category", ASCENDING), ("_id", DESCENDING)], {"name": "category_id"}),
+    (get_books_collection, [("labels", ASCENDING), ("_id", DESCENDING)], {"name": "labels_id"}),
+    (get_books_collection, [("startDate", DESCENDING), ("_id", DESCENDING)], {"name": "start_date_id"}),
+
+    (get_users_collection, [("username", ASCENDING)], {"name": "username_unique", "unique": True}),
+
+    (get_agent_configs_collection, [("type", ASCENDING), ("status", ASCENDING)], {"name": "type_status"}),
+
+    # Progress events are only needed until every API process has seen them
+    (get_progress_events_collection, [("created_at", ASCENDING)],
+     {"name": "created_at_ttl", "expireAfterSeconds": int(os.getenv("PROGRESS_EVENTS_TTL_SECONDS", "3600"))}),
+
+    # LLM response cache (utils/llm_cache.py): expiry, and least recently used eviction
+    (get_llm_cache_collection, [("created_at", ASCENDING)],
+     {"name": "created_at_ttl", "expireAfterSeconds": int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))}),
+    (get_llm_cache_collection, [("last_used_at", ASCENDING)], {"name": "last_used_at"}),
+
+    # claim_next_job: claimable jobs by priority, then FIFO
+    (get_jobs_collection, [("status", ASCENDING), ("priority", DESCENDING), ("created_at", ASCENDING)], {"name": "claim_order"}),
+    (get_jobs_collection, [("book_id", ASCENDING), ("created_at", DESCENDING)], {"name": "book_jobs"}),
+]
+
+# Placeholder values are fine: explain() reports the chosen plan, not the matches
+_SAMPLE_DOC_ID = "000000000000000000000000"
+
+# (name, collection getter, filter, sort)
+HOT_QUERIES = [
+    ("claim chunk range", get_chunks_collection,
+     {"doc_id": _SAMPLE_DOC_ID, "status": "pending"}, [("chunk_index", ASCENDING)]),
+    ("chunk context window", get_chunks_collection,
+     {"doc_id": _SAMPLE_DOC_ID, "chunk_index": {"$gte": 0, "$lte": 30}}, [("chunk_index", ASCENDING)]),
+    ("chunks page of a book", get_chunks_collection,
+     {"doc_id": _SAMPLE_DOC_ID}, [("chunk_index", ASCENDING), ("_id", ASCENDING)]),
+    ("pending analysis chunks", get_chunks_collection,
+     {"doc_id": _SAMPLE_DOC_ID, "analysis_status": "Pending"}, None),
+    ("chunk by chunk_id", get_chunks_collection,
+     {"chunk_id": "sample"}, None),
+    ("chunks under a lease", get_chunks_collection,
+     {"lease_token": "sample", "status": "processing"}, None),
+    ("review outcomes of a book", get_review_outcomes_collection,
+     {"doc_id": _SAMPLE_DOC_ID}, None),
+    ("review outcomes page of a book", get_review_outcomes_collection,
+     {"doc_id": _SAMPLE_DOC_ID}, [("Chunk no.", ASCENDING), ("_id", ASCENDING)]),
+    ("review outcome by chunk", get_review_outcomes_collection,
+     {"Chunk_ID": "sample"}, None),
+    ("books page by status", get_books_collection,
+     {"status": "Processed"}, [("_id", DESCENDING)]),
+    ("books page by start date", get_books_collection,
+     {}, [("startDate", DESCENDING), ("_id", DESCENDING)]),
+    ("book by doc_id", get_books_collection,
+     {"doc_id": _SAMPLE_DOC_ID}, None),
+    ("user by username", get_users_collection,
+     {"username": "sample"}, None),
+    ("active agents", get_agent_configs_collection,
+     {"type": "classification", "status": True}, None),
+    ("next claimable job", get_jobs_collection,
+     {"status": "queued"}, [("priority", DESCENDING), ("created_at", ASCENDING)]),
+    ("jobs of a book", get_jobs_collection,
+     {"book_id": _SAMPLE_DOC_ID}, [("created_at", DESCENDING)]),
+]
+
+
+DUPLICATE_KEY = 11000
+INDEX_OPTIONS_CONFLICT = 85
+
+
+def _update_ttl(collection, options: Dict[str, Any]) -> bool:
+    """Applies a changed expireAfterSeconds to the existing index; False when the index differs otherwise."""
+    existing = collection.index_information().get(options["name"], {})
+    if "expireAfterSeconds" not in existing or "expireAfterSeconds" not in options:
+        return False
+    collection.database.command(
+        "collMod", collection.name,
+        index={"name": options["name"], "expireAfterSeconds": options["expireAfterSeconds"]}
+    )
+    print(f"[Indexes] 🔄 {collection.full_name}.{options['name']} TTL changed from "
+          f"{existing['expireAfterSeconds']}s to {options['expireAfterSeconds']}s")
+    return True
+
+
+def ensure_indexes() -> Dict[str, List[str]]:
+    """
+    Creates every index in INDEXES. A failing index (e.g. a unique index over existing
+    duplicates) is reported and skipped so the others are still created.
+    Returns {"created": [...], "failed": [...]}.
+    """
+    created, failed = [], []
+    for get_collection, keys, options in INDEXES:
+        collection = get_collection()
+        label = f"{collection.full_name}.{options['name']}"
+        try:
+            collection.create_index(keys, **options)
+            created.append(label)
+        except OperationFailure as e:
+            if e.code == INDEX_OPTIONS_CONFLICT:
+                try:
+                    if _update_ttl(collection, options):
+                        created.append(label)
+                        continue
+                except OperationFailure as collmod_error:
+                    e = collmod_error
+            failed.append(label)
+            if e.code == DUPLICATE_KEY:
+                print(f"[Indexes] ❌ Skipped {label}: the collection has duplicate keys. Remove them first "
+                      f"(for review outcomes: python -m db.migrate_review_outcomes --dry-run)")
+            else:
+                print(f"[Indexes] ❌ Could not create {label}: {e}")
+    print(f"[Indexes] ✅ {len(created)} indexes ensured, {len(failed)} failed")
+    return {"created": created, "failed": failed}
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """All stage names in a winning plan tree"""
+    stages = [plan.get("stage")] if plan.get("stage") else []
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def explain_hot_queries() -> List[Dict[str, Any]]:
+    """Runs explain() on every HOT_QUERIES entry and flags the ones that scan the whole collection."""
+    report = []
+    for name, get_collection, query, sort in HOT_QUERIES:
+        cursor = get_collection().find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.limit(1).explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(plan)
+        report.append({
+            "query": name,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and check MongoDB indexes")
+    parser.add_argument("--explain", action="store_true", help="Explain the hot queries and flag collection scans")
+    parser.add_argument("--no-create", action="store_true", help="Do not create missing indexes first")
+    args = parser.parse_args()
+
+    if not args.no_create:
+        ensure_indexes()
+
+    if args.explain:
+        scans = 0
+        for entry in explain_hot_queries():
+            flag = "⚠️  COLLSCAN" if entry["collscan"] else "✅"
+            print(f"{flag} {entry['query']}: {' <- '.join(entry['stages'])}")
+            scans += entry["collscan"]
+        raise SystemExit(1 if scans else 0)
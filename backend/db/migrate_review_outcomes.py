@@ -0,0 +1,41 @@
+"""Removes duplicate review outcomes before the unique Chunk_ID index is built
+
+Outcomes used to be inserted once per analysis run, so re-analysed chunks have several.
+They are upserted by Chunk_ID now, and review_outcomes.chunk_id_unique (db/indexes.py)
+cannot be created while duplicates exist. ensure_indexes() only reports that and skips
+the index; removing the duplicates is up to an operator:
+
+    python -m db.migrate_review_outcomes [--dry-run]
+
+The newest outcome of each chunk (latest timestamp) is kept and the older ones are
+deleted, including any reviewer edits made to them, so check with --dry-run first.
+The migration is idempotent; running it again only reports that there is nothing to
+remove.
+"""
+import argparse
+from db.mongo import get_review_outcomes_collection
+
+
+def dedupe_review_outcomes(dry_run: bool = False) -> int:
+    """Deletes all but the newest outcome per Chunk_ID. Returns how many were (or would be) deleted."""
+    collection = get_review_outcomes_collection()
+    duplicates = collection.aggregate([
+        {"$sort": {"timestamp": -1, "_id": -1}},
+        {"$group": {"_id": "$Chunk_ID", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+
+    stale = [outcome_id for group in duplicates for outcome_id in group["ids"][1:]]
+    if stale and not dry_run:
+        for start in range(0, len(stale), 1000):
+            collection.delete_many({"_id": {"$in": stale[start:start + 1000]}})
+    action = "would be removed" if dry_run else "removed"
+    print(f"✅ {len(stale)} duplicate review outcomes {action}")
+    return len(stale)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove duplicate review outcomes (one outcome per Chunk_ID)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many would be removed")
+    args = parser.parse_args()
+    dedupe_review_outcomes(dry_run=args.dry_run)
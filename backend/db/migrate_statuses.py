@@ -0,0 +1,45 @@
+"""One-time migration of chunk statuses to their canonical casing
+
+Older chunks were written with mixed casing ("pending", "PENDING", ...). Statuses are
+normalized on write now and every status query is an exact match, so existing chunks
+have to be rewritten once:
+
+    python -m db.migrate_statuses
+
+The migration is idempotent; running it again only reports what is already canonical.
+"""
+from db.mongo import get_chunks_collection
+from models.chunk_status import ChunkStatus, AnalysisStatus
+
+STATUS_FIELDS = {
+    "status": ChunkStatus,
+    "analysis_status": AnalysisStatus,
+}
+
+
+def migrate_chunk_statuses() -> dict:
+    """Rewrites every case variant of a known status to its canonical value. Returns modified counts per field."""
+    chunks_collection = get_chunks_collection()
+    modified = {}
+
+    for field, enum_cls in STATUS_FIELDS.items():
+        modified[field] = 0
+        for member in enum_cls:
+            # A regex scan is fine here: it runs once, not on the hot path
+            result = chunks_collection.update_many(
+                {field: {"$regex": f"^\\s*{member.value}\\s*$", "$options": "i", "$ne": member.value}},
+                {"$set": {field: member.value}}
+            )
+            modified[field] += result.modified_count
+
+        canonical = [m.value for m in enum_cls]
+        unknown = [v for v in chunks_collection.distinct(field) if v not in canonical]
+        if unknown:
+            print(f"⚠️ Unknown {field} values left untouched: {unknown}")
+        print(f"✅ {field}: {modified[field]} chunks normalized")
+
+    return modified
+
+
+if __name__ == "__main__":
+    migrate_chunk_statuses()
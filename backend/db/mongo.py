@@ -1,8 +1,9 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 import gridfs
 import os
 from datetime import datetime 
 from bson import ObjectId
+from models.chunk_status import ChunkStatus, AnalysisStatus
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 
@@ -17,6 +18,12 @@ doc_class_db = client["document_classification"]
 books_collection = doc_class_db["documents"]
 chunks_collection = doc_class_db["chunks"]
 review_outcomes_collection = doc_class_db["review_outcomes"]
+jobs_collection = doc_class_db["jobs"]
+job_slots_collection = doc_class_db["job_slots"]
+progress_events_collection = doc_class_db["progress_events"]
+llm_cache_collection = doc_class_db["llm_cache"]
+llm_cache_stats_collection = doc_class_db["llm_cache_stats"]
+result_reuse_collection = doc_class_db["result_reuse"]
 
 review_db = client["review_db"]
 agent_configs_collection = review_db["agent_configs"]
@@ -39,6 +46,24 @@ def get_chunks_collection():
 def get_review_outcomes_collection():
     return review_outcomes_collection
 
+def get_jobs_collection():
+    return jobs_collection
+
+def get_job_slots_collection():
+    return job_slots_collection
+
+def get_progress_events_collection():
+    return progress_events_collection
+
+def get_llm_cache_collection():
+    return llm_cache_collection
+
+def get_llm_cache_stats_collection():
+    return llm_cache_stats_collection
+
+def get_result_reuse_collection():
+    return result_reuse_collection
+
 def get_agent_configs_collection():
     return agent_configs_collection
 
@@ -88,3 +113,41 @@ def finalize_status(book_id: str, new_status: str):
                 "lastFinalStatus": new_status
             }}
         )
+
+
+# --- Per-book progress counters ---
+# books.progress = {"total": <chunks>, "classified": <status done>, "analyzed": <analysis_status Complete>,
+#                   "reused_classification": <copied>, "reused_analysis": <copied>}
+# Kept up to date with $inc as chunks finish, so progress reads are O(1) instead of count_documents.
+
+def reset_progress_counters(book_id: str, total: int = None):
+    """Recomputes the counters from the chunks. Call once before a book starts processing."""
+    if total is None:
+        total = chunks_collection.count_documents({"doc_id": book_id})
+    progress = {
+        "total": total,
+        "classified": chunks_collection.count_documents({"doc_id": book_id, "status": ChunkStatus.DONE.value}) if total else 0,
+        "analyzed": chunks_collection.count_documents({"doc_id": book_id, "analysis_status": AnalysisStatus.COMPLETE.value}) if total else 0,
+        # Chunks whose results were copied from an identical chunk (db/result_reuse.py)
+        "reused_classification": chunks_collection.count_documents({"doc_id": book_id, "classification_reused": True}) if total else 0,
+        "reused_analysis": chunks_collection.count_documents({"doc_id": book_id, "analysis_reused": True}) if total else 0
+    }
+    books_collection.update_one({"_id": ObjectId(book_id)}, {"$set": {"progress": progress}})
+    return progress
+
+def increment_progress(book_id: str, field: str, amount: int = 1) -> dict:
+    """Atomically adds to one counter and returns the updated counters."""
+    book = books_collection.find_one_and_update(
+        {"_id": ObjectId(book_id)},
+        {"$inc": {f"progress.{field}": amount}},
+        projection={"progress": 1, "_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    return (book or {}).get("progress", {})
+
+def get_progress(book_id: str) -> dict:
+    book = books_collection.find_one({"_id": ObjectId(book_id)}, {"progress": 1, "_id": 0})
+    return (book or {}).get("progress", {})
+
+def progress_percent(done: int, total: int) -> int:
+    return int((done / total) * 100) if total else 0
@@ -0,0 +1,63 @@
+"""Async (Motor) MongoDB access for the API
+
+Routes that run on the event loop must not use the synchronous client in db/mongo.py:
+every call blocks the loop, and plain `def` routes hold a threadpool slot for the whole
+request. This client has its own connection pool, sized with:
+
+    MONGO_ASYNC_MAX_POOL_SIZE   (default 100)
+    MONGO_ASYNC_MIN_POOL_SIZE   (default 0)
+    MONGO_ASYNC_MAX_IDLE_MS     (default 60000)
+    MONGO_ASYNC_WAIT_QUEUE_MS   (default 10000) how long a request waits for a free connection
+
+Workers and the processing pipeline keep using db/mongo.py.
+"""
+import os
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+
+_client = None
+
+
+def get_async_client() -> AsyncIOMotorClient:
+    """Created on first use, so processes that never serve requests don't open a pool."""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            MONGO_URI,
+            maxPoolSize=int(os.getenv("MONGO_ASYNC_MAX_POOL_SIZE", "100")),
+            minPoolSize=int(os.getenv("MONGO_ASYNC_MIN_POOL_SIZE", "0")),
+            maxIdleTimeMS=int(os.getenv("MONGO_ASYNC_MAX_IDLE_MS", "60000")),
+            waitQueueTimeoutMS=int(os.getenv("MONGO_ASYNC_WAIT_QUEUE_MS", "10000")),
+        )
+    return _client
+
+
+def close_async_client():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def get_async_users_collection():
+    return get_async_client()["ai-books"]["users"]
+
+def get_async_books_collection():
+    return get_async_client()["document_classification"]["documents"]
+
+def get_async_chunks_collection():
+    return get_async_client()["document_classification"]["chunks"]
+
+def get_async_review_outcomes_collection():
+    return get_async_client()["document_classification"]["review_outcomes"]
+
+def get_async_progress_events_collection():
+    return get_async_client()["document_classification"]["progress_events"]
+
+def get_async_agent_configs_collection():
+    return get_async_client()["review_db"]["agent_configs"]
+
+def get_async_gridfs() -> AsyncIOMotorGridFSBucket:
+    # Same fs.files / fs.chunks collections as the sync GridFS in db/mongo.py
+    return AsyncIOMotorGridFSBucket(get_async_client()["document_classification"])
@@ -0,0 +1,141 @@
+"""Cross-book reuse of chunk results by content hash
+
+Many books quote the same statements, speeches and appendices verbatim. Once a chunk's
+text has been classified (or analysed) under a given set of agent configs, the result
+is stored in document_classification.result_reuse under
+
+    <stage>:<agent fingerprint>:<normalised text hash>
+
+and any later chunk with the same text gets a copy instead of new LLM calls. The
+fingerprint covers the active agent configs of the stage and the LLM model, so editing
+an agent or switching models starts from a clean slate. Analysis results also depend
+on the knowledge base retrieved at run time, so the analysis fingerprint includes a
+hash of knowledge_base.kb_data as well. `python -m db.result_reuse --clear` drops
+every stored result.
+
+Reused chunks are flagged (classification_reused / analysis_reused) and counted in
+books.progress.reused_classification / reused_analysis. Disable with RESULT_REUSE=False.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from db.mongo import get_result_reuse_collection, get_agent_configs_collection, get_kb_data_collection
+
+STAGE_CLASSIFICATION = "classification"
+STAGE_ANALYSIS = "analysis"
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Agent config fields that change what an agent answers
+_CLASSIFICATION_AGENT_FIELDS = ("agent_name", "classifier_prompt", "evaluators_prompt")
+_ANALYSIS_AGENT_FIELDS = ("agent_name", "criteria", "guidelines", "confidence_score", "knowledge_base")
+
+
+def is_result_reuse_enabled() -> bool:
+    return os.getenv("RESULT_REUSE", "True") == "True"
+
+
+def normalize_chunk_text(text: str) -> str:
+    """NFKC (ligatures, full-width forms from PDF extraction) and collapsed whitespace"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_chunk_text(text).encode("utf-8")).hexdigest()
+
+
+def _fingerprint(agents: List[Dict[str, Any]], fields, knowledge_base: Optional[str] = None) -> str:
+    configs = sorted(
+        ({field: agent.get(field) for field in fields} for agent in agents),
+        key=lambda config: str(config.get("agent_name"))
+    )
+    raw = json.dumps({"model": os.getenv("LLM_MODEL"), "agents": configs, "knowledge_base": knowledge_base},
+                     sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def classification_fingerprint(agent_list: List[Dict[str, Any]]) -> str:
+    """Fingerprint of the classification agents a chunk is classified with"""
+    return _fingerprint(agent_list, _CLASSIFICATION_AGENT_FIELDS)
+
+
+def knowledge_base_hash() -> str:
+    """Hash of the knowledge base entries the review agents retrieve from (Analysis/knowledge_base.py)"""
+    entries = sorted(
+        (str(doc.get("topic")), str(doc.get("json_data")))
+        for doc in get_kb_data_collection().find({}, {"_id": 0, "topic": 1, "json_data": 1})
+    )
+    return hashlib.sha256(json.dumps(entries).encode("utf-8")).hexdigest()[:16]
+
+
+def analysis_fingerprint() -> str:
+    """
+    Fingerprint of the active analysis agents, as loaded by Analysis.agents.load_agents_from_mongo,
+    and of the knowledge base they consult
+    """
+    agents = list(get_agent_configs_collection().find({"status": True, "type": "analysis"}, {"_id": 0}))
+    return _fingerprint(agents, _ANALYSIS_AGENT_FIELDS, knowledge_base_hash())
+
+
+def _key(stage: str, fingerprint: str, content_hash: str) -> str:
+    return f"{stage}:{fingerprint}:{content_hash}"
+
+
+def find_reusable_result(stage: str, content_hash: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """The stored entry ({"result", "source_chunk_id"}) or None. Never raises into the pipeline."""
+    try:
+        return get_result_reuse_collection().find_one(
+            {"_id": _key(stage, fingerprint, content_hash)},
+            {"_id": 0, "result": 1, "source_chunk_id": 1}
+        )
+    except Exception as e:
+        print(f"[Result Reuse] ⚠️ Lookup failed: {e}")
+        return None
+
+
+def store_reusable_result(stage: str, content_hash: str, fingerprint: str, result: Any, source_chunk_id: str):
+    """Keeps the first result stored for a text; later identical chunks copy that one."""
+    try:
+        get_result_reuse_collection().update_one(
+            {"_id": _key(stage, fingerprint, content_hash)},
+            {"$setOnInsert": {
+                "stage": stage,
+                "fingerprint": fingerprint,
+                "text_hash": content_hash,
+                "result": result,
+                "source_chunk_id": source_chunk_id,
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"[Result Reuse] ⚠️ Store failed: {e}")
+
+
+# review_outcomes fields that describe the chunk rather than the analysis
+ANALYSIS_IDENTITY_FIELDS = ("_id", "timestamp", "doc_id", "Book Name", "Page Number", "Chunk_ID",
+                            "Chunk no.", "Text Analyzed", "coordinates", "reused_from")
+
+
+def reusable_analysis_result(result_document: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a review_outcomes document that can be copied to another chunk"""
+    return {k: v for k, v in result_document.items() if k not in ANALYSIS_IDENTITY_FIELDS}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear reusable chunk results")
+    parser.add_argument("--clear", action="store_true", help="Delete every stored result")
+    args = parser.parse_args()
+
+    collection = get_result_reuse_collection()
+    if args.clear:
+        deleted = collection.delete_many({}).deleted_count
+        print(f"🧹 Deleted {deleted} reusable results")
+    else:
+        for stage in (STAGE_CLASSIFICATION, STAGE_ANALYSIS):
+            print(f"{stage}: {collection.count_documents({'stage': stage})} reusable results")
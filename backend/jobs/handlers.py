@@ -0,0 +1,62 @@
+"""Job handlers executed by worker processes"""
+import tempfile
+from typing import Dict, Any
+from bson import ObjectId
+from db.mongo import get_books_collection, get_agent_configs_collection, get_gridfs
+from .job_queue import JOB_TYPE_INDEX, JOB_TYPE_PROCESS
+
+
+def get_active_classification_agents():
+    agent_configs_collection = get_agent_configs_collection()
+    return list(agent_configs_collection.find(
+        {"type": "classification", "status": True},  # Filter only active agents
+        {"_id": 0, "agent_name": 1, "classifier_prompt": 1, "evaluators_prompt": 1}
+    ))
+
+
+def write_book_file_to_temp(book_id: str) -> str:
+    """Copies the book's PDF from GridFS to a temp file so any worker node can process it."""
+    books_collection = get_books_collection()
+    book = books_collection.find_one({"_id": ObjectId(book_id)}, {"file_id": 1})
+    if not book or "file_id" not in book:
+        raise ValueError(f"Book or file not found for {book_id}")
+
+    file_obj = get_gridfs().get(book["file_id"])
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(file_obj.read())
+        return tmp.name
+
+
+def handle_index(job: Dict[str, Any]):
+    from Classification.index_document import index
+
+    book_id = job["book_id"]
+    chunk_size = job["payload"].get("chunk_size", 1000)
+    tmp_path = write_book_file_to_temp(book_id)
+    # index() removes the temp file when it is done
+    index(tmp_path, book_id, chunk_size)
+
+
+def handle_process(job: Dict[str, Any]):
+    from Classification.app import supervisor_loop
+
+    payload = job["payload"]
+    supervisor_loop(
+        job["book_id"],
+        get_active_classification_agents(),
+        payload.get("run_classification", True),
+        payload.get("run_analysis", True)
+    )
+
+
+JOB_HANDLERS = {
+    JOB_TYPE_INDEX: handle_index,
+    JOB_TYPE_PROCESS: handle_process,
+}
+
+
+def run_job(job: Dict[str, Any]):
+    handler = JOB_HANDLERS.get(job["type"])
+    if handler is None:
+        raise ValueError(f"Unknown job type '{job['type']}'")
+    handler(job)
@@ -0,0 +1,288 @@
+"""Durable book processing queue stored in the document_classification.jobs collection
+
+Jobs are claimed with a lease: the claiming worker owns the job until
+lease_expires_at and must keep extending it with heartbeat(). A job whose lease
+runs out (crashed or hung worker) becomes claimable again. Failed jobs are retried
+with exponential backoff until max_attempts, and job_slots limits how many jobs
+may run for the same book at once.
+"""
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from db.mongo import get_jobs_collection, get_job_slots_collection
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+JOB_TYPE_INDEX = "index"
+JOB_TYPE_PROCESS = "process"
+
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = int(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "30"))
+MAX_JOBS_PER_BOOK = int(os.getenv("MAX_JOBS_PER_BOOK", "2"))
+# How long a job waits before being offered again when its book is at capacity
+BOOK_BUSY_DELAY_SECONDS = int(os.getenv("BOOK_BUSY_DELAY_SECONDS", "5"))
+
+# Lease of the job running on this thread, set by the worker's LeaseHeartbeat
+_active_lease = threading.local()
+
+
+class LeaseLost(RuntimeError):
+    """The running job's lease was taken over by another worker"""
+
+
+def set_active_lease(lease):
+    _active_lease.value = lease
+
+
+def check_lease():
+    """
+    Raises LeaseLost when the job running on this thread lost its lease. Long running
+    handlers call this between units of work, so a worker whose lease ran out stops
+    instead of racing the worker that took the job over.
+    """
+    lease = getattr(_active_lease, "value", None)
+    if lease is not None and lease.lost:
+        raise LeaseLost(f"Lease lost for job {lease.job_id}")
+
+
+def enqueue_job(
+    job_type: str,
+    book_id: str,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: int = 0,
+    max_attempts: Optional[int] = None
+) -> str:
+    """Adds a job to the queue and returns its id. Higher priority jobs are claimed first, then FIFO."""
+    jobs_collection = get_jobs_collection()
+    now = datetime.utcnow()
+    result = jobs_collection.insert_one({
+        "type": job_type,
+        "book_id": book_id,
+        "payload": payload or {},
+        "status": JOB_QUEUED,
+        "priority": priority,
+        "attempts": 0,
+        "max_attempts": max_attempts or JOB_MAX_ATTEMPTS,
+        "available_at": now,
+        "lease_token": None,
+        "lease_expires_at": None,
+        "heartbeat_at": None,
+        "worker_id": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    })
+    return str(result.inserted_id)
+
+
+def _claimable_query(now: datetime, job_types: Optional[List[str]]) -> Dict[str, Any]:
+    query = {
+        "$or": [
+            {"status": JOB_QUEUED, "available_at": {"$lte": now}},
+            # Stalled job: the owning worker stopped heartbeating
+            {"status": JOB_RUNNING, "lease_expires_at": {"$lt": now}},
+        ],
+        "$expr": {"$lt": ["$attempts", "$max_attempts"]}
+    }
+    if job_types:
+        query["type"] = {"$in": job_types}
+    return query
+
+
+def acquire_book_slot(book_id: str, job_id: str, limit: int = None) -> bool:
+    """
+    Registers job_id as running for the book unless the book already has `limit` running jobs.
+    Re-acquiring a slot the job already holds (e.g. after a lease takeover) always succeeds.
+    """
+    limit = limit or MAX_JOBS_PER_BOOK
+    slots_collection = get_job_slots_collection()
+    try:
+        slots_collection.update_one(
+            {
+                "_id": book_id,
+                "$or": [
+                    {"holders": job_id},
+                    {f"holders.{limit - 1}": {"$exists": False}}
+                ]
+            },
+            {"$addToSet": {"holders": job_id}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # The slot document exists but is full, so the upsert tried to insert a duplicate _id
+        return False
+
+
+def release_book_slot(book_id: str, job_id: str):
+    slots_collection = get_job_slots_collection()
+    slots_collection.update_one({"_id": book_id}, {"$pull": {"holders": job_id}})
+
+
+def claim_next_job(worker_id: str, job_types: Optional[List[str]] = None, max_tries: int = 5) -> Optional[Dict[str, Any]]:
+    """
+    Atomically leases the highest priority claimable job to the worker.
+    find_one_and_update guarantees two workers never receive the same lease. Jobs whose
+    book is already at its concurrency limit are handed back with a short delay.
+    """
+    jobs_collection = get_jobs_collection()
+
+    for _ in range(max_tries):
+        now = datetime.utcnow()
+        job = jobs_collection.find_one_and_update(
+            _claimable_query(now, job_types),
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "worker_id": worker_id,
+                    "lease_token": uuid.uuid4().hex,
+                    "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "heartbeat_at": now,
+                    "started_at": now,
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", -1), ("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return None
+
+        if acquire_book_slot(job["book_id"], str(job["_id"])):
+            return job
+
+        # Book is busy: give the job back without counting the attempt
+        jobs_collection.update_one(
+            {"_id": job["_id"], "lease_token": job["lease_token"]},
+            {
+                "$set": {
+                    "status": JOB_QUEUED,
+                    "worker_id": None,
+                    "lease_token": None,
+                    "lease_expires_at": None,
+                    "available_at": now + timedelta(seconds=BOOK_BUSY_DELAY_SECONDS),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": -1}
+            }
+        )
+
+    return None
+
+
+def heartbeat(job_id, lease_token: str) -> bool:
+    """Extends the job's lease. Returns False if the lease was lost to another worker."""
+    jobs_collection = get_jobs_collection()
+    now = datetime.utcnow()
+    result = jobs_collection.update_one(
+        {"_id": ObjectId(job_id), "lease_token": lease_token, "status": JOB_RUNNING},
+        {"$set": {
+            "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+            "heartbeat_at": now,
+            "updated_at": now
+        }}
+    )
+    return result.matched_count > 0
+
+
+def complete_job(job_id, lease_token: str, book_id: str) -> bool:
+    """
+    Marks the job done. Returns False, leaving the job and its book slot alone, when the
+    lease was taken over: the slot entry is keyed by job id and now belongs to the new owner.
+    """
+    jobs_collection = get_jobs_collection()
+    now = datetime.utcnow()
+    result = jobs_collection.update_one(
+        {"_id": ObjectId(job_id), "lease_token": lease_token},
+        {"$set": {
+            "status": JOB_DONE,
+            "lease_token": None,
+            "lease_expires_at": None,
+            "finished_at": now,
+            "updated_at": now
+        }}
+    )
+    if result.matched_count == 0:
+        return False
+    release_book_slot(book_id, str(job_id))
+    return True
+
+
+def fail_job(job_id, lease_token: str, book_id: str, error: str):
+    """Requeues the job with exponential backoff, or marks it failed once attempts are exhausted."""
+    jobs_collection = get_jobs_collection()
+    job = jobs_collection.find_one({"_id": ObjectId(job_id), "lease_token": lease_token}, {"attempts": 1, "max_attempts": 1})
+    if not job:
+        # Lease already taken over by another worker; it now owns the job's state and slot
+        return
+
+    now = datetime.utcnow()
+    if job["attempts"] < job["max_attempts"]:
+        delay = JOB_RETRY_BACKOFF_SECONDS * (2 ** (job["attempts"] - 1))
+        update = {
+            "status": JOB_QUEUED,
+            "available_at": now + timedelta(seconds=delay),
+        }
+    else:
+        update = {"status": JOB_FAILED, "finished_at": now}
+
+    update.update({
+        "error": error,
+        "worker_id": None,
+        "lease_token": None,
+        "lease_expires_at": None,
+        "updated_at": now
+    })
+    result = jobs_collection.update_one({"_id": ObjectId(job_id), "lease_token": lease_token}, {"$set": update})
+    if result.matched_count:
+        release_book_slot(book_id, str(job_id))
+
+
+def fail_exhausted_jobs() -> int:
+    """Marks stalled jobs that have no attempts left as failed and frees their book slots."""
+    jobs_collection = get_jobs_collection()
+    now = datetime.utcnow()
+    stalled = list(jobs_collection.find(
+        {
+            "status": JOB_RUNNING,
+            "lease_expires_at": {"$lt": now},
+            "$expr": {"$gte": ["$attempts", "$max_attempts"]}
+        },
+        {"book_id": 1}
+    ))
+    for job in stalled:
+        result = jobs_collection.update_one(
+            {"_id": job["_id"], "status": JOB_RUNNING, "lease_expires_at": {"$lt": now}},
+            {"$set": {
+                "status": JOB_FAILED,
+                "error": "Lease expired and no attempts left",
+                "lease_token": None,
+                "lease_expires_at": None,
+                "finished_at": now,
+                "updated_at": now
+            }}
+        )
+        if result.modified_count:
+            release_book_slot(job["book_id"], str(job["_id"]))
+    return len(stalled)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    jobs_collection = get_jobs_collection()
+    return jobs_collection.find_one({"_id": ObjectId(job_id)})
+
+
+def get_jobs_for_book(book_id: str) -> List[Dict[str, Any]]:
+    """All jobs for a book, newest first."""
+    jobs_collection = get_jobs_collection()
+    return list(jobs_collection.find({"book_id": book_id}).sort("created_at", -1))
@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 
 import os
+import asyncio
+import threading
 
 load_dotenv()
 
@@ -42,6 +44,7 @@ from api.agent_configs.routes import router as agent_configs_router
 from api.knowledge_base.routes import router as knowledge_base_router
 from api.classification.routes import router as classification_router
 from api.classification.websocket import router as classifaction_websocket_router
+from api.jobs.routes import router as jobs_router
 
 app.include_router(users_router)
 app.include_router(documents_router)
@@ -52,6 +55,78 @@ app.include_router(agent_configs_router)
 app.include_router(knowledge_base_router)
 app.include_router(classification_router)   
 app.include_router(classifaction_websocket_router)     
+app.include_router(jobs_router)
+
+from utils.model_registry import warmup, model_status, models_ready, requested_warmup
+from db.indexes import ensure_indexes
+
+
+@app.on_event("startup")
+def create_indexes():
+    """Creates the indexes the hot query paths rely on (no-op when they already exist)."""
+    if os.getenv("ENSURE_INDEXES", "True") != "True":
+        return
+    try:
+        ensure_indexes()
+    except Exception as e:
+        # The API still works without them, only slower
+        print(f"[Indexes] Failed to ensure indexes: {e}")
+
+
+@app.on_event("startup")
+def warmup_models():
+    """
+    Models load lazily on first use. Set MODEL_WARMUP to a comma separated list of
+    model names (or "all") to preload them in the background after startup.
+    """
+    names = requested_warmup()
+    if names == []:
+        return
+    threading.Thread(target=warmup, args=(names,), daemon=True, name="model-warmup").start()
+
+
+@app.on_event("startup")
+def start_embedded_workers():
+    """
+    Book processing runs in worker.py processes. For single-box development,
+    EMBEDDED_WORKERS=N runs N worker threads inside the API process instead.
+    """
+    count = int(os.getenv("EMBEDDED_WORKERS", "0"))
+    if count > 0:
+        from worker import start_embedded_workers as start_workers
+        start_workers(count)
+
+
+@app.on_event("startup")
+async def start_progress_events_consumer():
+    """Delivers progress published by workers in other processes to this process's websockets."""
+    from api.chunks.progress_events import consume_progress_events
+    app.state.progress_events_task = asyncio.create_task(consume_progress_events())
+
+
+@app.on_event("shutdown")
+def stop_progress_events_consumer():
+    task = getattr(app.state, "progress_events_task", None)
+    if task is not None:
+        task.cancel()
+
+
+@app.on_event("shutdown")
+def close_mongo_async():
+    from db.mongo_async import close_async_client
+    close_async_client()
+
+
+@app.get("/health/models")
+def models_readiness():
+    """
+    Ready once the models preloaded through MODEL_WARMUP are loaded; the others load
+    on first use and are listed with their loaded state only.
+    """
+    return {
+        "ready": models_ready(),
+        "models": model_status()
+    }
 
 
 @app.get("/")
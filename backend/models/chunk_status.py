@@ -0,0 +1,28 @@
+from enum import Enum
+
+
+class ChunkStatus(str, Enum):
+    """chunks.status: classification state of a chunk"""
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+
+
+class AnalysisStatus(str, Enum):
+    """chunks.analysis_status: analysis state of a chunk"""
+    PENDING = "Pending"
+    COMPLETE = "Complete"
+
+
+def _normalize(enum_cls, value) -> str:
+    if isinstance(value, enum_cls):
+        return value.value
+    for member in enum_cls:
+        if isinstance(value, str) and value.strip().lower() == member.value.lower():
+            return member.value
+    raise ValueError(f"Invalid {enum_cls.__name__} '{value}', expected one of {[m.value for m in enum_cls]}")
+
+
+def normalize_analysis_status(value) -> str:
+    """Canonical stored value for an analysis status ('pending' -> 'Pending'); raises ValueError for unknown statuses."""
+    return _normalize(AnalysisStatus, value)
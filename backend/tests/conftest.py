@@ -0,0 +1,38 @@
+"""
+Tests run against mongomock: pymongo.MongoClient is swapped out before db.mongo
+creates its module level client, so no MongoDB server is needed. Install the test
+dependencies with `pip install -r requirements-dev.txt`.
+"""
+import os
+import sys
+import mongomock
+import mongomock.gridfs
+import pymongo
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+mongomock.gridfs.enable_gridfs_integration()
+pymongo.MongoClient = mongomock.MongoClient
+
+
+def _ignore_sort(method):
+    # pymongo >= 4.11 passes sort= to bulk operations, which mongomock does not know yet
+    def wrapper(self, *args, sort=None, **kwargs):
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+for _name in ("add_replace", "add_update"):
+    setattr(mongomock.collection.BulkOperationBuilder, _name,
+            _ignore_sort(getattr(mongomock.collection.BulkOperationBuilder, _name)))
+
+from db import mongo  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    for db in (mongo.doc_class_db, mongo.review_db, mongo.knowledge_base_db, mongo.ai_books_db):
+        for name in db.list_collection_names():
+            db.drop_collection(name)  # Indexes too
+    yield
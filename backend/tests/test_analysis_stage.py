@@ -0,0 +1,84 @@
+import time
+import pytest
+from Analysis import mains1
+from Analysis.mains1 import AnalysisStage, finalize_analysis
+from db.mongo import books_collection, chunks_collection
+
+
+@pytest.fixture
+def book_id():
+    book_id = str(books_collection.insert_one({"status": "Processing"}).inserted_id)
+    books_collection.update_one({}, {"$set": {"doc_id": book_id}})
+    return book_id
+
+
+@pytest.fixture
+def stage_env(monkeypatch):
+    monkeypatch.setenv("RESULT_WRITER_BATCH_SIZE", "100")
+    monkeypatch.setenv("RESULT_WRITER_FLUSH_SECONDS", "3600")
+    monkeypatch.setattr(mains1, "build_analysis_graph", lambda: object())
+    monkeypatch.setattr(mains1, "notify_analysis_started", lambda book_id: None)
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("condition not met")
+        time.sleep(0.01)
+
+
+def test_chunk_is_finished_only_after_its_result_is_written(book_id, stage_env, monkeypatch):
+    chunks_collection.insert_one({"doc_id": book_id, "chunk_id": "c0", "chunk_index": 0, "analysis_status": "Pending"})
+
+    def fake_analyze(graph, doc, writer, fingerprint):
+        writer.add({"doc_id": doc["doc_id"], "Chunk_ID": doc["chunk_id"]}, "Complete")
+
+    monkeypatch.setattr(mains1, "analyze_chunk", fake_analyze)
+    finished = []
+    stage = AnalysisStage(book_id, on_analyzed=finished.append)
+    stage.submit({"chunk_id": "c0", "chunk_index": 0})
+
+    wait_for(lambda: stage.writer._results)
+    assert finished == []  # buffered, not stored yet
+
+    stage.close()
+    assert [chunk["chunk_id"] for chunk in finished] == ["c0"]
+    assert chunks_collection.find_one({"chunk_id": "c0"})["analysis_status"] == "Complete"
+
+
+def test_failed_chunk_is_finished_right_away(book_id, stage_env, monkeypatch):
+    chunks_collection.insert_one({"doc_id": book_id, "chunk_id": "c0", "chunk_index": 0, "analysis_status": "Pending"})
+
+    def failing_analyze(graph, doc, writer, fingerprint):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(mains1, "analyze_chunk", failing_analyze)
+    finished = []
+    stage = AnalysisStage(book_id, on_analyzed=finished.append)
+    stage.submit({"chunk_id": "c0", "chunk_index": 0})
+
+    wait_for(lambda: finished)
+    stage.close()
+    assert chunks_collection.find_one({"chunk_id": "c0"})["analysis_status"] == "Pending"
+
+
+def test_finalize_keeps_book_classified_while_chunks_are_pending(book_id, monkeypatch):
+    monkeypatch.setattr(mains1, "set_all_agents_status_true", lambda: None)
+    chunks_collection.insert_many([
+        {"doc_id": book_id, "chunk_id": "c0", "analysis_status": "Complete"},
+        {"doc_id": book_id, "chunk_id": "c1", "analysis_status": "Pending"},
+    ])
+
+    finalize_analysis(book_id, run_analysis=True, run_classification=True)
+    book = books_collection.find_one({"doc_id": book_id})
+    assert book["status"] == "Classified"
+    assert book["analysis_pending_chunks"] == 1
+    assert book["progress"]["analyzed"] == 1
+
+    chunks_collection.update_one({"chunk_id": "c1"}, {"$set": {"analysis_status": "Complete"}})
+    finalize_analysis(book_id, run_analysis=True, run_classification=True)
+    book = books_collection.find_one({"doc_id": book_id})
+    assert book["status"] == "Processed"
+    assert book["analysis_pending_chunks"] == 0
+    assert book["progress"]["analyzed"] == 2  # recounted, though no increment was applied
@@ -0,0 +1,21 @@
+import inspect
+from bson import ObjectId
+from api.classification.routes import start_classification
+from db.mongo import books_collection, jobs_collection
+
+
+def test_start_classification_runs_in_threadpool():
+    # Blocking pymongo calls must not run on the event loop
+    assert not inspect.iscoroutinefunction(start_classification)
+
+
+def test_start_classification_enqueues_one_job_per_shard(monkeypatch):
+    monkeypatch.setenv("CLASSIFICATION_SHARDS", "3")
+    book_id = str(books_collection.insert_one({"status": "Unprocessed"}).inserted_id)
+
+    response = start_classification(book_id, run_classification=True, run_analysis=False)
+
+    assert response["status"] == "Processing"
+    assert len(response["job_ids"]) == 3
+    assert jobs_collection.count_documents({"book_id": book_id}) == 3
+    assert books_collection.find_one({"_id": ObjectId(book_id)})["status"] == "Processing"
@@ -0,0 +1,96 @@
+import json
+import pytest
+from Analysis import fused
+from Analysis.agents import available_agents, agent_settings
+from Analysis.fused import build_fused_prompt, parse_fused_response, run_fused_analysis
+
+KB = [{"json_data": json.dumps({"official_narrative": "The accord was signed in 1972.", "key_points": ["Bilateral talks"]})}]
+
+
+class FakeLLM:
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return type("Message", (), {"content": self.answer})()
+
+
+def per_agent(name, calls):
+    def review(state):
+        calls.append(name)
+        output = {"issues_found": False, "problematic_text": None}
+        return {
+            "aggregate": [f"{name} Output: {output}"],
+            "main_node_output": {name: {"output": output, "confidence": 0, "retries": 3, "human_review": True}},
+        }
+    return review
+
+
+@pytest.fixture
+def agents(monkeypatch):
+    calls = []
+    for name in ("Bias", "Facts", "Security"):
+        monkeypatch.setitem(available_agents, name, per_agent(name, calls))
+        monkeypatch.setitem(agent_settings, name, {
+            "criteria": f"{name} criteria", "guidelines": f"{name} guidelines", "confidence_score": 70,
+            "knowledge_base": KB if name == "Bias" else None,
+        })
+    return calls
+
+
+def report_data():
+    return {"report_text": "The border accord was signed.", "metadata": {"title": "History"},
+            "main_node_output": {}, "aggregate": []}
+
+
+def answer(issue, confidence=90):
+    if issue:
+        return {"issues_found": True, "problematic_text": "border accord", "observation": "o",
+                "recommendation": "rephrase", "confidence": confidence}
+    return {"issues_found": False, "problematic_text": "", "observation": "", "recommendation": "", "confidence": confidence}
+
+
+def test_prompt_uses_the_shared_knowledge_base_formatter(agents):
+    prompt = build_fused_prompt("Text", {"title": "History"}, ["Bias", "Facts"])
+    assert "### Agent: Bias" in prompt and "### Agent: Facts" in prompt
+    assert "- Official Narrative: - The accord was signed in 1972." in prompt
+    assert "No specific knowledge base provided." in prompt
+
+
+def test_parse_strips_fences_and_rejects_null_answers():
+    raw = "```json\n" + json.dumps({
+        "Bias": answer(True),
+        "Facts": {"issues_found": False, "problematic_text": None, "confidence": 95},
+        "Security": {"issues_found": "no"},
+    }) + "\n```"
+    assert list(parse_fused_response(raw, ["Bias", "Facts", "Security", "Missing"])) == ["Bias"]
+    assert parse_fused_response("not json", ["Bias"]) == {}
+
+
+def test_unusable_answers_fall_back_to_the_per_agent_review(agents, monkeypatch):
+    main_node_calls = []
+    monkeypatch.setattr(fused, "main_node", lambda state: main_node_calls.append(state) or {})
+    llm = FakeLLM(json.dumps({
+        "Bias": answer(True),
+        "Facts": {"issues_found": False, "problematic_text": None, "confidence": 99},
+        # Security is missing
+    }))
+
+    result = run_fused_analysis(llm, report_data())
+
+    assert len(llm.prompts) == 1
+    assert len(main_node_calls) == 1
+    assert sorted(agents) == ["Facts", "Security"]
+    assert result["main_node_output"]["Bias"]["output"]["issues_found"] is True
+    assert result["main_node_output"]["Facts"]["human_review"] is True
+    assert "Review Report" in result["final_decision_report"]
+
+
+def test_low_confidence_falls_back(agents):
+    llm = FakeLLM(json.dumps({name: answer(False, confidence=50 if name == "Facts" else 90)
+                              for name in ("Bias", "Facts", "Security")}))
+    result = run_fused_analysis(llm, report_data())
+    assert agents == ["Facts"]
+    assert result["main_node_output"]["Bias"]["confidence"] == 90
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from pymongo.errors import OperationFailure
+from db import indexes
+from db.indexes import ensure_indexes
+from db.migrate_review_outcomes import dedupe_review_outcomes
+from db.mongo import review_outcomes_collection, progress_events_collection
+
+
+def insert_outcomes():
+    now = datetime(2026, 1, 1)
+    review_outcomes_collection.insert_many([
+        {"Chunk_ID": "c1", "timestamp": now, "run": "old"},
+        {"Chunk_ID": "c1", "timestamp": now + timedelta(hours=1), "run": "new"},
+        {"Chunk_ID": "c1", "timestamp": now - timedelta(hours=1), "run": "oldest"},
+        {"Chunk_ID": "c2", "timestamp": now, "run": "only"},
+    ])
+
+
+def test_dedupe_keeps_the_newest_outcome_per_chunk():
+    insert_outcomes()
+    assert dedupe_review_outcomes(dry_run=True) == 2
+    assert review_outcomes_collection.count_documents({}) == 4
+
+    assert dedupe_review_outcomes() == 2
+    assert sorted(o["run"] for o in review_outcomes_collection.find()) == ["new", "only"]
+    assert dedupe_review_outcomes() == 0
+
+
+def test_duplicates_skip_the_unique_index_without_deleting_outcomes(capsys):
+    insert_outcomes()
+    result = ensure_indexes()
+
+    assert "document_classification.review_outcomes.chunk_id_unique" in result["failed"]
+    assert "document_classification.review_outcomes.doc_id" in result["created"]
+    assert review_outcomes_collection.count_documents({}) == 4
+    assert "python -m db.migrate_review_outcomes" in capsys.readouterr().out
+
+    dedupe_review_outcomes()
+    assert "document_classification.review_outcomes.chunk_id_unique" in ensure_indexes()["created"]
+
+
+def test_changed_ttl_is_applied_with_collmod(monkeypatch):
+    progress_events_collection.create_index([("created_at", 1)], name="created_at_ttl", expireAfterSeconds=3600)
+    commands = []
+
+    def create_index(keys, **options):
+        raise OperationFailure("An equivalent index already exists with different options", code=85)
+
+    monkeypatch.setattr(progress_events_collection, "create_index", create_index)
+    monkeypatch.setattr(progress_events_collection.database, "command",
+                        lambda *args, **kwargs: commands.append((args, kwargs)))
+    monkeypatch.setattr(indexes, "INDEXES", [
+        (lambda: progress_events_collection, [("created_at", 1)], {"name": "created_at_ttl", "expireAfterSeconds": 60})
+    ])
+
+    assert ensure_indexes()["failed"] == []
+    assert commands == [(("collMod", "progress_events"), {"index": {"name": "created_at_ttl", "expireAfterSeconds": 60}})]
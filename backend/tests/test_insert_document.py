@@ -0,0 +1,31 @@
+from langchain_core.documents import Document
+from Classification.database_operations import insert_document
+from db.mongo import books_collection, chunks_collection
+
+
+def pages(count):
+    return [Document(page_content=f"Paragraph {i}", metadata={"page": i + 1}) for i in range(count)]
+
+
+def test_retried_indexing_does_not_duplicate_chunks():
+    book_id = str(books_collection.insert_one({"status": "Indexing"}).inserted_id)
+
+    insert_document(book_id, pages(3), "summary")
+    first_ids = [c["chunk_id"] for c in chunks_collection.find({"doc_id": book_id}).sort("chunk_index", 1)]
+
+    # The job failed after writing its chunks and is run again
+    insert_document(book_id, pages(3), "summary")
+    chunks = list(chunks_collection.find({"doc_id": book_id}).sort("chunk_index", 1))
+
+    assert [c["chunk_id"] for c in chunks] == first_ids
+    assert [c["chunk_index"] for c in chunks] == [0, 1, 2]
+    assert books_collection.find_one()["progress"]["total"] == 3
+
+
+def test_leftover_chunks_of_an_earlier_attempt_are_removed():
+    book_id = str(books_collection.insert_one({"status": "Indexing"}).inserted_id)
+
+    insert_document(book_id, pages(4), "summary")
+    insert_document(book_id, pages(2), "summary")
+
+    assert chunks_collection.count_documents({"doc_id": book_id}) == 2
@@ -0,0 +1,106 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+import worker
+from jobs import job_queue
+from jobs.job_queue import (
+    enqueue_job, claim_next_job, complete_job, fail_job, heartbeat, acquire_book_slot, check_lease,
+    set_active_lease, LeaseLost, JOB_DONE, JOB_QUEUED, JOB_RUNNING
+)
+from db.mongo import jobs_collection, job_slots_collection
+
+
+def expire_lease(job):
+    jobs_collection.update_one({"_id": job["_id"]}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+
+
+def holders(book_id):
+    return (job_slots_collection.find_one({"_id": book_id}) or {}).get("holders", [])
+
+
+def test_claim_leases_each_job_once():
+    enqueue_job("index", "book-1")
+    first = claim_next_job("worker-a")
+    assert first["status"] == JOB_RUNNING and first["attempts"] == 1
+    assert claim_next_job("worker-b") is None
+
+
+def test_book_slots_limit_concurrent_jobs():
+    assert acquire_book_slot("book-1", "job-1", limit=2)
+    assert acquire_book_slot("book-1", "job-2", limit=2)
+    assert not acquire_book_slot("book-1", "job-3", limit=2)
+    # Re-acquiring a held slot (lease takeover) always succeeds
+    assert acquire_book_slot("book-1", "job-1", limit=2)
+
+
+def test_expired_lease_is_stolen_and_old_owner_keeps_hands_off():
+    enqueue_job("process", "book-1")
+    old = claim_next_job("worker-a")
+    expire_lease(old)
+
+    new = claim_next_job("worker-b")
+    assert new["_id"] == old["_id"] and new["lease_token"] != old["lease_token"]
+    assert new["attempts"] == 2
+    assert not heartbeat(old["_id"], old["lease_token"])
+
+    # The stale owner neither finishes the job nor frees the slot the new owner holds
+    assert complete_job(old["_id"], old["lease_token"], "book-1") is False
+    fail_job(old["_id"], old["lease_token"], "book-1", "stale")
+    assert jobs_collection.find_one({"_id": new["_id"]})["status"] == JOB_RUNNING
+    assert holders("book-1") == [str(new["_id"])]
+
+    assert complete_job(new["_id"], new["lease_token"], "book-1") is True
+    assert jobs_collection.find_one({"_id": new["_id"]})["status"] == JOB_DONE
+    assert holders("book-1") == []
+
+
+def test_failed_job_is_requeued_with_backoff():
+    enqueue_job("process", "book-1")
+    job = claim_next_job("worker-a")
+    fail_job(job["_id"], job["lease_token"], "book-1", "boom")
+
+    stored = jobs_collection.find_one({"_id": job["_id"]})
+    assert stored["status"] == JOB_QUEUED
+    assert stored["available_at"] > datetime.utcnow()
+    assert holders("book-1") == []
+
+
+class FakeLease:
+    job_id = "job-1"
+    lost = False
+
+
+def test_check_lease_raises_once_the_lease_is_lost():
+    lease = FakeLease()
+    set_active_lease(lease)
+    try:
+        check_lease()
+        lease.lost = True
+        with pytest.raises(LeaseLost):
+            check_lease()
+    finally:
+        set_active_lease(None)
+    check_lease()  # no job on this thread
+
+
+def test_worker_abandons_a_job_whose_lease_was_taken_over(monkeypatch):
+    enqueue_job("process", "book-1")
+    stop = threading.Event()
+    stolen = {}
+
+    def run_job(job):
+        # Another worker takes the job over while this one is still running it
+        expire_lease(job)
+        stolen.update(claim_next_job("worker-b"))
+        assert not heartbeat(job["_id"], job["lease_token"])
+        job_queue._active_lease.value.lost = True
+        stop.set()
+        check_lease()
+
+    monkeypatch.setattr(worker, "run_job", run_job)
+    worker.run_worker(stop, poll_interval=0)
+
+    stored = jobs_collection.find_one({"_id": stolen["_id"]})
+    assert stored["status"] == JOB_RUNNING
+    assert stored["lease_token"] == stolen["lease_token"]
+    assert holders("book-1") == [str(stolen["_id"])]
@@ -0,0 +1,95 @@
+import json
+import time
+from langchain_core.outputs import ChatGeneration
+from langchain_core.messages import AIMessage
+from utils.llm_cache import LLMResponseCache, bypass_llm_cache, refresh_llm_cache, get_llm_cache_stats, prompt_hash
+
+
+def serialized(content, message_id):
+    return json.dumps([{"id": ["langchain", "schema", "messages", "HumanMessage"],
+                        "kwargs": {"type": "human", "content": content, "id": message_id}}])
+
+
+def answer(text):
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+def test_prompt_hash_ignores_message_ids_and_whitespace():
+    assert prompt_hash(serialized("Classify  this", "run-1")) == prompt_hash(serialized("Classify this", "run-2"))
+    assert prompt_hash(serialized("Classify this", "run-1")) != prompt_hash(serialized("Classify that", "run-1"))
+
+
+def test_cache_hit_after_store():
+    cache = LLMResponseCache("mock", 0.0, max_entries=10)
+    prompt = serialized("Is this political?", "a")
+
+    assert cache.lookup(prompt, "") is None
+    cache.update(prompt, "", answer("no"))
+    assert cache.lookup(serialized("Is this political?", "b"), "")[0].text == "no"
+
+    with bypass_llm_cache():
+        assert cache.lookup(prompt, "") is None
+
+
+def test_stats_are_shared_between_processes(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE", "mongo")
+    api_process = LLMResponseCache("mock", 0.0, max_entries=10)
+    worker_process = LLMResponseCache("mock", 0.0, max_entries=10)
+    prompt = serialized("Summarise", "a")
+
+    worker_process.lookup(prompt, "")
+    worker_process.update(prompt, "", answer("summary"))
+    worker_process.lookup(prompt, "")
+    with bypass_llm_cache():
+        api_process.lookup(prompt, "")
+
+    stats = get_llm_cache_stats()
+    assert stats["enabled"] is True
+    assert stats["entries"] == 1
+    [model] = stats["models"]
+    assert (model["hits"], model["misses"], model["stored"], model["bypassed"]) == (1, 1, 1, 1)
+    assert model["hit_rate"] == 0.5
+
+
+def test_eviction_removes_least_recently_used():
+    cache = LLMResponseCache("mock", 0.0, max_entries=2)
+    for i in range(3):
+        cache.update(serialized(f"prompt {i}", "x"), "", answer(str(i)))
+        time.sleep(0.002)  # last_used_at has millisecond precision
+    cache.lookup(serialized("prompt 0", "x"), "")  # refreshes entry 0
+
+    assert cache.evict() == 1
+    assert cache.lookup(serialized("prompt 1", "x"), "") is None
+    assert cache.lookup(serialized("prompt 0", "x"), "")[0].text == "0"
+
+
+def test_retry_skips_the_cached_answer_and_replaces_it():
+    cache = LLMResponseCache("mock", 0.0, max_entries=10)
+    prompt = serialized("Classify this", "a")
+    cache.update(prompt, "", answer("not json"))
+
+    with refresh_llm_cache():
+        assert cache.lookup(prompt, "") is None
+        cache.update(prompt, "", answer('{"ok": true}'))
+    with refresh_llm_cache(False):
+        assert cache.lookup(prompt, "")[0].text == '{"ok": true}'
+
+
+def test_classification_retries_reach_the_model(monkeypatch):
+    from Classification import app
+    from utils import llm_cache
+
+    calls = []
+
+    def invoke_graph(text, agents):
+        calls.append(llm_cache._refresh.get())
+        if len(calls) < 3:
+            raise ValueError("Expecting value")
+        return {}
+
+    monkeypatch.setattr(app, "invoke_graph", invoke_graph)
+    monkeypatch.setattr(app, "is_result_reuse_enabled", lambda: False)
+    monkeypatch.setattr(app, "extract_classification_info", lambda results: [])
+    app.classify_chunk("book-1", 0, None, [], context={"current": "Some text"})
+
+    assert calls == [False, True, True]
@@ -0,0 +1,40 @@
+import multiprocessing
+import pytest
+from langchain_core.outputs import Generation
+from utils.llm_cassette import LLMCassette, CassetteMiss, MODE_RECORD, MODE_REPLAY
+
+RECORDS_PER_PROCESS = 100
+
+
+def record(path, worker):
+    cassette = LLMCassette(path, MODE_RECORD)
+    for i in range(RECORDS_PER_PROCESS):
+        # Long answers make each gzip member span several writes
+        cassette.update(f"{worker}-{i}", "", [Generation(text=f"{worker}-{i} " + "x" * 20000)])
+
+
+def test_replay_returns_recorded_answers_in_order(tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    recorder = LLMCassette(path, MODE_RECORD)
+    recorder.update("ping", "", [Generation(text="first")])
+    recorder.update("ping", "", [Generation(text="second")])
+
+    player = LLMCassette(path, MODE_REPLAY)
+    assert [player.lookup("ping", "")[0].text for _ in range(3)] == ["first", "second", "second"]
+    with pytest.raises(CassetteMiss):
+        player.lookup("never recorded", "")
+
+
+def test_concurrent_recording_processes_keep_the_cassette_readable(tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=record, args=(path, worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    player = LLMCassette(path, MODE_REPLAY)
+    assert sum(len(v) for v in player._entries.values()) == 4 * RECORDS_PER_PROCESS
+    assert player.lookup("3-99", "")[0].text.startswith("3-99 ")
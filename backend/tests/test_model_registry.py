@@ -0,0 +1,94 @@
+import threading
+import pytest
+from utils import model_registry
+
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    for name in ("_loaders", "_instances", "_load_seconds", "_errors", "_locks"):
+        monkeypatch.setattr(model_registry, name, {})
+    monkeypatch.setattr(model_registry, "_warmup_names", set())
+    monkeypatch.setattr(model_registry, "MODEL_MODULES", {})
+
+
+def test_ready_without_warmup_while_models_load_lazily():
+    model_registry.register_model("summarizer", object)
+    model_registry.register_model("embeddings", object)
+
+    assert model_registry.models_ready()
+    assert not any(m["loaded"] for m in model_registry.model_status().values())
+
+    model_registry.get_model("summarizer")
+    status = model_registry.model_status()
+    assert status["summarizer"]["loaded"] and not status["embeddings"]["loaded"]
+
+
+def test_ready_once_warmup_models_are_loaded():
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_loader():
+        loading.set()
+        release.wait(5)
+        return object()
+
+    model_registry.register_model("summarizer", slow_loader)
+    model_registry.register_model("embeddings", object)
+
+    warming = threading.Thread(target=model_registry.warmup, args=(["summarizer"],))
+    warming.start()
+    loading.wait(5)
+    try:
+        assert not model_registry.models_ready()
+        assert model_registry.model_status()["summarizer"]["warmup"]
+    finally:
+        release.set()
+        warming.join()
+
+    assert model_registry.models_ready()
+    assert not model_registry.model_status()["embeddings"]["loaded"]
+
+
+def test_failed_warmup_is_not_ready():
+    def broken():
+        raise RuntimeError("out of memory")
+
+    model_registry.register_model("classifier", broken)
+    assert model_registry.warmup() == {"classifier": False}
+    assert not model_registry.models_ready()
+    assert model_registry.model_status()["classifier"]["error"] == "out of memory"
+
+
+def test_warmup_imports_the_module_that_registers_the_model(monkeypatch):
+    imported = []
+
+    def import_module(module):
+        imported.append(module)
+        model_registry.register_model("summarizer", object)
+
+    monkeypatch.setattr(model_registry, "MODEL_MODULES", {"summarizer": "Classification.summarization"})
+    monkeypatch.setattr(model_registry.importlib, "import_module", import_module)
+
+    assert model_registry.warmup(["summarizer"]) == {"summarizer": True}
+    assert imported == ["Classification.summarization"]
+    assert model_registry.models_ready()
+
+
+def test_unknown_warmup_name_is_reported():
+    assert model_registry.warmup(["sumarizer"]) == {"sumarizer": False}
+    assert not model_registry.models_ready()
+    assert model_registry.model_status()["sumarizer"] == {
+        "loaded": False, "warmup": True, "load_seconds": None, "error": "not registered"
+    }
+
+
+def test_worker_preloads_models_from_the_environment(monkeypatch, capsys):
+    import worker
+
+    model_registry.register_model("summarizer", object)
+    model_registry.register_model("embeddings", object)
+    monkeypatch.setenv("MODEL_WARMUP", "summarizer")
+
+    worker.warmup_models()
+
+    assert model_registry.is_loaded("summarizer") and not model_registry.is_loaded("embeddings")
+    assert "Models ready" in capsys.readouterr().out
@@ -0,0 +1,48 @@
+import mongomock
+import pytest
+from fastapi import HTTPException
+from utils.pagination import encode_cursor, keyset_query, keyset_sort, page_size
+
+
+@pytest.fixture
+def collection():
+    collection = mongomock.MongoClient().db.items
+    # Ties on the sort field and documents without it, to exercise the _id tie-breaker
+    collection.insert_many([{"n": i // 3} for i in range(10)] + [{"n": None}, {}])
+    return collection
+
+
+def read_all_pages(collection, field, descending, limit=4):
+    seen, cursor = [], None
+    while True:
+        query = keyset_query({}, field, cursor, descending)
+        page = list(collection.find(query).sort(keyset_sort(field, descending)).limit(limit))
+        seen.extend(doc["_id"] for doc in page)
+        if len(page) < limit:
+            return seen
+        cursor = encode_cursor(page[-1], field)
+
+
+@pytest.mark.parametrize("descending", [True, False])
+@pytest.mark.parametrize("field", ["n", "_id"])
+def test_pages_cover_every_document_once_in_sort_order(collection, field, descending):
+    expected = [doc["_id"] for doc in collection.find({}).sort(keyset_sort(field, descending))]
+    assert read_all_pages(collection, field, descending) == expected
+
+
+def test_cursor_is_combined_with_the_filter(collection):
+    cursor = encode_cursor(collection.find_one({"n": 1}), "n")
+    query = keyset_query({"n": {"$gte": 1}}, "n", cursor, descending=False)
+    assert all(doc["n"] >= 1 for doc in collection.find(query))
+
+
+def test_malformed_cursor_is_a_bad_request():
+    with pytest.raises(HTTPException) as error:
+        keyset_query({}, "n", "not-a-cursor", descending=True)
+    assert error.value.status_code == 400
+
+
+def test_page_size_is_clamped():
+    assert page_size(None) == 20
+    assert page_size(0) == 20
+    assert page_size(1000) == 100
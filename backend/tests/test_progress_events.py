@@ -0,0 +1,89 @@
+from api.chunks import progress_events
+from api.chunks.progress_events import ProgressEventBuffer, emit_progress_event
+from db.mongo import progress_events_collection
+
+
+def test_buffered_events_are_written_in_one_batch_with_superseded_snapshots_dropped(monkeypatch):
+    buffer = ProgressEventBuffer(flush_seconds=3600)
+    monkeypatch.setattr(progress_events, "_buffer", buffer)
+    writes = []
+    original_write = buffer._write
+    monkeypatch.setattr(buffer, "_write", lambda events: writes.append(len(events)) or original_write(events))
+
+    for done in range(5):
+        emit_progress_event("analysis", "book-1", {"analysis_done": done})
+        emit_progress_event("analysis", "book-1", {"type": "chunk_result", "chunk_index": done}, coalescable=False)
+    emit_progress_event("analysis", "book-2", {"analysis_done": 1})
+    emit_progress_event("index", "book-1", "done", text=True, coalescable=False)
+    assert progress_events_collection.count_documents({}) == 0
+
+    buffer.flush()
+
+    assert writes == [8]
+    events = list(progress_events_collection.find({}, {"_id": 0, "book_id": 1, "payload": 1}))
+    book_1_snapshots = [e for e in events if e["book_id"] == "book-1" and isinstance(e["payload"], dict)
+                        and "analysis_done" in e["payload"]]
+    assert [e["payload"]["analysis_done"] for e in book_1_snapshots] == [4]
+    chunk_results = [e["payload"]["chunk_index"] for e in events
+                     if isinstance(e["payload"], dict) and e["payload"].get("type") == "chunk_result"]
+    assert chunk_results == [0, 1, 2, 3, 4]
+    assert any(e["payload"] == "done" for e in events)
+
+
+def test_zero_flush_interval_writes_immediately(monkeypatch):
+    monkeypatch.setattr(progress_events, "_buffer", ProgressEventBuffer(flush_seconds=0))
+    emit_progress_event("classification", "book-1", {"done": 1})
+    assert progress_events_collection.count_documents({}) == 1
+
+
+class FakeStream:
+    def __init__(self, changes, error):
+        self.changes, self.error, self.resume_token = changes, error, None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.changes:
+            change = self.changes.pop(0)
+            self.resume_token = {"_data": change["fullDocument"]["n"]}
+            return change
+        raise self.error
+
+
+class FakeCollection:
+    def __init__(self, streams):
+        self.streams, self.resume_after = streams, []
+
+    def watch(self, pipeline, resume_after=None):
+        self.resume_after.append(resume_after)
+        return self.streams.pop(0)
+
+
+def test_watch_drops_a_resume_token_that_can_no_longer_be_resumed(monkeypatch):
+    import asyncio
+    from pymongo.errors import OperationFailure
+
+    dispatched = []
+    monkeypatch.setattr(progress_events, "RETRY_SECONDS", 0)
+    monkeypatch.setattr(progress_events, "_dispatch", dispatched.append)
+    collection = FakeCollection([
+        FakeStream([{"fullDocument": {"n": 1}}], ConnectionError("connection reset")),
+        FakeStream([{"fullDocument": {"n": 2}}], OperationFailure("history lost", code=286)),
+        FakeStream([], asyncio.CancelledError()),
+    ])
+
+    try:
+        asyncio.run(progress_events._watch(collection))
+    except asyncio.CancelledError:
+        pass
+
+    assert dispatched == [{"n": 1}, {"n": 2}]
+    # Network errors resume after the last event; a lost history starts over
+    assert collection.resume_after == [None, {"_data": 1}, None]
@@ -0,0 +1,69 @@
+import pytest
+from Classification import app
+from db.mongo import agent_configs_collection, kb_data_collection
+from db.result_reuse import (
+    analysis_fingerprint, classification_fingerprint, find_reusable_result, store_reusable_result,
+    text_hash, STAGE_CLASSIFICATION
+)
+
+AGENTS = [{"agent_name": "Political", "classifier_prompt": "p", "evaluators_prompt": "e"}]
+
+
+def test_text_hash_ignores_extraction_noise():
+    assert text_hash("The ﬁrst  speech\n") == text_hash("The first speech")
+
+
+def test_first_stored_result_is_kept():
+    store_reusable_result(STAGE_CLASSIFICATION, "h", "f", ["first"], "chunk-1")
+    store_reusable_result(STAGE_CLASSIFICATION, "h", "f", ["second"], "chunk-2")
+    assert find_reusable_result(STAGE_CLASSIFICATION, "h", "f") == {"result": ["first"], "source_chunk_id": "chunk-1"}
+    assert find_reusable_result(STAGE_CLASSIFICATION, "h", "other") is None
+
+
+def test_classification_fingerprint_follows_agent_prompts():
+    changed = [{**AGENTS[0], "classifier_prompt": "new"}]
+    assert classification_fingerprint(AGENTS) == classification_fingerprint(list(reversed(AGENTS)))
+    assert classification_fingerprint(AGENTS) != classification_fingerprint(changed)
+
+
+def test_analysis_fingerprint_changes_with_the_knowledge_base():
+    agent_configs_collection.insert_one({"agent_name": "Bias", "type": "analysis", "status": True, "criteria": "c"})
+    kb_data_collection.insert_one({"topic": "Border", "json_data": '{"topic": "Border"}'})
+    before = analysis_fingerprint()
+    assert analysis_fingerprint() == before
+
+    kb_data_collection.update_one({"topic": "Border"}, {"$set": {"json_data": '{"topic": "Border", "v": 2}'}})
+    assert analysis_fingerprint() != before
+
+
+@pytest.fixture
+def classify(monkeypatch):
+    saved = []
+    monkeypatch.setattr(app, "invoke_graph", lambda text, agents: {})
+    monkeypatch.setattr(app, "save_classification_result", lambda chunk_id, results, reused_from=None: saved.append((chunk_id, results, reused_from)))
+
+    def run(classifications, chunk_id="chunk-1"):
+        monkeypatch.setattr(app, "extract_classification_info", lambda results: classifications)
+        return app.classify_chunk("book-1", 0, chunk_id, AGENTS, context={"current": "Same quoted speech"})
+
+    run.saved = saved
+    return run
+
+
+def test_identical_chunk_reuses_the_stored_classification(classify):
+    valid = [{"classification": "political", "confidence_score": 90, "name": "political agent"}]
+    assert classify(valid) == valid
+
+    assert classify([], chunk_id="chunk-2") == valid
+    assert classify.saved[-1] == ("chunk-2", valid, "chunk-1")
+
+
+def test_failed_validation_is_not_stored_for_reuse(classify):
+    broken = [
+        {"classification": "political", "confidence_score": 90, "name": "political agent"},
+        {"classification": "military", "confidence_score": "high", "name": "military agent"},
+    ]
+    classify(broken)
+
+    fingerprint = classification_fingerprint(AGENTS)
+    assert find_reusable_result(STAGE_CLASSIFICATION, text_hash("Same quoted speech"), fingerprint) is None
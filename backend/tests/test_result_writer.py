@@ -0,0 +1,134 @@
+import pytest
+from Analysis import database_saver
+from Analysis.database_saver import ResultWriter, update_chunk_analysis_status
+from db.mongo import books_collection, chunks_collection, review_outcomes_collection
+
+
+def make_book(chunks=3):
+    book_id = str(books_collection.insert_one({"progress": {"analyzed": 0}}).inserted_id)
+    chunks_collection.insert_many([
+        {"doc_id": book_id, "chunk_id": f"c{i}", "chunk_index": i, "analysis_status": "Pending"}
+        for i in range(chunks)
+    ])
+    return book_id
+
+
+def outcome(book_id, chunk_id):
+    return {"doc_id": book_id, "Chunk_ID": chunk_id, "overall_status": "Complete"}
+
+
+@pytest.fixture
+def writer():
+    writer = ResultWriter(batch_size=100, flush_seconds=3600, retries=2, retry_backoff=0)
+    yield writer
+    writer._closed.set()
+
+
+def test_flush_writes_outcomes_and_counts_progress(writer):
+    book_id = make_book()
+    for i in range(3):
+        writer.add(outcome(book_id, f"c{i}"), "Complete")
+
+    writer.flush()
+
+    assert review_outcomes_collection.count_documents({"doc_id": book_id}) == 3
+    assert chunks_collection.count_documents({"doc_id": book_id, "analysis_status": "Complete"}) == 3
+    assert books_collection.find_one()["progress"]["analyzed"] == 3
+
+
+def test_failing_flush_keeps_results_and_raises(writer, monkeypatch):
+    book_id = make_book()
+    writer.add(outcome(book_id, "c0"), "Complete")
+
+    calls = []
+
+    def failing_write(outcome_ops, status_ops, batch):
+        calls.append(len(outcome_ops))
+        raise RuntimeError("primary stepped down")
+
+    monkeypatch.setattr(writer, "_write", failing_write)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert calls == [1, 1, 1]  # first attempt plus two retries
+
+    # Added while the batch was failing; must be written after it
+    writer.add(outcome(book_id, "c1"), "Complete")
+    monkeypatch.undo()
+    writer.flush()
+
+    assert review_outcomes_collection.count_documents({"doc_id": book_id}) == 2
+    assert books_collection.find_one()["progress"]["analyzed"] == 2
+
+
+def test_retried_flush_does_not_double_count(writer, monkeypatch):
+    book_id = make_book()
+    writer.add(outcome(book_id, "c0"), "Complete")
+
+    real_write = ResultWriter._write
+    attempts = []
+
+    def flaky_write(outcome_ops, status_ops, batch):
+        attempts.append(1)
+        counters = real_write(writer, outcome_ops, status_ops, batch)
+        if len(attempts) == 1:
+            raise RuntimeError("connection reset after the write")
+        return counters
+
+    monkeypatch.setattr(writer, "_write", flaky_write)
+    writer.flush()
+
+    assert len(attempts) == 2
+    assert books_collection.find_one()["progress"]["analyzed"] == 1
+
+
+def failing_increment(monkeypatch, failures):
+    real_increment = database_saver.increment_progress
+    calls = []
+
+    def increment(*args):
+        calls.append(args)
+        if len(calls) <= failures:
+            raise RuntimeError("primary stepped down")
+        return real_increment(*args)
+
+    monkeypatch.setattr(database_saver, "increment_progress", increment)
+
+
+def test_failed_increment_is_applied_on_retry(writer, monkeypatch):
+    book_id = make_book()
+    writer.add(outcome(book_id, "c0"), "Complete")
+    writer.add(outcome(book_id, "c1"), "Complete")
+    failing_increment(monkeypatch, failures=1)
+
+    writer.flush()
+
+    assert books_collection.find_one()["progress"]["analyzed"] == 2
+
+
+def test_increment_of_a_failed_flush_is_carried_to_the_next_one(writer, monkeypatch):
+    book_id = make_book()
+    writer.add(outcome(book_id, "c0"), "Complete")
+    failing_increment(monkeypatch, failures=3)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert chunks_collection.find_one({"chunk_id": "c0"})["analysis_status"] == "Complete"
+
+    writer.add(outcome(book_id, "c1"), "Complete")
+    writer.flush()
+
+    assert books_collection.find_one()["progress"]["analyzed"] == 2
+
+
+def test_status_update_of_unknown_chunk_is_not_reported_as_saved(capsys, monkeypatch):
+    notified = []
+    monkeypatch.setattr(database_saver, "notify_analysis_progress_for", lambda *args: notified.append(args))
+    book_id = make_book(chunks=1)
+
+    update_chunk_analysis_status(book_id, "missing", "Complete")
+    assert "not found" in capsys.readouterr().out
+
+    update_chunk_analysis_status(book_id, "c0", "Complete")
+    update_chunk_analysis_status(book_id, "c0", "Complete")
+    assert "already 'Complete'" in capsys.readouterr().out
+    assert len(notified) == 1
+    assert books_collection.find_one()["progress"]["analyzed"] == 1
@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from api.review_outcomes import routes
+from api.review_outcomes.routes import review_outcome_filters
+
+
+@pytest.fixture(autouse=True)
+def analysis_agents(monkeypatch):
+    async def find_agent_names(agent_type):
+        return ["Bias", "Facts"]
+
+    monkeypatch.setattr(routes, "find_agent_names", find_agent_names)
+
+
+def filters(**kwargs):
+    return asyncio.run(review_outcome_filters("book-1", **kwargs))
+
+
+def test_conditions_apply_to_the_requested_agent():
+    result = filters(agent="Bias", issue_found=True)
+    assert result["query"]["$or"] == [{"Bias.issue_found": True}]
+    assert "Bias" in result["projection"] and "Facts" not in result["projection"]
+
+
+def test_without_agent_any_analysis_agent_matches():
+    result = filters(min_confidence=80)
+    assert result["query"]["$or"] == [{"Bias.confidence": {"$gte": 80}}, {"Facts.confidence": {"$gte": 80}}]
+
+
+@pytest.mark.parametrize("agent", ["Text Analyzed", "$where", "Bias.issue_found", "password"])
+def test_unknown_agent_is_rejected(agent):
+    with pytest.raises(HTTPException) as error:
+        filters(agent=agent, issue_found=True)
+    assert error.value.status_code == 400
@@ -0,0 +1,77 @@
+import asyncio
+from api.chunks import websocket_manager
+from api.chunks.websocket_manager import Subscriber, coalesce
+
+
+def snapshot(done):
+    return ("json", {"progress": done}, True)
+
+
+def chunk_result(index):
+    return ("json", {"type": "chunk_result", "chunk_index": index}, False)
+
+
+def subscriber(size):
+    sub = Subscriber(hub=None, channel="analysis", book_id="book-1", websocket=None)
+    sub.queue = asyncio.Queue(maxsize=size)
+    return sub
+
+
+def queued(sub):
+    return list(sub.queue._queue)
+
+
+def test_coalesce_keeps_results_and_latest_snapshot():
+    messages = [snapshot(1), chunk_result(0), snapshot(2), chunk_result(1)]
+    assert coalesce(messages) == [chunk_result(0), snapshot(2), chunk_result(1)]
+
+
+def test_full_queue_coalesces_snapshots_to_make_room():
+    sub = subscriber(3)
+    for message in (snapshot(1), chunk_result(0), snapshot(2)):
+        assert sub.offer(message)
+
+    assert sub.offer(chunk_result(1))
+    assert queued(sub) == [chunk_result(0), snapshot(2), chunk_result(1)]
+    assert sub.dropped == 1
+
+
+def test_chunk_results_are_never_evicted():
+    sub = subscriber(3)
+    for index in range(3):
+        assert sub.offer(chunk_result(index))
+
+    # Nothing can be discarded, so the subscriber is disconnected instead
+    assert not sub.offer(snapshot(1))
+    assert queued(sub) == [chunk_result(0), chunk_result(1), chunk_result(2)]
+    assert not sub.offer(chunk_result(3))
+    assert sub.dropped == 0
+
+
+def test_index_done_text_is_kept():
+    sub = subscriber(2)
+    done = ("text", "done", False)
+    assert sub.offer(snapshot(1))
+    assert sub.offer(done)
+    assert sub.offer(snapshot(2))
+    assert queued(sub) == [done, snapshot(2)]
+
+
+def test_subscriber_falling_behind_on_snapshots_is_dropped(monkeypatch):
+    monkeypatch.setattr(websocket_manager, "SUBSCRIBER_MAX_DROPPED", 3)
+    sub = subscriber(1)
+    assert sub.offer(snapshot(0))
+    assert sub.offer(snapshot(1))
+    assert sub.offer(snapshot(2))
+    assert not sub.offer(snapshot(3))
+    assert queued(sub) == [snapshot(3)]
+
+
+def test_drop_count_resets_once_the_subscriber_catches_up():
+    sub = subscriber(1)
+    sub.offer(snapshot(0))
+    sub.offer(snapshot(1))
+    assert sub.dropped == 1
+    sub.queue.get_nowait()
+    sub.offer(snapshot(2))
+    assert sub.dropped == 0
@@ -0,0 +1,231 @@
+"""Persistent exact-match cache for LLM responses
+
+Opt-in with LLM_CACHE=mongo. Responses are stored in document_classification.llm_cache,
+shared by every API process and worker, keyed by (model, temperature, normalised prompt):
+
+    LLM_CACHE                   "mongo" to enable, "off" (default)
+    LLM_CACHE_TTL_SECONDS       entries expire this long after they were stored (default 30 days)
+    LLM_CACHE_MAX_ENTRIES       least recently used entries are evicted above this (default 100000)
+
+Only worth enabling for deterministic deployments (LLM_TEMPERATURE=0): with a higher
+temperature the first sampled answer is reused for every later identical prompt.
+
+Call sites that must reach the model skip the cache with:
+
+    with bypass_llm_cache():
+        LLAMA.invoke("ping")
+
+Retry loops resend the exact prompt whose answer was unusable; a cached answer would
+only repeat it. Retry attempts run under refresh_llm_cache(), which skips the lookup
+and replaces the stored answer with the new one.
+
+Cache problems (e.g. MongoDB unavailable) are logged and counted; the call then goes
+to the model as if the cache was off.
+
+LLM calls run in the workers, so the counters are kept in
+document_classification.llm_cache_stats ($inc per event, one document per model and
+temperature) and get_llm_cache_stats() reports the totals of every process.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+from pymongo import ReturnDocument
+from langchain_core.caches import BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+from db.mongo import get_llm_cache_collection, get_llm_cache_stats_collection
+
+# Check the collection size after this many inserts rather than on every one
+EVICTION_CHECK_INTERVAL = 100
+
+STAT_COUNTERS = ("hits", "misses", "bypassed", "refreshed", "errors", "stored", "evicted")
+
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+_refresh: ContextVar[bool] = ContextVar("llm_cache_refresh", default=False)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@contextmanager
+def bypass_llm_cache():
+    """LLM calls inside this block (and in threads it starts with a copied context) skip the cache."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+@contextmanager
+def refresh_llm_cache(enabled: bool = True):
+    """LLM calls inside this block go to the model and overwrite the cached answer (for retries)."""
+    token = _refresh.set(enabled)
+    try:
+        yield
+    finally:
+        _refresh.reset(token)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    The prompt LangChain hands to caches is the serialized message list, which includes
+    per-message ids that LangGraph assigns freshly on every run. Only role, name and
+    content reach the model, so only those are kept; whitespace runs are collapsed.
+    """
+    try:
+        messages = json.loads(prompt)
+    except (TypeError, ValueError):
+        return _WHITESPACE.sub(" ", prompt).strip()
+    if not isinstance(messages, list):
+        return _WHITESPACE.sub(" ", prompt).strip()
+
+    parts = []
+    for message in messages:
+        kwargs = message.get("kwargs", {}) if isinstance(message, dict) else {}
+        content = kwargs.get("content", "")
+        if not isinstance(content, str):
+            content = json.dumps(content, sort_keys=True)
+        role = kwargs.get("type") or (message.get("id") or ["message"])[-1]
+        name = kwargs.get("name") or ""
+        parts.append(f"{role}|{name}|{_WHITESPACE.sub(' ', content).strip()}")
+    return "\n".join(parts)
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache(BaseCache):
+    """Expiry is done by the created_at TTL index (see db/indexes.py), eviction by evict()"""
+
+    def __init__(self, model: str, temperature: float, max_entries: int):
+        self.model = model
+        self.temperature = temperature
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inserts = 0
+
+    def _count(self, name: str, amount: int = 1):
+        try:
+            get_llm_cache_stats_collection().update_one(
+                {"_id": f"{self.model}|{self.temperature}"},
+                {
+                    "$inc": {name: amount},
+                    "$set": {"updated_at": datetime.utcnow()},
+                    "$setOnInsert": {"model": self.model, "temperature": self.temperature}
+                },
+                upsert=True
+            )
+        except Exception:
+            pass  # Statistics only; the failure itself is already logged by the caller
+
+    def _key(self, prompt: str) -> str:
+        raw = f"{self.model}|{self.temperature}|{prompt_hash(prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if _bypass.get():
+            self._count("bypassed")
+            return None
+        if _refresh.get():
+            self._count("refreshed")
+            return None
+        try:
+            entry = get_llm_cache_collection().find_one_and_update(
+                {"_id": self._key(prompt)},
+                {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}},
+                projection={"content": 1},
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            self._count("errors")
+            print(f"[LLM Cache] ⚠️ Lookup failed: {e}")
+            return None
+        if entry is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return [ChatGeneration(message=AIMessage(content=entry["content"]))]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]):
+        if _bypass.get() or not return_val:
+            return
+        now = datetime.utcnow()
+        try:
+            get_llm_cache_collection().update_one(
+                {"_id": self._key(prompt)},
+                {
+                    "$set": {"content": return_val[0].text, "last_used_at": now},
+                    "$setOnInsert": {"model": self.model, "temperature": self.temperature, "created_at": now, "hits": 0}
+                },
+                upsert=True
+            )
+        except Exception as e:
+            self._count("errors")
+            print(f"[LLM Cache] ⚠️ Store failed: {e}")
+            return
+        self._count("stored")
+        with self._lock:
+            self._inserts += 1
+            check = self._inserts % EVICTION_CHECK_INTERVAL == 0
+        if check:
+            self.evict()
+
+    def evict(self) -> int:
+        """Deletes the least recently used entries above max_entries; returns how many"""
+        try:
+            collection = get_llm_cache_collection()
+            excess = collection.estimated_document_count() - self.max_entries
+            if excess <= 0:
+                return 0
+            stale = [doc["_id"] for doc in collection.find({}, {"_id": 1}).sort("last_used_at", 1).limit(excess)]
+            deleted = collection.delete_many({"_id": {"$in": stale}}).deleted_count
+        except Exception as e:
+            self._count("errors")
+            print(f"[LLM Cache] ⚠️ Eviction failed: {e}")
+            return 0
+        self._count("evicted", deleted)
+        print(f"[LLM Cache] Evicted {deleted} least recently used entries")
+        return deleted
+
+    def clear(self, **kwargs: Any):
+        get_llm_cache_collection().delete_many({"model": self.model})
+
+_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache(model: str, temperature: float) -> Optional[LLMResponseCache]:
+    """The cache configured by LLM_CACHE, or None when it is off"""
+    global _cache
+    if os.getenv("LLM_CACHE", "off").lower() != "mongo":
+        return None
+    if _cache is None:
+        _cache = LLMResponseCache(
+            model,
+            temperature,
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000"))
+        )
+        print(f"🗄️ LLM response cache enabled for {model} (temperature {temperature})")
+    return _cache
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    """Counters summed over every API and worker process, per model and temperature"""
+    models = []
+    for doc in get_llm_cache_stats_collection().find({}, {"_id": 0}).sort("model", 1):
+        stats = {name: doc.get(name, 0) for name in STAT_COUNTERS}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        models.append({"model": doc.get("model"), "temperature": doc.get("temperature"), **stats,
+                       "updated_at": doc.get("updated_at")})
+    return {
+        "enabled": os.getenv("LLM_CACHE", "off").lower() == "mongo",
+        "entries": get_llm_cache_collection().estimated_document_count(),
+        "models": models
+    }
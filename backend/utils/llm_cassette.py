@@ -0,0 +1,157 @@
+"""Record/replay ("cassette") layer for the shared chat model
+
+Plugged into Classification.models.LLAMA as its LangChain cache, so every classifier,
+evaluator, review agent and summary call goes through it:
+
+    LLM_CASSETTE_MODE=record   calls the LLM as usual and appends each prompt-hash -> response pair
+    LLM_CASSETTE_MODE=replay   answers from the cassette only; a prompt that was never recorded
+                               raises CassetteMiss instead of reaching the network
+    LLM_CASSETTE_MODE=off      (default) no cassette
+
+    LLM_CASSETTE_PATH          cassette file (default llm_cassette.jsonl.gz; plain .jsonl also works)
+    LLM_CASSETTE_LATENCY       replay delay per call: seconds, or "recorded" to replay the
+                               latency measured while recording (default 0, full speed)
+
+Entries are keyed by a hash of the normalised prompt only (utils/llm_cache.normalize_prompt), so a cassette recorded against one
+endpoint replays against any model configuration. When the same prompt was sent
+several times (retry loops), replay hands out the recorded answers in the same order
+and repeats the last one after that.
+
+Several worker processes can record into the same cassette: every append holds an
+exclusive lock on <cassette>.lock (fcntl), so gzip members never interleave.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from langchain_core.caches import BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+from utils.llm_cache import prompt_hash
+
+try:
+    import fcntl
+except ImportError:  # Windows: record from a single process
+    fcntl = None
+
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+
+class CassetteMiss(KeyError):
+    """A replayed run sent a prompt that is not on the cassette"""
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+@contextmanager
+def _append_lock(path: str):
+    """Exclusive across processes; the threads of one process are serialised by LLMCassette._lock"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class LLMCassette(BaseCache):
+    """
+    Stored as JSON lines {"k": prompt hash, "c": response text, "t": seconds}. Appending
+    to a .gz file adds a gzip member, which gzip readers handle transparently.
+    """
+
+    def __init__(self, path: str, mode: str, latency: str = "0"):
+        if mode not in (MODE_RECORD, MODE_REPLAY):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._entries: Dict[str, List[Tuple[str, float]]] = {}
+        self._replayed: Dict[str, int] = {}
+        self._started: Dict[Tuple[str, int], float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            if self.mode == MODE_REPLAY:
+                raise FileNotFoundError(f"LLM cassette not found: {self.path}")
+            return
+        with _open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["k"], []).append((entry["c"], entry.get("t", 0)))
+        print(f"📼 Loaded {sum(len(v) for v in self._entries.values())} LLM responses from {self.path}")
+
+    def _replay_delay(self, recorded_seconds: float) -> float:
+        if self.latency == "recorded":
+            return recorded_seconds
+        return float(self.latency)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = prompt_hash(prompt)
+        if self.mode == MODE_RECORD:
+            # Always a miss, so the call goes to the LLM; update() stores the answer
+            with self._lock:
+                self._started[(key, threading.get_ident())] = time.perf_counter()
+            return None
+
+        with self._lock:
+            responses = self._entries.get(key)
+            if not responses:
+                self.misses += 1
+                raise CassetteMiss(f"Prompt {key[:12]} is not on the cassette {self.path}")
+            index = self._replayed.get(key, 0)
+            self._replayed[key] = index + 1
+            content, seconds = responses[min(index, len(responses) - 1)]
+            self.hits += 1
+
+        delay = self._replay_delay(seconds)
+        if delay > 0:
+            time.sleep(delay)
+        return [ChatGeneration(message=AIMessage(content=content))]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]):
+        if self.mode != MODE_RECORD or not return_val:
+            return
+        key = prompt_hash(prompt)
+        content = return_val[0].text
+        with self._lock:
+            started = self._started.pop((key, threading.get_ident()), None)
+            seconds = round(time.perf_counter() - started, 3) if started is not None else 0
+            self._entries.setdefault(key, []).append((content, seconds))
+            with _append_lock(self.path), _open(self.path, "a") as f:
+                f.write(json.dumps({"k": key, "c": content, "t": seconds}) + "\n")
+
+    def clear(self, **kwargs: Any):
+        with self._lock:
+            self._entries.clear()
+            self._replayed.clear()
+            with _append_lock(self.path):
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+
+
+def get_llm_cassette() -> Optional[LLMCassette]:
+    """The cassette configured by LLM_CASSETTE_MODE, or None when it is off. Read at call time, after .env is loaded."""
+    mode = os.getenv("LLM_CASSETTE_MODE", MODE_OFF).lower()
+    if mode == MODE_OFF:
+        return None
+    path = os.getenv("LLM_CASSETTE_PATH", "llm_cassette.jsonl.gz")
+    print(f"📼 LLM cassette in {mode} mode ({path})")
+    return LLMCassette(path, mode, os.getenv("LLM_CASSETTE_LATENCY", "0"))
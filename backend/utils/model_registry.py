@@ -0,0 +1,150 @@
+"""Central registry for heavy models (summarizer, zero-shot classifier, embeddings, vector store).
+
+Modules register a loader under a name at import time; nothing is loaded until the
+first call to get_model() or an explicit warmup(). Every process therefore only pays
+for the models it actually uses, and all callers share one instance per model.
+
+A process is ready to serve once the models it asked to warm up are loaded; the rest
+load on demand and do not hold readiness back. warmup() imports the modules that
+register the requested models first, so a process can preload models it has not
+imported yet (the API process only imports the embeddings on its own).
+"""
+import importlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+_loaders: Dict[str, Callable[[], Any]] = {}
+_instances: Dict[str, Any] = {}
+_load_seconds: Dict[str, float] = {}
+_errors: Dict[str, str] = {}
+_warmup_names = set()
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+# Module that registers each model, imported by warmup()
+MODEL_MODULES = {
+    "summarizer": "Classification.summarization",
+    "zero_shot_classifier": "Analysis.text_classifier",
+    "embeddings": "Analysis.llm_init",
+    "knowledge_base": "Analysis.knowledge_base",
+}
+
+
+def register_model(name: str, loader: Callable[[], Any]):
+    """Registers a zero-argument loader under the given name. Re-registering replaces the loader."""
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+
+
+def get_model(name: str) -> Any:
+    """
+    Returns the shared instance for a model, loading it on first use.
+    Concurrent first calls block on a per-model lock so the loader runs only once.
+    """
+    if name in _instances:
+        return _instances[name]
+
+    if name not in _loaders:
+        _errors[name] = "not registered"
+        raise KeyError(f"Model '{name}' is not registered")
+
+    with _locks[name]:
+        if name in _instances:
+            return _instances[name]
+
+        print(f"[Models] Loading '{name}'...")
+        started = time.perf_counter()
+        try:
+            instance = _loaders[name]()
+        except Exception as e:
+            _errors[name] = str(e)
+            print(f"[Models] Failed to load '{name}': {e}")
+            raise
+
+        _load_seconds[name] = round(time.perf_counter() - started, 2)
+        _errors.pop(name, None)
+        _instances[name] = instance
+        print(f"[Models] '{name}' ready in {_load_seconds[name]}s")
+        return instance
+
+
+def is_loaded(name: str) -> bool:
+    return name in _instances
+
+
+def unload_model(name: str):
+    """Drops the shared instance so its memory can be reclaimed; the next get_model() reloads it."""
+    with _locks.get(name, _registry_lock):
+        _instances.pop(name, None)
+        _load_seconds.pop(name, None)
+
+
+def registered_models():
+    return list(_loaders.keys())
+
+
+def requested_warmup() -> Optional[list]:
+    """
+    Models named by MODEL_WARMUP: a comma separated list, "all" (returned as None)
+    or empty for no warmup (an empty list).
+    """
+    requested = os.getenv("MODEL_WARMUP", "").strip()
+    if requested.lower() == "all":
+        return None
+    return [n.strip() for n in requested.split(",") if n.strip()]
+
+
+def _import_model_modules(names: Iterable[str]):
+    for name in names:
+        module = MODEL_MODULES.get(name)
+        if module is None or name in _loaders:
+            continue
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            _errors[name] = f"import of {module} failed: {e}"
+            print(f"[Models] Failed to import {module} for '{name}': {e}")
+
+
+def warmup(names: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+    """
+    Loads the given models (every known model when names is None), importing the
+    modules that register them first. Failures, including unknown names, are recorded
+    in model_status() instead of being raised.
+    """
+    names = list(names) if names is not None else list(dict.fromkeys([*MODEL_MODULES, *registered_models()]))
+    _warmup_names.update(names)
+    _import_model_modules(names)
+    results = {}
+    for name in names:
+        if name in _errors and name not in _loaders:
+            # The module registering it failed to import
+            results[name] = False
+            continue
+        try:
+            get_model(name)
+            results[name] = True
+        except Exception:
+            results[name] = False
+    return results
+
+
+def models_ready() -> bool:
+    """True once every model requested through warmup() is loaded (and always without a warmup)."""
+    return all(name in _instances for name in _warmup_names)
+
+
+def model_status() -> Dict[str, Dict[str, Any]]:
+    """Readiness report for every registered model and every model requested through warmup()."""
+    return {
+        name: {
+            "loaded": name in _instances,
+            "warmup": name in _warmup_names,
+            "load_seconds": _load_seconds.get(name),
+            "error": _errors.get(name),
+        }
+        for name in dict.fromkeys([*registered_models(), *sorted(_warmup_names)])
+    }
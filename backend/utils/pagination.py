@@ -0,0 +1,69 @@
+"""Keyset (cursor) pagination helpers
+
+Pages are read with `sort(field, _id).limit(n)` plus a range condition on the last
+seen (field, _id) instead of skip(), so every page costs the same regardless of depth.
+The cursor handed to clients is an opaque base64 string of that last seen pair.
+"""
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(doc: Dict[str, Any], field: str) -> str:
+    value = doc.get(field)
+    if isinstance(value, ObjectId):
+        value = {"$oid": str(value)}
+    raw = json.dumps({"v": value, "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    """Returns (field value, _id) of the last seen document; 400 for a malformed cursor."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        value = data["v"]
+        if isinstance(value, dict) and "$oid" in value:
+            value = ObjectId(value["$oid"])
+        return value, ObjectId(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_sort(field: str, descending: bool = True) -> List[Tuple[str, int]]:
+    direction = -1 if descending else 1
+    if field == "_id":
+        return [("_id", direction)]
+    return [(field, direction), ("_id", direction)]
+
+
+def keyset_query(query: Dict[str, Any], field: str, cursor: Optional[str], descending: bool = True) -> Dict[str, Any]:
+    """Adds the "after the cursor" condition for the given sort to query."""
+    if not cursor:
+        return query
+    value, last_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+
+    if field == "_id":
+        after = {"_id": {op: last_id}}
+    else:
+        conditions = [{field: value, "_id": {op: last_id}}]
+        if value is not None:
+            conditions.append({field: {op: value}})
+            if descending:
+                # Missing/null values sort lowest, i.e. after every value in descending order
+                conditions.append({field: None})
+        elif not descending:
+            # Ascending from null: every non-null value comes after
+            conditions.append({field: {"$ne": None}})
+        after = {"$or": conditions}
+
+    return {"$and": [query, after]} if query else after
+
+
+def page_size(limit: Optional[int]) -> int:
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
@@ -0,0 +1,183 @@
+"""
+Book processing worker.
+
+Pulls jobs (indexing, classification/analysis) from the Mongo job queue and runs
+them outside the API process. Start one or more with:
+
+    python worker.py --processes 4
+
+Workers share nothing but MongoDB, so they can run on any number of machines.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import traceback
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from jobs.job_queue import (
+    claim_next_job, complete_job, fail_job, heartbeat, fail_exhausted_jobs, set_active_lease, LeaseLost,
+    JOB_LEASE_SECONDS
+)
+from jobs.handlers import run_job
+from db.indexes import ensure_indexes
+from utils.model_registry import warmup, models_ready, model_status, requested_warmup
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LeaseHeartbeat:
+    """
+    Keeps a claimed job's lease alive from a background thread while the job runs.
+    Once the lease is lost, jobs.job_queue.check_lease() raises LeaseLost in the job's thread.
+    """
+
+    def __init__(self, job, interval: float = None):
+        self.job_id = job["_id"]
+        self.lease_token = job["lease_token"]
+        self.interval = interval or max(JOB_LEASE_SECONDS / 3, 1)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"heartbeat-{self.job_id}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not heartbeat(self.job_id, self.lease_token):
+                    self.lost = True
+                    print(f"[Worker] Lease lost for job {self.job_id}; another worker may take it over")
+                    return
+            except Exception as e:
+                # Transient Mongo errors: keep trying until the lease actually expires
+                print(f"[Worker] Heartbeat failed for job {self.job_id}: {e}")
+
+    def __enter__(self):
+        set_active_lease(self)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        set_active_lease(None)
+        return False
+
+
+def run_worker(stop_event: threading.Event = None, poll_interval: float = None, job_types=None):
+    """Claims and runs jobs until stop_event is set. The current job always runs to completion."""
+    stop_event = stop_event or threading.Event()
+    poll_interval = poll_interval if poll_interval is not None else float(os.getenv("WORKER_POLL_INTERVAL", "2"))
+    worker_id = make_worker_id()
+    print(f"[Worker {worker_id}] started")
+
+    while not stop_event.is_set():
+        try:
+            fail_exhausted_jobs()
+            job = claim_next_job(worker_id, job_types)
+        except Exception as e:
+            print(f"[Worker {worker_id}] Failed to claim job: {e}")
+            job = None
+
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+
+        job_id = job["_id"]
+        print(f"[Worker {worker_id}] Running {job['type']} job {job_id} for book {job['book_id']} (attempt {job['attempts']}/{job['max_attempts']})")
+        lease = LeaseHeartbeat(job)
+        try:
+            with lease:
+                run_job(job)
+            if lease.lost or not complete_job(job_id, job["lease_token"], job["book_id"]):
+                print(f"[Worker {worker_id}] Job {job_id} finished after its lease was taken over; result left to the new owner")
+            else:
+                print(f"[Worker {worker_id}] Job {job_id} done")
+        except LeaseLost:
+            print(f"[Worker {worker_id}] Job {job_id} aborted: lease taken over by another worker")
+        except Exception as e:
+            traceback.print_exc()
+            if lease.lost:
+                print(f"[Worker {worker_id}] Job {job_id} failed after losing its lease: {e}")
+            else:
+                fail_job(job_id, job["lease_token"], job["book_id"], str(e))
+                print(f"[Worker {worker_id}] Job {job_id} failed: {e}")
+
+    print(f"[Worker {worker_id}] stopped")
+
+
+def start_embedded_workers(count: int):
+    """Runs workers as daemon threads inside another process (e.g. the API for single-box setups)."""
+    stop_event = threading.Event()
+    for i in range(count):
+        threading.Thread(target=run_worker, args=(stop_event,), daemon=True, name=f"embedded-worker-{i}").start()
+    return stop_event
+
+
+def warmup_models():
+    """
+    Preloads the models named by MODEL_WARMUP (comma separated, or "all") before the
+    first job is claimed, and reports which ones are loaded. Models that fail to load
+    are retried on first use.
+    """
+    names = requested_warmup()
+    if names == []:
+        return
+    warmup(names)
+    for name, status in model_status().items():
+        if status["loaded"]:
+            print(f"[Worker] ✅ Model '{name}' loaded in {status['load_seconds']}s")
+        elif status["warmup"]:
+            print(f"[Worker] ❌ Model '{name}' not loaded: {status['error']}")
+    print(f"[Worker] {'✅ Models ready' if models_ready() else '⚠️ Some models failed to preload'}")
+
+
+def _process_main(job_types):
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    warmup_models()
+    run_worker(stop_event, job_types=job_types)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Books processing worker")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("WORKER_PROCESSES", "1")),
+                        help="Number of worker processes to run on this machine")
+    parser.add_argument("--job-types", default=os.getenv("WORKER_JOB_TYPES", ""),
+                        help="Comma separated job types to accept (default: all)")
+    args = parser.parse_args()
+
+    job_types = [t.strip() for t in args.job_types.split(",") if t.strip()] or None
+
+    if os.getenv("ENSURE_INDEXES", "True") == "True":
+        try:
+            ensure_indexes()
+        except Exception as e:
+            print(f"[Indexes] Failed to ensure indexes: {e}")
+
+    if args.processes <= 1:
+        _process_main(job_types)
+    else:
+        # MongoClient is not fork-safe and the parent already used one for the indexes;
+        # spawned children start clean and open their own
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=_process_main, args=(job_types,), name=f"worker-{i}")
+            for i in range(args.processes)
+        ]
+        for p in processes:
+            p.start()
+        try:
+            for p in processes:
+                p.join()
+        except KeyboardInterrupt:
+            # Children received the same signal and finish their current job before exiting
+            for p in processes:
+                p.join()